@@ -6,9 +6,14 @@ import aqnsim
 import random
 import matplotlib.pyplot as plt
 from aqnsim.components.models.qnoise_models import depolar_noise_model
-from aqnsim.quantum_simulator import qubit_noise
 import mpltern
 import matplotlib.colors as mcolors
+import os
+import sys
+
+# The batched channel noise stage is shared with the N-player script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "EPR_Byzantine_N_Players-shaan.py"))
+from channel_noise import BatchedChannelNoise
 
 
 
@@ -28,6 +33,9 @@ NUM_SHOTS = 1
 M = 64
 e = 2 * np.sqrt(M / 4)
 p0, p1, p2, p3 = (-1,)*4
+# Each receiver gets 2*M qubits, so by default all of a receiver's channel noise is drawn at once
+NOISE_BLOCK_SIZE = 2 * M
+
 
 
 class General(aqnsim.Node):
@@ -191,6 +199,7 @@ class GeneralProtocol(aqnsim.NodeProtocol):
         self.traitor = traitor
         self.isConsistent = isConsistent
         self.noise_probs = noise_probs
+        self.channel_noise = BatchedChannelNoise.pauli(qs, noise_probs, block_size=NOISE_BLOCK_SIZE)
 
         # Track correction information gathered from repeater messages
         self.measurement_times = []
@@ -285,9 +294,10 @@ class GeneralProtocol(aqnsim.NodeProtocol):
         :param msg: A `Qubit` received via the quantum channel.
         
         """
-        if (sum(self.noise_probs) > 0):
-            qubit_noise.apply_pauli_noise(self.qs, self.noise_probs[0], self.noise_probs[1], self.noise_probs[2], self.noise_probs[3], msg)
-        
+        # Apply the Pauli drawn for this qubit; a noiseless channel skips the noise path entirely
+        if self.channel_noise.enabled:
+            self.channel_noise.apply(msg)
+
         # place the qubit into the memory
         self.qmem.put(msg, 0)
         meas_result = yield self.qmem.measure(0)
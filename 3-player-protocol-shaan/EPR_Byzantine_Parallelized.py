@@ -10,6 +10,7 @@ from aqnsim.quantum_simulator import qubit_noise
 import mpltern
 import matplotlib.colors as mcolors
 import time
+import multiprocessing
 from EPR_verification_algs import checkAlice, checkWBV, checkWCV
 
 
@@ -507,6 +508,18 @@ def noise_sweep(p0: float):
     ax.set_rlabel('P3')
     plt.show()
 
+_worker_run_simulation = None
+
+def _init_worker():
+    """Pool initializer: build the run function once per worker process."""
+    global _worker_run_simulation
+    _worker_run_simulation = aqnsim.generate_run_simulation_fn(
+        setup_sim_fn=setup_network, logging_level=40
+    )
+
+def _run_batch_entry(parameters):
+    return _worker_run_simulation(*parameters)
+
 def _postprocessing(sim_data):
     """
     Compute the fidelity of the channel by comparing the sent qubit to the received qubit.
@@ -528,57 +541,50 @@ if __name__ == "__main__":
     
     t0 = time.time()
     
-    for t in range(num_trials):
-        p1_vals = []
-        p2_vals = []
-        p3_vals = []
-        for pct1 in np.arange(0, 1.05, .05):
-                for pct2 in np.arange(0, 1-pct1 + .05, .05):
-                    pct3 = round(1 - pct1 - pct2, 8)
-                    p1 =  round((1-p0) * pct1, 8)
-                    p2 = round((1-p0-p1) * pct2, 8)
-                    p3 = round(1-p0-p1-p2, 2)
-                    # print(pct1, pct2, pct3)
+    # Warm pool: every worker builds the run function once, then serves the batches of every trial
+    with multiprocessing.Pool(8, initializer=_init_worker) as pool:
+        for t in range(num_trials):
+            p1_vals = []
+            p2_vals = []
+            p3_vals = []
+            for pct1 in np.arange(0, 1.05, .05):
+                    for pct2 in np.arange(0, 1-pct1 + .05, .05):
+                        pct3 = round(1 - pct1 - pct2, 8)
+                        p1 =  round((1-p0) * pct1, 8)
+                        p2 = round((1-p0-p1) * pct2, 8)
+                        p3 = round(1-p0-p1-p2, 2)
+                        # print(pct1, pct2, pct3)
                     
-                    p1_vals.append(p1)
-                    p2_vals.append(p2)
-                    p3_vals.append(p3)
+                        p1_vals.append(p1)
+                        p2_vals.append(p2)
+                        p3_vals.append(p3)
         
-        batch_parameters = [
-            [[p0, p_1, p_2, p_3]] for p_1, p_2, p_3 in zip(p1_vals, p2_vals, p3_vals)
-        ]
+            batch_parameters = [
+                [[p0, p_1, p_2, p_3]] for p_1, p_2, p_3 in zip(p1_vals, p2_vals, p3_vals)
+            ]
         
-        run_simulation = aqnsim.generate_run_simulation_fn(
-            setup_sim_fn=setup_network, logging_level=40
-        )
-        
-        t1 = time.time()
-        sim_results = aqnsim.run_simulations(
-            run_simulation_fn=run_simulation,
-            batch_parameters=batch_parameters,
-            n_workers=8,
-            threads_per_worker=1,
-        )
+            t1 = time.time()
+            sim_results = pool.map(_run_batch_entry, batch_parameters)
         
-        for sim_result in sim_results:
-            print("NoiseProbs:", sim_result["noiseProbs"], "C Decision:", sim_result["C isSuccess"])
-            probs = (sim_result["noiseProbs"][0][0][1], sim_result["noiseProbs"][0][0][2], sim_result["noiseProbs"][0][0][3])
-            if probs in data:
-                data[probs] += (1 if sim_result["C isSuccess"][-1][0] == 1 else 0)
-            else:
-                data[probs] = (1 if sim_result["C isSuccess"][-1][0] == 1 else 0)
+            for sim_result in sim_results:
+                print("NoiseProbs:", sim_result["noiseProbs"], "C Decision:", sim_result["C isSuccess"])
+                probs = (sim_result["noiseProbs"][0][0][1], sim_result["noiseProbs"][0][0][2], sim_result["noiseProbs"][0][0][3])
+                if probs in data:
+                    data[probs] += (1 if sim_result["C isSuccess"][-1][0] == 1 else 0)
+                else:
+                    data[probs] = (1 if sim_result["C isSuccess"][-1][0] == 1 else 0)
                 
                 
-            # data[(sim_result["noiseProbs"][0][0][1], sim_result["noiseProbs"][0][0][2], sim_result["noiseProbs"][0][0][3])]
-            # graph_p1.append(sim_result["noiseProbs"][0][0][1])
-            # graph_p2.append(sim_result["noiseProbs"][0][0][2])
-            # graph_p3.append(sim_result["noiseProbs"][0][0][3])
-            # graph_s.append(1 if sim_result["C isSuccess"][-1][0] == 1 else 0)
+                # data[(sim_result["noiseProbs"][0][0][1], sim_result["noiseProbs"][0][0][2], sim_result["noiseProbs"][0][0][3])]
+                # graph_p1.append(sim_result["noiseProbs"][0][0][1])
+                # graph_p2.append(sim_result["noiseProbs"][0][0][2])
+                # graph_p3.append(sim_result["noiseProbs"][0][0][3])
+                # graph_s.append(1 if sim_result["C isSuccess"][-1][0] == 1 else 0)
             
-        # print(graph_p1)
+            # print(graph_p1)
 
 
-        print(f"computation time : {time.time() - t1}s")
+            print(f"computation time : {time.time() - t1}s")
     print(f"Total computation time : {time.time() - t0}s")
         
         
@@ -6,9 +6,8 @@ import mpltern
 # from EPR_verification_algs import checkAlice, checkWBV, checkWCV
 import time
 from enum import Enum, auto
-from itertools import combinations  
 
-from config import CHANNEL_DELAY, NUM_SHOTS, M, N, E, p0, p1, p2, p3, NoiseType
+from config import CHANNEL_DELAY, NUM_SHOTS, M, N, E, p0, p1, p2, p3, NoiseType, Topology, SENDER_BATCH_SIZE
 from players import General, GeneralProtocol
 
 
@@ -29,12 +28,18 @@ def setup_network(
     qs: aqnsim.QuantumSimulator,
     noise_probs=(0,0,0,0),
     noise_type=NoiseType.Pauli,
+    topology=Topology.Mesh,
+    batch_size=SENDER_BATCH_SIZE,
 ):
-    """Sets up the quantum network. Three general nodes are instantiated where each pair of nodes is connected
-    by quantum and classical channel. These channels are noiseless, but have any associated `CHANNEL_DELAY`.
+    """Sets up the quantum network. N general nodes are instantiated. In the mesh topology each pair of nodes
+    is connected by a quantum and a classical channel. In the star topology only the sender gets channels,
+    which brings the links and ports down from O(N^2) to O(N). These channels are
+    noiseless, but have any associated `CHANNEL_DELAY`.
 
     :param env: A simpy Environment
     :param qs: A QuantumSimulator object
+    :param topology: A `Topology` selecting which links are created
+    :param batch_size: Number of tuples the sender prepares per simulated step, or `None` for one qubit per step
     """
 
     # Set each gate to take 10 nanoseconds to apply.
@@ -51,48 +56,58 @@ def setup_network(
     meas_delay = 1e-7 * aqnsim.SECOND
 
     # Initialize your N nodes.
+    # A batched sender holds a whole block of tuples at once. Receivers measure one arriving qubit at a time either way.
+    sender_n = 3 if batch_size is None else N * batch_size
+    receiver_n = 3
     generals = []
     for i in range(N):
-        generals.append(General(env, qs, op_delays=op_delays, meas_delay=meas_delay, name=str(i)))
+        generals.append(General(env, qs, n=(sender_n if i == 0 else receiver_n), op_delays=op_delays, meas_delay=meas_delay, name=str(i), topology=topology))
 
     # Initialize the network.
     network = aqnsim.Network(env, qs, nodes=generals)
 
     # Add the quantum and classical channels to the network.
-    # This takes every pairwise combination of generals in the network to connect classically and quantum-ly
-    for pair in list(combinations(generals, 2)):
-        gen_x = pair[0]
-        gen_y = pair[1]
+    # This takes every pair of generals the topology links, each once with the lower index first
+    linked_pairs = {
+        (min(x, y), max(x, y))
+        for x, gen_x in enumerate(generals)
+        for y in map(int, set(gen_x.classical_peers) | set(gen_x.quantum_peers))
+    }
+    for x, y in sorted(linked_pairs):
+        gen_x = generals[x]
+        gen_y = generals[y]
     
-        clink = aqnsim.ClassicalLink(
-            env=env, delay=CHANNEL_DELAY, name=f"clink_{gen_x.name}_{gen_y.name}"
-        )
-        qlink = aqnsim.QuantumLink(
-            env=env, qs=qs, delay=CHANNEL_DELAY, noise=0, name=f"qlink_{gen_x.name}_{gen_y.name}" # depolar_noise_model.DepolarNoiseModel(qs, 0.5, "depolarizing")
-        )
-        # each general has a classical and quantum numbered port for every other general, so you connect them to each other
-        # To clarify further, gen_x has a port for every possible gen_y, and gen_y has a port for every possible gen_x, so you connect gen_x's port named gen_y with gen_y's named gen_x
-        network.add_link(clink, gen_x, gen_y, f"cport{gen_y.name}", f"cport{gen_x.name}")
-        network.add_link(qlink, gen_x, gen_y, f"qport{gen_y.name}", f"qport{gen_x.name}")
+        # each general has a classical and quantum numbered port for every general it is linked to, so you connect them to each other
+        # To clarify further, gen_x has a port for every linked gen_y, and gen_y has a port for every linked gen_x, so you connect gen_x's port named gen_y with gen_y's named gen_x
+        if gen_y.name in gen_x.classical_peers:
+            clink = aqnsim.ClassicalLink(
+                env=env, delay=CHANNEL_DELAY, name=f"clink_{gen_x.name}_{gen_y.name}"
+            )
+            network.add_link(clink, gen_x, gen_y, f"cport{gen_y.name}", f"cport{gen_x.name}")
+        if gen_y.name in gen_x.quantum_peers:
+            qlink = aqnsim.QuantumLink(
+                env=env, qs=qs, delay=CHANNEL_DELAY, noise=0, name=f"qlink_{gen_x.name}_{gen_y.name}" # depolar_noise_model.DepolarNoiseModel(qs, 0.5, "depolarizing")
+            )
+            network.add_link(qlink, gen_x, gen_y, f"qport{gen_y.name}", f"qport{gen_x.name}")
 
     # Equip protocols and set general A to be the sender.
     general_protocols = []
     for i in range(N):
         # If you are the General indexed at 0, you are the sender
         if (i == 0):
-            sender_protocol = GeneralProtocol(env=env, qs=qs, node=generals[i], noise_probs=noise_probs, noise_type=noise_type, tx=True)
+            sender_protocol = GeneralProtocol(env=env, qs=qs, node=generals[i], noise_probs=noise_probs, noise_type=noise_type, tx=True, batch_size=batch_size)
             general_protocols.append(sender_protocol)
         # Otherwise you are a receiver
         else:
             # TODO add better functionality for making nodes traitors
-            lieutenant_protocol = GeneralProtocol(env=env, qs=qs, node=generals[i], noise_probs=noise_probs, noise_type=noise_type) # traitor=False, isConsistent=True
+            lieutenant_protocol = GeneralProtocol(env=env, qs=qs, node=generals[i], noise_probs=noise_probs, noise_type=noise_type, batch_size=batch_size) # traitor=False, isConsistent=True
             general_protocols.append(lieutenant_protocol)
             
     return network, general_protocols
 
 # Run a simulation with the given noise type and parameters.
 # If the noise is not Pauli, only noise_probs[0] is evaluated.
-def run_simulation(noise_probs=(0, 0, 0, 0), noise_type=NoiseType.Pauli):
+def run_simulation(noise_probs=(0, 0, 0, 0), noise_type=NoiseType.Pauli, topology=Topology.Mesh, batch_size=SENDER_BATCH_SIZE):
     """Main run method"""
     # Instantiate environment and QuantumSimulator
     env = simpy.Environment()
@@ -104,7 +119,7 @@ def run_simulation(noise_probs=(0, 0, 0, 0), noise_type=NoiseType.Pauli):
 
     # Setup network and protocols, and run sim until the given time
     _, general_protocols = setup_network(
-        env, qs, noise_probs, noise_type
+        env, qs, noise_probs, noise_type, topology, batch_size
     )
 
     env.run()
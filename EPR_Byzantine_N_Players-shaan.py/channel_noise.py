@@ -0,0 +1,74 @@
+import numpy as np
+from aqnsim.quantum_simulator import qubit_noise
+
+# Shared by the N-player and 3-player scripts, so it depends on neither script's config
+
+
+class BatchedChannelNoise:
+    """Draws the channel noise for a block of arriving qubits with a single RNG call.
+
+    A channel is a list of error events, each with its probability and a function that applies the error to a
+    qubit with certainty. Only the qubits an event was drawn for are touched, so a qubit that is left alone costs
+    a dictionary lookup and a low noise rate costs almost nothing.
+
+    Errors are applied with aqnsim's own `qubit_noise` functions at probability 1, directly on the arriving qubit
+    before it is put into memory, exactly where the per-qubit calls were made. They take no simulated time and
+    no Pauli decomposition of depolarizing or dephasing noise is assumed: aqnsim's channel at strength p is
+    (1-p)*rho + p*E(rho), where E is the same channel at strength 1, so applying E to a fraction p of the qubits
+    samples the same channel whatever parameterization aqnsim uses for E.
+
+    :param qs: A QuantumSimulator object
+    :param events: (probability, apply) pairs, where `apply(qs, qubit)` applies that error
+    :param block_size: Number of arriving qubits to draw noise for at once
+    :param rng: A numpy `Generator`, a fresh one is created if not given
+    """
+
+    def __init__(self, qs, events, block_size: int, rng: np.random.Generator = None):
+        self.qs = qs
+        self.events = [(prob, apply) for prob, apply in events if prob > 0]
+        self.block_size = block_size
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.drawn = {}
+        self.offset = block_size  # Forces a draw for the first qubit
+        no_error = 1 - sum(prob for prob, _ in self.events)
+        self.probs = [max(no_error, 0)] + [prob for prob, _ in self.events]
+        self.probs = [prob / sum(self.probs) for prob in self.probs]
+
+    @classmethod
+    def pauli(cls, qs, noise_probs, block_size: int, rng: np.random.Generator = None):
+        """Pauli noise with `noise_probs` as the (p_I, p_X, p_Y, p_Z) probabilities, normalized to sum to 1."""
+        total = sum(noise_probs)
+        one_hot = [(0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1)]
+        events = [
+            (prob / total, lambda qs, qubit, probs=probs: qubit_noise.apply_pauli_noise(qs, *probs, qubit))
+            for prob, probs in zip(noise_probs[1:], one_hot)
+        ] if total > 0 else []
+        return cls(qs, events, block_size, rng)
+
+    @classmethod
+    def depolarizing(cls, qs, p: float, block_size: int, rng: np.random.Generator = None):
+        return cls(qs, [(p, lambda qs, qubit: qubit_noise.apply_depolarizing_noise(qs, 1, qubit))], block_size, rng)
+
+    @classmethod
+    def dephasing(cls, qs, p: float, block_size: int, rng: np.random.Generator = None):
+        return cls(qs, [(p, lambda qs, qubit: qubit_noise.apply_dephasing_noise(qs, 1, qubit))], block_size, rng)
+
+    @property
+    def enabled(self):
+        """`False` when every error probability is zero, in which case the noise path can be skipped entirely."""
+        return bool(self.events)
+
+    def draw_block(self):
+        drawn = self.rng.choice(len(self.probs), size=self.block_size, p=self.probs)
+        noisy = np.flatnonzero(drawn)
+        self.drawn = dict(zip(noisy.tolist(), drawn[noisy].tolist()))
+        self.offset = 0
+
+    def apply(self, qubit):
+        """Applies the error drawn for the next arriving qubit, if any."""
+        if self.offset == self.block_size:
+            self.draw_block()
+        event = self.drawn.get(self.offset, 0)
+        self.offset += 1
+        if event:
+            self.events[event - 1][1](self.qs, qubit)
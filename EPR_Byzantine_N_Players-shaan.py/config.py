@@ -12,6 +12,12 @@ M = 64
 # Number of players in the protocol
 N = 10
 
+# Number of tuples the sender prepares per simulated step. None keeps the original one-qubit-per-step distribution
+SENDER_BATCH_SIZE = None
+
+# Number of arriving qubits a receiver draws channel noise for in a single RNG call (one per tuple by default)
+NOISE_BLOCK_SIZE = M
+
 # Error threshold for verification algorithms - used as our tolerance in checking vectors (CheckAlice, CheckWCV, CheckWBV)
 E = 2 * np.sqrt(M / 4) # 2 stddevs from M/4
 
@@ -22,4 +28,11 @@ p0, p1, p2, p3 = (-1,)*4
 class NoiseType(Enum):
     Depolarizing = auto()
     Pauli = auto()
-    Dephasing = auto()
\ No newline at end of file
+    Dephasing = auto()
+
+# Network topology used by setup_network
+# Mesh: classical and quantum links between every pair of generals
+# Star: quantum links only from the sender (general 0), classical links only where the protocol sends messages
+class Topology(Enum):
+    Mesh = auto()
+    Star = auto()
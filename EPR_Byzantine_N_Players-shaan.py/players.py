@@ -2,10 +2,29 @@ import aqnsim
 import simpy
 from typing import List, Union, Dict
 import simpy
-from aqnsim.quantum_simulator import qubit_noise
 
 
-from config import CHANNEL_DELAY, NUM_SHOTS, M, N, E, p0, p1, p2, p3, NoiseType
+from config import CHANNEL_DELAY, NUM_SHOTS, M, N, E, p0, p1, p2, p3, NoiseType, Topology, SENDER_BATCH_SIZE, NOISE_BLOCK_SIZE
+from channel_noise import BatchedChannelNoise
+
+# The sender (general 0) is the only general that prepares and sends qubits
+SENDER_NAME = str(0)
+
+def peer_names(name: str, topology: Topology = Topology.Mesh):
+    """Returns the names of the generals that `name` shares a classical link with, and those it shares a
+    quantum link with.
+
+    In the star topology both kinds of link only connect the sender to each receiver. Classical links follow the
+    messages this script actually sends: the sender's round 1 commands. Receivers send nothing (their round 3
+    exchange in `cport_handler` is commented out), so they get no links to each other.
+
+    :param name: The name of the general
+    :param topology: The network topology
+    """
+    others = [str(i) for i in range(N) if str(i) != name]
+    if topology == Topology.Mesh or name == SENDER_NAME:
+        return others, others
+    return [SENDER_NAME], [SENDER_NAME]
 
 class General(aqnsim.Node):
     """A basic network node equipped with a quantum memory (`QMemory`) component.
@@ -18,6 +37,7 @@ class General(aqnsim.Node):
     :param op_delays: A dictionary specifying how much time operations take on the qmem
     :param meas_delay: How much time a measurement takes on the qmem
     :param name: The name of the node
+    :param topology: The network topology, which determines the ports the node gets
     """
 
     def __init__(
@@ -28,16 +48,13 @@ class General(aqnsim.Node):
         op_delays: Dict[str, Dict[int, Union[int, float, aqnsim.DelayModel]]] = None,
         meas_delay: Dict[str, Union[int, float, aqnsim.DelayModel]] = None,
         name=None,
+        topology: Topology = Topology.Mesh,
     ):
-        ports = [] # This will hold all the ports of this General node
-        mem_qports = [] # This will hold the ports that attach to this General node's QMemory
-        for i in range(N):
-            # You add a classical and quantum port for every general other than yourself.
-            # These are named accordingly to all other generals' index/names
-            if (str(i) != name):
-                ports.append(f"cport{i}")
-                ports.append(f"qport{i}")
-                mem_qports.append(f"mem_qport{i}")
+        # You add a classical and quantum port for every general you are linked to.
+        # These are named accordingly to the other generals' index/names
+        self.classical_peers, self.quantum_peers = peer_names(name, topology)
+        ports = [f"cport{i}" for i in self.classical_peers] + [f"qport{i}" for i in self.quantum_peers] # This will hold all the ports of this General node
+        mem_qports = [f"mem_qport{i}" for i in self.quantum_peers] # This will hold the ports that attach to this General node's QMemory
                 
         super().__init__(
             env=env, ports=ports, name=name
@@ -54,10 +71,9 @@ class General(aqnsim.Node):
             name=f"QMemory-{name}",
         )
         self.qmemory.set_op_delays(op_delays=op_delays)
-        for i in range(N):
+        for i in self.quantum_peers:
             # Attach all your QMem ports to your quantum ports.
-            if (str(i) != name):
-                self.qmemory.ports[f"mem_qport{i}"].forward_output_to_output(self.ports[f"qport{i}"])    
+            self.qmemory.ports[f"mem_qport{i}"].forward_output_to_output(self.ports[f"qport{i}"])    
 
 class GeneralProtocol(aqnsim.NodeProtocol):
     """Protocol that we will attach to each of the network nodes.
@@ -67,6 +83,8 @@ class GeneralProtocol(aqnsim.NodeProtocol):
     :param node: The node on which the protocol acts.
     :param name: Name of the protocol.
     :param tx: If `True`, the General prepares and sends the entangled state.
+    :param batch_size: Number of tuples the sender prepares per simulated step, or `None` to prepare and
+        send one qubit per step. The sender's QMemory must hold `N * batch_size` qubits.
     """
 
     def __init__(
@@ -80,21 +98,26 @@ class GeneralProtocol(aqnsim.NodeProtocol):
         tx: bool = False,
         traitor: bool = False,
         isConsistent: bool = False,
+        batch_size: int = SENDER_BATCH_SIZE,
     ):
         super().__init__(env=env, node=node, name=name)
 
         self.qs = qs
         self.qmem = self.node.qmemory
-        for i in range(N):
-            # For all of your ports, add the qport or cport handler
-            if (str(i) != self.node.name):
-                self.node.ports[f"cport{i}"].add_rx_input_handler(self.cport_handler)
-                self.node.ports[f"qport{i}"].add_rx_input_handler(self.qport_handler)
+        # For all of your ports, add the qport or cport handler
+        for i in self.node.classical_peers:
+            self.node.ports[f"cport{i}"].add_rx_input_handler(self.cport_handler)
+        for i in self.node.quantum_peers:
+            self.node.ports[f"qport{i}"].add_rx_input_handler(self.qport_handler)
         self.tx = tx
         self.traitor = traitor
         self.isConsistent = isConsistent
         self.noise_probs = noise_probs
         self.noise_type = noise_type
+        self.channel_noise = self.make_channel_noise(noise_probs, noise_type)
+        self.batch_size = batch_size
+        # Qubits that arrived and wait for the receiver's QMemory, used when the sender sends whole blocks
+        self.arrivals = simpy.Store(env)
 
         # Track correction information gathered from repeater messages
         self.measurement_times = []
@@ -103,6 +126,17 @@ class GeneralProtocol(aqnsim.NodeProtocol):
         self.command_vector = []
         
 
+    def make_channel_noise(self, noise_probs, noise_type):
+        """Returns the batched noise stage for the channel: Pauli noise reads all of `noise_probs`, depolarizing
+        and dephasing noise only read `noise_probs[0]`."""
+        if noise_type == NoiseType.Pauli:
+            return BatchedChannelNoise.pauli(self.qs, noise_probs, block_size=NOISE_BLOCK_SIZE)
+        if noise_type == NoiseType.Depolarizing:
+            return BatchedChannelNoise.depolarizing(self.qs, noise_probs[0], block_size=NOISE_BLOCK_SIZE)
+        if noise_type == NoiseType.Dephasing:
+            return BatchedChannelNoise.dephasing(self.qs, noise_probs[0], block_size=NOISE_BLOCK_SIZE)
+        raise ValueError(f"Unknown noise type {noise_type}")
+
     def cport_handler(self, msg: aqnsim.CMessage):
         """Handler for correction messages that are distributed by the repeaters.  Collects all expected messages
         before performing a correction on the local qubit.
@@ -206,13 +240,25 @@ class GeneralProtocol(aqnsim.NodeProtocol):
         :param msg: A `Qubit` received via the quantum channel.
         
         """
-        if (self.noise_type == NoiseType.Pauli and sum(self.noise_probs) > 0):
-            qubit_noise.apply_pauli_noise(self.qs, self.noise_probs[0], self.noise_probs[1], self.noise_probs[2], self.noise_probs[3], msg)
-        elif (self.noise_type == NoiseType.Depolarizing and self.noise_probs[0] > 0):
-            qubit_noise.apply_depolarizing_noise(self.qs, self.noise_probs[0], msg)
-        elif (self.noise_type == NoiseType.Dephasing and self.noise_probs[0] > 0):
-            qubit_noise.apply_dephasing_noise(self.qs, self.noise_probs[0], msg)
-        
+        if self.batch_size is not None:
+            # A whole block arrives at the same instant, so queue it for the one process that uses the QMemory
+            self.arrivals.put(msg)
+            return
+        yield from self.receive_qubit(msg)
+
+    @aqnsim.process
+    def measure_arrivals(self):
+        """Measures queued qubits one at a time, in arrival order, so at most one operation is ever running on the
+        receiver's QMemory while a block is delivered."""
+        while True:
+            msg = yield self.arrivals.get()
+            yield from self.receive_qubit(msg)
+
+    def receive_qubit(self, msg):
+        # Apply the noise drawn for this qubit; a noiseless channel skips the noise path entirely
+        if self.channel_noise.enabled:
+            self.channel_noise.apply(msg)
+
         # place the qubit into the memory
         self.qmem.put(msg, 0)
         meas_result = yield self.qmem.measure(0)
@@ -298,8 +344,52 @@ class GeneralProtocol(aqnsim.NodeProtocol):
         self.node.ports["cport2"].rx_output(msgC)
                 
         
+    def distribute_batched(self):
+        """Entanglement distribution that sends `batch_size` whole tuples per simulated step.
+
+        The gates are still applied, and their delays yielded, one qubit at a time; what is batched is the
+        `wait(1)` the per-qubit loop takes after every qubit, which is now taken once per block. The whole block
+        reaches each receiver at the same instant, and receivers queue it and measure one qubit at a time
+        (see `measure_arrivals`).
+
+        Tuple `t` of a block occupies QMemory positions `t*N` to `t*N + N-1`: position `t*N` holds the sender's
+        half of the EPR pair and position `t*N + 1 + qubit` holds the qubit for general `qubit+1`, which is the
+        other half of the EPR pair for the tuple's phi+ general and a plus state for everyone else.
+        The sender's halves of the whole block are measured and recorded together.
+        """
+        for block_start in range(0, M, self.batch_size):
+            block = range(block_start, min(block_start + self.batch_size, M))
+            for t, tuple_index in enumerate(block):
+                base = t * N
+                phi_plus_general = tuple_index % (N-1)
+                for position in range(base, base + N):
+                    self.qmem.create_new(position)
+                for qubit in range(N-1):
+                    if (qubit != phi_plus_general):
+                        yield self.qmem.operate(aqnsim.ops.H, qpos=base + 1 + qubit)
+                yield self.qmem.operate(aqnsim.ops.H, qpos=base)
+                yield self.qmem.operate(aqnsim.ops.CNOT, qpos=[base, base + 1 + phi_plus_general])
+                yield self.qmem.operate(aqnsim.ops.X, qpos=base)
+                # Now I have a Phi+ state and N-2 plus states
+
+            # Keep the first index of every tuple in the block
+            block_results = []
+            for t in range(len(block)):
+                meas_result = yield self.qmem.measure(t * N)
+                block_results.append(meas_result)
+            self.measurement_results.extend(block_results)
+            self.measurement_times.extend([self.env.now] * len(block_results))
+
+            # Give the rest away, you add one to qport becuase qubit is indexed from 0 but the non-sender nodes start at 1
+            for t in range(len(block)):
+                for qubit in range(N-1):
+                    self.qmem.pop(t * N + 1 + qubit, port_name=f"mem_qport{qubit+1}")
+            yield self.wait(1) # One step per block instead of one per qubit
+
     def run(self):
         """Main run method for the protocol"""
+        if not self.tx and self.batch_size is not None:
+            self.measure_arrivals()
         for i in range(NUM_SHOTS):
             # yield self.wait(1)
 
@@ -313,31 +403,34 @@ class GeneralProtocol(aqnsim.NodeProtocol):
                 # Entanglement Distribution
                # TODO This gives each player M qubits, instead of M (n-1) tuples of qubits, need to update this
                # Each node has M tuples of size n-1 (there are n-1 general nodes outside of the receiver)
-                for tuple in range(M):
-                    phi_plus_general = tuple % (N-1)
-                    for qubit in range(N-1):
-                        if (qubit == phi_plus_general):
-                            self.qmem.create_new(0)
-                            self.qmem.create_new(1)
-                            yield self.qmem.operate(aqnsim.ops.H, qpos=0)
-                            yield self.qmem.operate(aqnsim.ops.CNOT, qpos=[0, 1])
-                            yield self.qmem.operate(aqnsim.ops.X, qpos=0)
-                            # Now I have a Phi+ state
+                if self.batch_size is not None:
+                    yield from self.distribute_batched()
+                else:
+                    for tuple in range(M):
+                        phi_plus_general = tuple % (N-1)
+                        for qubit in range(N-1):
+                            if (qubit == phi_plus_general):
+                                self.qmem.create_new(0)
+                                self.qmem.create_new(1)
+                                yield self.qmem.operate(aqnsim.ops.H, qpos=0)
+                                yield self.qmem.operate(aqnsim.ops.CNOT, qpos=[0, 1])
+                                yield self.qmem.operate(aqnsim.ops.X, qpos=0)
+                                # Now I have a Phi+ state
                             
-                            # Keep the first index
-                            meas_result = yield self.qmem.measure(0)
-                            self.measurement_results.append(meas_result)
-                            self.measurement_times.append(self.env.now)
+                                # Keep the first index
+                                meas_result = yield self.qmem.measure(0)
+                                self.measurement_results.append(meas_result)
+                                self.measurement_times.append(self.env.now)
                             
-                            # Give the second index away, you add one to qport becuase qubit is indexed from 0 but the non-sender nodes start at 1
-                            self.qmem.pop(1, port_name=f"mem_qport{qubit+1}")
-                        else:
-                            # If you're not the special node you receive a plus state
-                            self.qmem.create_new(0)
-                            yield self.qmem.operate(aqnsim.ops.H, qpos=0)
-                            # I now have a plus state
-                            self.qmem.pop(0, port_name=f"mem_qport{qubit+1}")
-                        yield self.wait(1) # You need this wait or Qmems are busy while receiving more data
+                                # Give the second index away, you add one to qport becuase qubit is indexed from 0 but the non-sender nodes start at 1
+                                self.qmem.pop(1, port_name=f"mem_qport{qubit+1}")
+                            else:
+                                # If you're not the special node you receive a plus state
+                                self.qmem.create_new(0)
+                                yield self.qmem.operate(aqnsim.ops.H, qpos=0)
+                                # I now have a plus state
+                                self.qmem.pop(0, port_name=f"mem_qport{qubit+1}")
+                            yield self.wait(1) # You need this wait or Qmems are busy while receiving more data
                                            
                             
             
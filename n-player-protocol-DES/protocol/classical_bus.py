@@ -0,0 +1,64 @@
+import aqnsim
+from dataclasses import dataclass
+from protocol.config import SimulationConfig
+from protocol.delays import LinkDelaySampler
+
+"""
+DEFINE SHARED CLASSICAL BROADCAST MEDIUM
+"""
+
+@dataclass
+class BusFrame:
+    destinations: list[str]
+    message: aqnsim.CMessage
+
+
+class ClassicalBus(aqnsim.Node):
+    """
+    Shared classical medium that replaces the N*(N-1) point-to-point ClassicalLinks.
+    Every player is attached through a single zero-delay link, and the bus delivers each frame to its
+    destinations after the delay the point-to-point link to that destination would have had.
+    """
+    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, sim_config: SimulationConfig, delay_sampler: LinkDelaySampler | None = None):
+        self.sim_config = sim_config
+        self.player_names = [self.sim_config.COMMANDER_NAME] + self.sim_config.LIEUTENANT_NAMES
+
+        super().__init__(
+            sim_context=sim_context,
+            ports=self.player_names,
+            name=name
+        )
+
+        # Per-destination delays, falling back to the per-link sampler and then to CLASSICAL_CHANNEL_DELAY
+        self.delays = dict(self.sim_config.CLASSICAL_BUS_DELAYS or {})
+        self.delay_sampler = delay_sampler
+
+    def delay(self, source: str, destination: str) -> float:
+        if destination in self.delays:
+            return self.delays[destination]
+        if self.delay_sampler is not None:
+            return self.delay_sampler.classical_delay(source, destination)
+        return self.sim_config.CLASSICAL_CHANNEL_DELAY
+
+
+class ClassicalBusProtocol(aqnsim.NodeProtocol):
+    def __init__(self, sim_context: aqnsim.SimulationContext, node: ClassicalBus):
+        super().__init__(sim_context=sim_context, node=node, name=node.name)
+
+        for player_name in self.node.player_names:
+            self.node.ports[player_name].add_rx_input_handler(
+                handler=lambda msg, source=player_name: self.frame_handler(msg=msg, source=source)
+            )
+
+    @aqnsim.process
+    def frame_handler(self, msg: aqnsim.CMessage, source: str):
+        """Deliver a frame to its destinations in order of increasing delay, waiting only for the differences."""
+        if isinstance(msg, aqnsim.CMessage) and isinstance(msg.content, BusFrame):
+            frame = msg.content
+            schedule = sorted((self.node.delay(source, destination), destination) for destination in frame.destinations)
+            elapsed = 0
+            for delay, destination in schedule:
+                if delay > elapsed:
+                    yield self.wait(delay - elapsed)
+                    elapsed = delay
+                self.node.ports[destination].rx_output(frame.message)
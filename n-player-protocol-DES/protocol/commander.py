@@ -1,7 +1,8 @@
 import aqnsim
-from dataclasses import dataclass, field
-from protocol.players import Player
+from protocol.players import Player, DistributionBarrier
 from protocol.config import SimulationConfig
+from protocol.traffic import TrafficLog
+from protocol.rules import Round1Message, CommanderCMemory, CommanderRules
 # from protocol.config import (
 #     COMMANDER_NAME, COMMANDER_IS_TRAITOR, LOYAL_COMMANDER_ORDER, COMMANDER_QMEMORY_ADDR,
 #     LIEUTENANT_NAMES, TRAITOR_INDICES,
@@ -10,100 +11,99 @@ from protocol.config import SimulationConfig
 #     SEND_ORDER_ACTION, SEND_CV_ACTION, ROUND2_ACTION, ROUND3_ACTION
 # )
 
-@dataclass
-class CommanderCMemory:
-    name: str
-    orders: list[bool]
-    is_traitor: bool = False
-    bit_vector: list[bool | None] = field(default_factory=list)
-    command_vectors:  dict[int, list[bool | None]] = field(default_factory=dict)
-
-
-class Commander(Player):
-    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, orders: list[bool], is_traitor: bool, sim_config: SimulationConfig):
+class Commander(Player, CommanderRules):
+    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, orders: list[list[bool]], is_traitor: bool, sim_config: SimulationConfig, distribution_barriers: list[DistributionBarrier] | None = None, traffic_log: TrafficLog | None = None):
+        """`orders` holds one list of per-lieutenant orders for each (instance, bit) slot."""
         
-        
-        super().__init__(sim_context=sim_context, name=name, sim_config=sim_config)
+        super().__init__(sim_context=sim_context, name=name, sim_config=sim_config, distribution_barriers=distribution_barriers, traffic_log=traffic_log)
 
         # Quantum Memory is initialized by the parent Player class
 
-        # Setup Classical Memory
-        self.memory = CommanderCMemory(name=name, orders=orders, is_traitor=is_traitor, bit_vector = self.bit_vector)  # Shared reference for bit_vector!
+        # Setup Classical Memory, one per (instance, bit) slot
+        self.memories = [
+            CommanderCMemory(name=name, orders=instance_orders, is_traitor=is_traitor, bit_vector = bit_vector)  # Shared reference for bit_vector!
+            for instance_orders, bit_vector in zip(orders, self.bit_vectors)
+        ]
+        self.memory = self.memories[0]
         self.data_collector.register_attribute("M")
         self.data_collector.update_attribute("M", self.sim_config.M)
         self.data_collector.register_attribute("Config")
         self.data_collector.update_attribute("Config", self.sim_config)
-
-    def construct_command_vectors(self):
+        self.data_collector.register_attribute("DistributionTime")
+        # The log fills in as the rounds run, so it is registered once here and read after the simulation
+        self.data_collector.register_attribute("Traffic")
+        if traffic_log is not None:
+            self.data_collector.update_attribute("Traffic", traffic_log)
+
+    def construct_command_vectors(self, slot: int = 0):
+        memory = self.memories[slot]
         for idx in range(self.sim_config.NUM_LIEUTENANTS):
-            self.memory.command_vectors[idx] = self._construct_command_vector(idx)
-
-    def _construct_command_vector(self, lieutenant_index: int) -> list[bool | None]:
-        """
-        Construct a command vector for a given lieutenant based on Alice's bit string.
-        This function uses a simple scheme: reveal tuples that correspond to this lieutenant's entangled positions, 
-        hide others with placeholders.
-        """
-        command_vector = []
-        tuple_length = self.sim_config.N - 1
-        
-        if lieutenant_index >= len(self.memory.orders):
-            raise IndexError(f"No order specified for lieutenant {lieutenant_index}")
-            
-        order_for_lieutenant = self.memory.orders[lieutenant_index]
-        
-        for k in range(self.sim_config.M):
-            start_index = k * tuple_length
-            end_index = (k + 1) * tuple_length
-            tuple_k = self.memory.bit_vector[start_index:end_index]
-            if self.memory.bit_vector[k*(self.sim_config.NUM_LIEUTENANTS) + lieutenant_index] == order_for_lieutenant:
-                command_vector.extend(tuple_k)
-            else:
-                command_vector.extend(tuple_length * [None])
-        
-        return command_vector
+            memory.command_vectors[idx] = self._construct_command_vector(memory, idx)
 
 class CommanderProtocol(aqnsim.NodeProtocol):
     def __init__(self, sim_context: aqnsim.SimulationContext, node: Commander):
         super().__init__(sim_context=sim_context, node=node, name=node.name)
 
         self.player = node
-        self.player.ports[self.node.sim_config.DISTRIBUTOR_NAME].add_rx_input_handler(
-            handler=lambda msg: self.quantum_port_source_handler(msg=msg)
-        )
+        for source_index, distributor_name in enumerate(self.node.sim_config.DISTRIBUTOR_NAMES):
+            self.player.ports[distributor_name].add_rx_input_handler(
+                handler=lambda msg, source_index=source_index: self.quantum_port_source_handler(msg=msg, source_index=source_index)
+            )
 
         # Don't need a classical port handler because don't recieve any communication clasically
 
     @aqnsim.process
-    def quantum_port_source_handler(self, msg: aqnsim.Qubit):
+    def quantum_port_source_handler(self, msg: aqnsim.Qubit, source_index: int = 0):
         
         if isinstance(msg, aqnsim.Qubit):
-            self.player.qmemory.positions[0].put(qubit=msg)
-            yield self.player.measure_qubit() 
+            self.player.qmemory.positions[source_index].put(qubit=msg)
+            yield self.player.measure_qubit(source_index) 
 
 
     @aqnsim.process
     def run(self):
 
-        entanglement_distribution_wait_time = self.node.sim_config.M * self.node.sim_config.NUM_LIEUTENANTS * 1 # Assuming 1 unit of time per round of distributing single qubits
-        yield self.wait(entanglement_distribution_wait_time + 5)  # Tune this to start after entanglement distribution. TODO: Parameterize further if entanglement time parameterized 
+        # Instances are served in order; each starts round 1 the moment every player's bit vector for it is full,
+        # so the rounds of one instance overlap the distribution of the next
+        previous_completed_at = self.node.distribution_barriers[0].started_at
+        for instance, barrier in enumerate(self.node.distribution_barriers):
+            yield barrier.wait()
+            distribution_time = barrier.completed_at - previous_completed_at
+            previous_completed_at = barrier.completed_at
+            self.simlogger.info(f"Entanglement distribution of instance {instance} complete after {distribution_time}")
+            self.node.data_collector.update_attribute("DistributionTime", distribution_time)
 
-        # Round 1-2: Send
-        self.node.construct_command_vectors()
-
-        for idx, lieutenant_name in enumerate(self.node.sim_config.LIEUTENANT_NAMES):
-
-            order = self.node.memory.orders[idx]
-            order_message = aqnsim.CMessage(
-                sender=self.node.name, action=self.node.sim_config.SEND_ORDER_ACTION, content=order
-            )
-            self.node.ports[lieutenant_name].rx_output(order_message)
+            yield self.send_round1(instance)
 
-            command_vector = self.node.memory.command_vectors[idx]
-            cv_message = aqnsim.CMessage(
-                sender=self.node.name, action=self.node.sim_config.SEND_CV_ACTION, content=command_vector
-            )
-            self.node.ports[lieutenant_name].rx_output(cv_message)
+    @aqnsim.process
+    def send_round1(self, instance: int):
+        bits = self.node.sim_config.BITS_PER_AGREEMENT
+        slots = range(instance * bits, (instance + 1) * bits)
 
-            self.node.data_collector.update_attribute(self.name, {"is_traitor":self.node.memory.is_traitor, "orders":self.node.memory.orders})
-            # All done!
\ No newline at end of file
+        # Round 1-2: Send
+        for slot in slots:
+            self.node.construct_command_vectors(slot)
+
+        chunk_tuples = self.node.sim_config.CV_CHUNK_TUPLES or self.node.sim_config.M
+        serialization_delay = self.node.sim_config.CV_TUPLE_SERIALIZATION_DELAY
+        tuple_length = self.node.sim_config.N - 1
+        # Stream every command vector block by block, so lieutenants can verify a block while the next is serialized.
+        # Each message carries the same block of every bit's command vector.
+        for start_tuple in range(0, self.node.sim_config.M, chunk_tuples):
+            end_tuple = min(start_tuple + chunk_tuples, self.node.sim_config.M)
+            if serialization_delay:
+                yield self.wait(serialization_delay * (end_tuple - start_tuple) * bits)
+            for idx, lieutenant_name in enumerate(self.node.sim_config.LIEUTENANT_NAMES):
+                messages = []
+                for slot in slots:
+                    memory = self.node.memories[slot]
+                    command_vector = memory.command_vectors[idx]
+                    if end_tuple - start_tuple < self.node.sim_config.M:
+                        command_vector = command_vector[start_tuple * tuple_length:end_tuple * tuple_length]
+                    messages.append(Round1Message(order=memory.orders[idx], command_vector=command_vector, start_tuple=start_tuple))
+                self.node.multicast([lieutenant_name], self.node.sim_config.ROUND1_ACTION, tuple(messages), instance=instance)
+
+        for bit, slot in enumerate(slots):
+            memory = self.node.memories[slot]
+            self.node.data_collector.update_attribute(self.name, {"instance": instance, "bit": bit, "is_traitor":memory.is_traitor, "orders":memory.orders})
+        # All done!
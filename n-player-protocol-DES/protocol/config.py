@@ -1,4 +1,7 @@
 import aqnsim
+import hashlib
+import json
+import random
 
 # ---------------------------
 # User-defined Parameters
@@ -50,6 +53,43 @@ import aqnsim
 #     "TRAITOR_INDICES must be a subset of valid lieutenant indices!"
 # )
 
+def encode_json(value):
+    """
+    JSON-ready form of a config value, or of anything built from configs, lists, tuples and dicts. Tuples and
+    dicts with non-string keys are tagged so decode_json restores them exactly. Raises ValueError for any other
+    object, such as a noise model, which has no faithful JSON form.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, SimulationConfig):
+        return {"__config__": encode_json(vars(value))}
+    if isinstance(value, list):
+        return [encode_json(v) for v in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_json(v) for v in value]}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) and not k.startswith("__") for k in value):
+            return {k: encode_json(v) for k, v in value.items()}
+        return {"__items__": [[encode_json(k), encode_json(v)] for k, v in value.items()]}
+    raise ValueError(f"{type(value).__qualname__} has no JSON form")
+
+def decode_json(value):
+    """Inverse of encode_json."""
+    if isinstance(value, list):
+        return [decode_json(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__config__" in value:
+        config = SimulationConfig.__new__(SimulationConfig)
+        config.__dict__.update(decode_json(value["__config__"]))
+        return config
+    if "__tuple__" in value:
+        return tuple(decode_json(v) for v in value["__tuple__"])
+    if "__items__" in value:
+        return {decode_json(k): decode_json(v) for k, v in value["__items__"]}
+    return {k: decode_json(v) for k, v in value.items()}
+
+
 class SimulationConfig:
     def __init__(self,
                  COMMANDER_NAME="Alice",
@@ -63,7 +103,25 @@ class SimulationConfig:
                  QSOURCE_NOISE_MODEL=None,
                  QUANTUM_CHANNEL_DELAY=None,
                  QUANTUM_CHANNEL_NOISE=0.0,
-                 CLASSICAL_CHANNEL_DELAY=None):
+                 CLASSICAL_CHANNEL_DELAY=None,
+                 NUM_DISTRIBUTORS=1,
+                 CLASSICAL_BUS=False,
+                 CLASSICAL_BUS_DELAYS=None,
+                 HASH_REFERENCED_PROOFS=False,
+                 INCREMENTAL_ROUND2=False,
+                 SHORT_CIRCUIT_VERIFICATION=False,
+                 ROUND_DEADLINE=None,
+                 CV_CHUNK_TUPLES=None,
+                 CV_TUPLE_SERIALIZATION_DELAY=0,
+                 CLASSICAL_DELAY_SPECS=None,
+                 QUANTUM_DELAY_SPECS=None,
+                 DELAY_SAMPLING="link",
+                 SEED=None,
+                 NUM_INSTANCES=1,
+                 BITS_PER_AGREEMENT=1,
+                 COMMANDER_VALUE=None,
+                 ENTANGLEMENT_POOL=None,
+                 WIRE_COMPRESSION=False):
         
         # Default values for mutable arguments
         if LIEUTENANT_NAMES is None:
@@ -83,12 +141,31 @@ class SimulationConfig:
         self.COMMANDER_IS_TRAITOR = COMMANDER_IS_TRAITOR
         self.TRAITOR_INDICES = TRAITOR_INDICES
         self.LOYAL_COMMANDER_ORDER = LOYAL_COMMANDER_ORDER
+        # Round 3 evidence references command vectors from round 2 by hash instead of resending them
+        self.HASH_REFERENCED_PROOFS = HASH_REFERENCED_PROOFS
+        # Verify each round 2 bundle on arrival instead of all at once when the last one lands
+        self.INCREMENTAL_ROUND2 = INCREMENTAL_ROUND2
+        # Skip round 2 verifications whose result cannot change the intermediate decision
+        self.SHORT_CIRCUIT_VERIFICATION = SHORT_CIRCUIT_VERIFICATION
+        self.NUM_DISTRIBUTORS = NUM_DISTRIBUTORS
+        # Agreement instances pipelined on one network: distribution of instance k+1 overlaps the rounds of instance k
+        self.NUM_INSTANCES = NUM_INSTANCES
+        # Each instance agrees on this many bits, from one distribution phase of M tuples per bit and one message
+        # exchange per round carrying every bit's payload
+        self.BITS_PER_AGREEMENT = BITS_PER_AGREEMENT
+        # The BITS_PER_AGREEMENT-bit value a loyal commander orders, bit k of every instance ordering COMMANDER_VALUE[k];
+        # defaults to LOYAL_COMMANDER_ORDER for every bit
+        self.COMMANDER_VALUE = tuple(COMMANDER_VALUE) if COMMANDER_VALUE is not None else (LOYAL_COMMANDER_ORDER,) * BITS_PER_AGREEMENT
+        # Path of a pool built by protocol.entanglement_pool; when set, instances take their bit vectors from fresh
+        # pool blocks instead of running a distribution phase
+        self.ENTANGLEMENT_POOL = ENTANGLEMENT_POOL
         
         # Action names
-        self.SEND_ORDER_ACTION = "SEND_ORDER"
-        self.SEND_CV_ACTION = "SEND_CV"
+        self.ROUND1_ACTION = "ROUND1_ACTION"  # Order and command vector (or one block of it) in a single message
         self.ROUND2_ACTION = "ROUND2_ACTION"
         self.ROUND3_ACTION = "ROUND3_ACTION"
+        self.CV_REQUEST_ACTION = "CV_REQUEST"
+        self.CV_RESPONSE_ACTION = "CV_RESPONSE"
         
         # Channel parameters
         self.SEC = SEC
@@ -96,15 +173,104 @@ class SimulationConfig:
         self.QUANTUM_CHANNEL_DELAY = QUANTUM_CHANNEL_DELAY
         self.QUANTUM_CHANNEL_NOISE = QUANTUM_CHANNEL_NOISE
         self.CLASSICAL_CHANNEL_DELAY = CLASSICAL_CHANNEL_DELAY
+        # zlib-compress messages in the binary wire format (protocol.wire), as counted by the traffic log and sent by
+        # the localhost runtime
+        self.WIRE_COMPRESSION = WIRE_COMPRESSION
+        # Length of each synchronous round after distribution; None waits for every message indefinitely
+        self.ROUND_DEADLINE = ROUND_DEADLINE
+        # Command vectors are streamed in blocks of CV_CHUNK_TUPLES tuples (None sends each whole), and
+        # the commander spends CV_TUPLE_SERIALIZATION_DELAY per tuple putting them on the wire
+        self.CV_CHUNK_TUPLES = CV_CHUNK_TUPLES
+        self.CV_TUPLE_SERIALIZATION_DELAY = CV_TUPLE_SERIALIZATION_DELAY
+        # Shared classical bus instead of point-to-point links; CLASSICAL_BUS_DELAYS maps destination names to delays
+        self.CLASSICAL_BUS = CLASSICAL_BUS
+        self.CLASSICAL_BUS_NAME = "ClassicalBus"
+        self.CLASSICAL_BUS_DELAYS = CLASSICAL_BUS_DELAYS
+        # Heterogeneous links: delay specs per pair of node names (see protocol.delays), drawn once per link or,
+        # on the classical bus, once per message; SEED makes the draws reproducible
+        self.CLASSICAL_DELAY_SPECS = CLASSICAL_DELAY_SPECS
+        self.QUANTUM_DELAY_SPECS = QUANTUM_DELAY_SPECS
+        self.DELAY_SAMPLING = DELAY_SAMPLING
+        self.SEED = SEED
         
         # Derived parameters
         self.N = 1 + len(self.LIEUTENANT_NAMES)
         self.COMMANDER_QMEMORY_ADDR = self.N - 1
         self.NUM_PLAYERS = self.N
         self.NUM_LIEUTENANTS = self.N - 1
+        self.TUPLES_PER_INSTANCE = self.M * self.BITS_PER_AGREEMENT
+        # One slot per (instance, bit) agreement; slot = instance * BITS_PER_AGREEMENT + bit
+        self.NUM_SLOTS = self.NUM_INSTANCES * self.BITS_PER_AGREEMENT
+        # A single source keeps the plain DISTRIBUTOR_NAME; parallel sources are numbered
+        if self.NUM_DISTRIBUTORS == 1:
+            self.DISTRIBUTOR_NAMES = [self.DISTRIBUTOR_NAME]
+        else:
+            self.DISTRIBUTOR_NAMES = [f"{self.DISTRIBUTOR_NAME}-{s}" for s in range(self.NUM_DISTRIBUTORS)]
         
         # Validation
         valid_indices = set(range(len(self.LIEUTENANT_NAMES)))
         assert set(self.TRAITOR_INDICES).issubset(valid_indices), (
             "TRAITOR_INDICES must be a subset of valid lieutenant indices!"
-        )
\ No newline at end of file
+        )
+        assert 1 <= self.NUM_DISTRIBUTORS <= self.M, (
+            "NUM_DISTRIBUTORS must be between 1 and M!"
+        )
+        assert self.NUM_INSTANCES >= 1, (
+            "NUM_INSTANCES must be at least 1!"
+        )
+        assert self.BITS_PER_AGREEMENT >= 1, (
+            "BITS_PER_AGREEMENT must be at least 1!"
+        )
+        assert len(self.COMMANDER_VALUE) == self.BITS_PER_AGREEMENT, (
+            "COMMANDER_VALUE must have one order per bit of BITS_PER_AGREEMENT!"
+        )
+        assert self.ROUND_DEADLINE is None or self.ROUND_DEADLINE > 0, (
+            "ROUND_DEADLINE must be positive!"
+        )
+        assert self.DELAY_SAMPLING in ("link", "message"), (
+            "DELAY_SAMPLING must be 'link' or 'message'!"
+        )
+        assert self.DELAY_SAMPLING == "link" or self.CLASSICAL_BUS, (
+            "Per-message delay sampling needs CLASSICAL_BUS, point-to-point links have a fixed delay!"
+        )
+        assert self.CV_CHUNK_TUPLES is None or self.CV_CHUNK_TUPLES > 0, (
+            "CV_CHUNK_TUPLES must be positive!"
+        )
+
+    def distributor_shard(self, source_index: int) -> range:
+        """
+        Contiguous block of the TUPLES_PER_INSTANCE tuple indices served by distributor `source_index`.
+        Shards are laid out in distributor order, so concatenating per-source results in that order
+        reproduces the tuple ordering of a single distributor.
+        """
+        start = source_index * self.TUPLES_PER_INSTANCE // self.NUM_DISTRIBUTORS
+        end = (source_index + 1) * self.TUPLES_PER_INSTANCE // self.NUM_DISTRIBUTORS
+        return range(start, end)
+
+    def loyal_order(self, slot: int) -> bool:
+        """The order a loyal commander gives every lieutenant in `slot`: its bit of COMMANDER_VALUE."""
+        return self.COMMANDER_VALUE[slot % self.BITS_PER_AGREEMENT]
+
+    def random_stream(self, name: str) -> random.Random:
+        """
+        Generator for the protocol's own random draws made by player `name`, e.g. a traitor's votes. Seeded from SEED
+        and the name, so the draws repeat with SEED and do not depend on the order the players make them in.
+        """
+        return random.Random(None if self.SEED is None else f"{self.SEED}:{name}")
+
+    def run_key(self) -> str:
+        """
+        Deterministic identity of a run: a hash of every configuration value, SEED included. Two runs with the same
+        key simulate the same protocol on the same random draws, so one's stored outcome stands in for the other's.
+        """
+        def canonical(value):
+            if value is None or isinstance(value, (bool, int, float, str)):
+                return value
+            if isinstance(value, (list, tuple)):
+                return [canonical(v) for v in value]
+            if isinstance(value, dict):
+                return {repr(k): canonical(v) for k, v in value.items()}
+            if hasattr(value, "__dict__"):  # e.g. a noise model; repr would include its address
+                return {type(value).__qualname__: canonical(vars(value))}
+            return repr(value)
+        return hashlib.sha256(json.dumps(canonical(vars(self)), sort_keys=True).encode()).hexdigest()
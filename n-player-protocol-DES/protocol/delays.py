@@ -0,0 +1,62 @@
+import random
+from protocol.config import SimulationConfig
+
+"""
+DEFINE LINK DELAY DISTRIBUTIONS
+"""
+
+# A delay spec is either a number, used as a fixed delay, or a tuple naming a distribution and its parameters:
+#   ("uniform", low, high), ("normal", mean, std), ("lognormal", mu, sigma), ("exponential", mean)
+# Normal samples are clipped at zero.
+
+def sample_delay(spec, rng: random.Random) -> float:
+    if isinstance(spec, (int, float)):
+        return spec
+    kind, *params = spec
+    if kind == "uniform":
+        return rng.uniform(*params)
+    if kind == "normal":
+        return max(0.0, rng.gauss(*params))
+    if kind == "lognormal":
+        return rng.lognormvariate(*params)
+    if kind == "exponential":
+        return rng.expovariate(1 / params[0])
+    raise ValueError(f"Unknown delay distribution {kind}")
+
+
+class LinkDelaySampler:
+    """
+    Draws per-link delays from CLASSICAL_DELAY_SPECS and QUANTUM_DELAY_SPECS.
+    Specs are keyed by the pair of node names a link joins, in either order, with "*" as the spec for every other
+    link; links without a spec keep CLASSICAL_CHANNEL_DELAY or QUANTUM_CHANNEL_DELAY.
+    With DELAY_SAMPLING="link" a link keeps the delay drawn for it first, with "message" every classical message
+    draws a fresh one, which only the shared classical bus can apply.
+    """
+    def __init__(self, sim_config: SimulationConfig):
+        self.sim_config = sim_config
+        self.rng = random.Random(sim_config.SEED)
+        self.link_delays: dict[tuple[str, frozenset[str]], float] = {}
+
+    @staticmethod
+    def _spec(specs, a: str, b: str, default):
+        if not specs:
+            return default
+        for key in ((a, b), (b, a), "*"):
+            if key in specs:
+                return specs[key]
+        return default
+
+    def _link_delay(self, kind: str, specs, default, a: str, b: str) -> float:
+        key = (kind, frozenset((a, b)))
+        if key not in self.link_delays:
+            self.link_delays[key] = sample_delay(self._spec(specs, a, b, default), self.rng)
+        return self.link_delays[key]
+
+    def quantum_delay(self, a: str, b: str) -> float:
+        return self._link_delay("quantum", self.sim_config.QUANTUM_DELAY_SPECS, self.sim_config.QUANTUM_CHANNEL_DELAY, a, b)
+
+    def classical_delay(self, a: str, b: str) -> float:
+        if self.sim_config.DELAY_SAMPLING == "message":
+            spec = self._spec(self.sim_config.CLASSICAL_DELAY_SPECS, a, b, self.sim_config.CLASSICAL_CHANNEL_DELAY)
+            return sample_delay(spec, self.rng)
+        return self._link_delay("classical", self.sim_config.CLASSICAL_DELAY_SPECS, self.sim_config.CLASSICAL_CHANNEL_DELAY, a, b)
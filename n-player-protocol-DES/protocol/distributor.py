@@ -9,10 +9,12 @@ from protocol.config import SimulationConfig
 
 
 class Distributor(aqnsim.Node):
-    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, sim_config: SimulationConfig):
+    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, sim_config: SimulationConfig, shard: range | None = None):
         # importlib.reload(config)
         # from protocol.config import M
         self.sim_config = sim_config
+        # Tuple indices this source is responsible for; a lone distributor serves all of them
+        self.shard = range(sim_config.TUPLES_PER_INSTANCE) if shard is None else shard
         
         super().__init__(
             sim_context=sim_context,
@@ -50,28 +52,26 @@ class DistributorProtocol(aqnsim.NodeProtocol):
 
     @aqnsim.process
     def run(self):
-        current_tuple = 0
-        while (current_tuple < self.node.sim_config.M):
+        # The shard is served once per agreement instance, so instance k+1 is distributed while k runs its rounds
+        for instance in range(self.node.sim_config.NUM_INSTANCES):
+            for current_tuple in self.distributor.shard:
 
-            for j in range(self.node.sim_config.NUM_LIEUTENANTS):
-                ### Distribute EPR Pair ###
-                alice_idx = self.node.sim_config.COMMANDER_QMEMORY_ADDR  # Distributor prepares Alice's qubit in the N'th qmemory slot 
-                player_j_idx = j % self.node.sim_config.NUM_LIEUTENANTS # Distributor prepares the Lieutenant's qubits in the first (N-1) qmemory slots
-                player_name = self.node.sim_config.LIEUTENANT_NAMES[player_j_idx]
-                yield self.distributor.create_epr_pair(alice_idx, player_j_idx)
-                self.distributor.qmemory.positions[alice_idx].pop_replace(self.node.sim_config.COMMANDER_NAME)
-                self.distributor.qmemory.positions[player_j_idx].pop_replace(player_name)
-                # self.simlogger.info(f"EPR Pair ready for {COMMANDER_NAME} and {player_name} at indices {alice_idx} and {player_j_idx}")
+                for j in range(self.node.sim_config.NUM_LIEUTENANTS):
+                    ### Distribute EPR Pair ###
+                    alice_idx = self.node.sim_config.COMMANDER_QMEMORY_ADDR  # Distributor prepares Alice's qubit in the N'th qmemory slot 
+                    player_j_idx = j % self.node.sim_config.NUM_LIEUTENANTS # Distributor prepares the Lieutenant's qubits in the first (N-1) qmemory slots
+                    player_name = self.node.sim_config.LIEUTENANT_NAMES[player_j_idx]
+                    yield self.distributor.create_epr_pair(alice_idx, player_j_idx)
+                    self.distributor.qmemory.positions[alice_idx].pop_replace(self.node.sim_config.COMMANDER_NAME)
+                    self.distributor.qmemory.positions[player_j_idx].pop_replace(player_name)
+                    # self.simlogger.info(f"EPR Pair ready for {COMMANDER_NAME} and {player_name} at indices {alice_idx} and {player_j_idx}")
                 
-                ### Distribute |+> States ###
-                for player_k_idx in range(self.node.sim_config.NUM_LIEUTENANTS):
-                    if player_k_idx == player_j_idx:
-                        continue
-                    yield self.distributor.create_plus_state(player_k_idx)
-                    player_name = self.node.sim_config.LIEUTENANT_NAMES[player_k_idx]
-                    self.distributor.qmemory.positions[player_k_idx].pop_replace(player_name)
+                    ### Distribute |+> States ###
+                    for player_k_idx in range(self.node.sim_config.NUM_LIEUTENANTS):
+                        if player_k_idx == player_j_idx:
+                            continue
+                        yield self.distributor.create_plus_state(player_k_idx)
+                        player_name = self.node.sim_config.LIEUTENANT_NAMES[player_k_idx]
+                        self.distributor.qmemory.positions[player_k_idx].pop_replace(player_name)
                     
-                yield self.wait(1)  # TODO: Can parameterize wait time
-
-            ### Wait for each player to receive and measure their qubit ###
-            current_tuple += 1
+                    yield self.wait(1)  # TODO: Can parameterize wait time
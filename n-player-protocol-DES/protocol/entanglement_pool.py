@@ -0,0 +1,146 @@
+import aqnsim
+import fcntl
+import json
+import os
+import numpy as np
+from protocol.config import SimulationConfig
+from protocol.delays import LinkDelaySampler
+from protocol.distributor import DistributorProtocol
+from protocol.players import DistributionBarrier, Player
+
+"""
+DEFINE PRE-DISTRIBUTED ENTANGLEMENT POOL
+"""
+
+# A pool is three files: the bit matrices at `path`, shaped (blocks, players, (N-1)*M) with one uint8 per measured
+# bit, the pool's shape at `path`.json and the index of the next unused block at `path`.cursor
+
+
+class EntanglementPool:
+    """
+    Memory-mapped store of measured bit vectors, one block of M tuples per agreement slot.
+    Blocks are handed out through a cursor file under an exclusive lock, so concurrent runs reading the same pool
+    never reuse correlations.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(f"{path}.json") as f:
+            self.meta = json.load(f)
+        self.player_names = self.meta["player_names"]
+        self.bits = np.memmap(path, dtype=np.uint8, mode="r", shape=(self.meta["blocks"], len(self.player_names), self.meta["width"]))
+
+    @property
+    def num_blocks(self) -> int:
+        return self.meta["blocks"]
+
+    def check(self, sim_config: SimulationConfig):
+        """Raises ValueError if the pool was built for different players or a different M."""
+        expected = [sim_config.COMMANDER_NAME] + sim_config.LIEUTENANT_NAMES
+        if self.player_names != expected or self.meta["M"] != sim_config.M:
+            raise ValueError(f"Pool {self.path} holds M={self.meta['M']} for {self.player_names}, not M={sim_config.M} for {expected}")
+
+    def take(self, count: int) -> range:
+        """Reserve the next `count` unused blocks."""
+        with open(f"{self.path}.cursor", "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                start = int(f.read() or 0)
+                if start + count > self.num_blocks:
+                    raise RuntimeError(f"Pool {self.path} has {self.num_blocks - start} unused blocks, {count} requested")
+                f.seek(0)
+                f.truncate()
+                f.write(str(start + count))
+                f.flush()  # The next holder of the lock must read the new cursor
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return range(start, start + count)
+
+    def bit_vector(self, block: int, player_name: str) -> list[bool]:
+        return self.bits[block, self.player_names.index(player_name)].astype(bool).tolist()
+
+
+class PoolPlayerProtocol(aqnsim.NodeProtocol):
+    """Measures every qubit a player receives and nothing else; the classical rounds do not run while building a pool."""
+    def __init__(self, sim_context: aqnsim.SimulationContext, node: Player):
+        super().__init__(sim_context=sim_context, node=node, name=node.name)
+
+        for source_index, distributor_name in enumerate(self.node.sim_config.DISTRIBUTOR_NAMES):
+            self.node.ports[distributor_name].add_rx_input_handler(
+                handler=lambda msg, source_index=source_index: self.quantum_port_source_handler(msg=msg, source_index=source_index)
+            )
+
+    @aqnsim.process
+    def quantum_port_source_handler(self, msg: aqnsim.Qubit, source_index: int = 0):
+
+        if isinstance(msg, aqnsim.Qubit):
+            self.node.qmemory.positions[source_index].put(qubit=msg)
+            yield self.node.measure_qubit(source_index)
+
+
+def load_from_pool(sim_config: SimulationConfig, players: list[Player], distribution_barriers: list[DistributionBarrier]):
+    """
+    Fills every slot's bit vectors from fresh blocks of the pool at ENTANGLEMENT_POOL and completes every
+    distribution barrier at once, so all instances start round 1 at time zero.
+    """
+    pool = EntanglementPool(sim_config.ENTANGLEMENT_POOL)
+    pool.check(sim_config)
+    for slot, block in enumerate(pool.take(sim_config.NUM_SLOTS)):
+        for player in players:
+            player.bit_vectors[slot][:] = pool.bit_vector(block, player.name)
+    for barrier in distribution_barriers:
+        for player in players:
+            barrier.signal(player.name)
+
+
+def build_pool(path: str, sim_config: SimulationConfig) -> EntanglementPool:
+    """
+    Offline distribution stage: runs the Distributor logic for every slot of `sim_config` (NUM_INSTANCES times
+    BITS_PER_AGREEMENT blocks) and writes each player's measured bit vectors to a new pool at `path`.
+    """
+    from protocol.simulation import create_distributors  # Deferred, simulation imports this module
+
+    player_names = [sim_config.COMMANDER_NAME] + sim_config.LIEUTENANT_NAMES
+    players = []
+
+    def setup_distribution_network(sim_context: aqnsim.SimulationContext, parameters: SimulationConfig) -> aqnsim.Network:
+        distributors = create_distributors(sim_context, parameters)
+        delay_sampler = LinkDelaySampler(parameters)  # Same per-link delays as a live run of this config
+        players.extend(Player(sim_context=sim_context, name=name, sim_config=parameters) for name in player_names)
+        network = aqnsim.Network(sim_context=sim_context, nodes=distributors + players)
+        for distributor in distributors:
+            for player in players:
+                qlink = aqnsim.QuantumLink(
+                    sim_context = sim_context,
+                    delay = delay_sampler.quantum_delay(distributor.name, player.name),
+                    noise = parameters.QUANTUM_CHANNEL_NOISE,
+                    name=f"Q_Link_{player.name}_{distributor.name}"
+                )
+                network.add_link(qlink, distributor, player, player.name, distributor.name)
+        for distributor in distributors:
+            DistributorProtocol(sim_context = sim_context, node = distributor)
+        for player in players:
+            PoolPlayerProtocol(sim_context = sim_context, node = player)
+        return network
+
+    run_simulation = aqnsim.generate_run_simulation_fn(setup_sim_fn=setup_distribution_network, logging_level=0, log_to_file=False)
+    run_simulation(sim_config)
+
+    width = (sim_config.N - 1) * sim_config.M
+    bits = np.memmap(path, dtype=np.uint8, mode="w+", shape=(sim_config.NUM_SLOTS, len(player_names), width))
+    for p, player in enumerate(players):
+        for slot, bit_vector in enumerate(player.bit_vectors):
+            bits[slot, p] = bit_vector
+    bits.flush()
+    del bits
+
+    with open(f"{path}.json", "w") as f:
+        json.dump({"blocks": sim_config.NUM_SLOTS, "width": width, "M": sim_config.M, "player_names": player_names}, f)
+    with open(f"{path}.cursor", "w") as f:
+        f.write("0")
+    return EntanglementPool(path)
+
+
+if __name__ == "__main__":
+    pool_path = os.environ.get("ENTANGLEMENT_POOL", "entanglement_pool.bin")
+    pool = build_pool(pool_path, SimulationConfig(COMMANDER_IS_TRAITOR=False, NUM_INSTANCES=100))
+    print(f"Wrote {pool.num_blocks} blocks to {pool_path}")
@@ -1,7 +1,12 @@
 import aqnsim
-from dataclasses import dataclass, field
-from protocol.players import Player
+from dataclasses import replace
+from protocol.players import Player, DistributionBarrier
+from protocol.rules import (
+    Round1Message, InitialEvidence, CommandVectorRef, IntermediaryEvidence, EvidenceBundle, command_vector_digest,
+    Round2Tally, LieutenantCMemory, LieutenantRules
+)
 from protocol.config import SimulationConfig
+from protocol.traffic import TrafficLog
 # from protocol.config import (
 #     COMMANDER_NAME, COMMANDER_IS_TRAITOR, LOYAL_COMMANDER_ORDER, COMMANDER_QMEMORY_ADDR,
 #     LIEUTENANT_NAMES, TRAITOR_INDICES,
@@ -10,217 +15,76 @@ from protocol.config import SimulationConfig
 #     SEND_ORDER_ACTION, SEND_CV_ACTION, ROUND2_ACTION, ROUND3_ACTION
 # )
 
-"""
-DEFINE DATACLASSES FOR EVIDENCE
-"""
-
-@dataclass
-class InitialEvidence:
-    decision: bool | None = None  # Claim
-    command_vector: list[bool | None] = field(default_factory=list)  # Evidence
-
-@dataclass
-class IntermediaryEvidence:
-    decision: bool | None = None  # Claim
-    command_vectors: list[list[bool | None]] = field(default_factory=list)  # Evidence
-
-@dataclass
-class EvidenceBundle:
-    initial: InitialEvidence = field(default_factory=InitialEvidence)
-    intermediary: IntermediaryEvidence = field(default_factory=IntermediaryEvidence)
-
-"""
-DEFINE LIEUTENANT AND COMMANDER
-"""
-
-@dataclass
-class LieutenantCMemory:
-    name: str
-    lieutenant_index: int
-    is_traitor: bool = False
-    bit_vector: list[bool | None] = field(default_factory=list)
-    command_vector: list[bool | None] = field(default_factory=list)
-    received_order: bool | None = None
-    initial_decision: bool | None = None
-    intermediate_decision: bool | None = None
-    final_decision: bool | None = None
-    intermediary_proofs: dict[int, IntermediaryEvidence] = field(default_factory=dict) # Used for counting, merged into "proofs" once filled
-    proofs: dict[int, EvidenceBundle] = field(default_factory=dict)
-
-
-class Lieutenant(Player):
-    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, lieutenant_index: int, is_traitor: bool, sim_config=SimulationConfig):
-        super().__init__(sim_context=sim_context, name=name, sim_config=sim_config)
+class Lieutenant(Player, LieutenantRules):
+    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, lieutenant_index: int, is_traitor: bool, sim_config=SimulationConfig, distribution_barriers: list[DistributionBarrier] | None = None, traffic_log: TrafficLog | None = None):
+        super().__init__(sim_context=sim_context, name=name, sim_config=sim_config, distribution_barriers=distribution_barriers, traffic_log=traffic_log)
 
         # Quantum Memory is initialized by the parent Player class
 
-        # Setup Classical Memory
-        self.memory = LieutenantCMemory(name=name, lieutenant_index=lieutenant_index, is_traitor=is_traitor, bit_vector = self.bit_vector)  # Shared reference for bit_vector!
-    
-    @staticmethod
-    def approx_equal_int(actual: int, expected: int, tolerance: int = 0) -> bool:
-        return abs(actual - expected) <= tolerance
-
-    # @staticmethod
-    def T_i_x(self, v: list[bool | None], i: int, x: bool) -> set[int]:
-        """
-        Returns the set of tuple indices k (0 <= k < m) for which the i-th element
-        (0 <= i < n-1) of the k-th tuple in v equals x.
-        """
-        result = set()
-        tuple_length = self.sim_config.N - 1
-        for k in range(self.sim_config.M):
-            pos = tuple_length * k + i
-            if v[pos] is not None and v[pos] == x:
-                result.add(k)
-        return result
-
-    # @staticmethod
-    def T_i_x_j_y(self, v: list[bool | None], i: int, j: int, x: bool, y: bool) -> set[int]:
-        """
-        Returns the set of tuple indices k (0 <= k < m) for which:
-          - The i-th element of the k-th tuple equals x, and
-          - The j-th element of the k-th tuple equals y.
-        Here, 0 <= i, j < n-1 and i != j.
-        """
-        result = set()
-        tuple_length = self.sim_config.N - 1
-        for k in range(self.sim_config.M):
-            pos_i = tuple_length * k + i
-            pos_j = tuple_length * k + j
-            if (v[pos_i] is not None and v[pos_j] is not None and
-                v[pos_i] == x and v[pos_j] == y):
-                result.add(k)
-        return result
-        
-    def check_alice(self, tolerance: int = 0) -> bool:
-        """
-        Check Alice's (commander's) command vector against this lieutenant's bit vector.
-        Returns True if consistent.
-        """
-
-        if self.memory.received_order is None:
-            raise ValueError(f"No order specified for lieutenant {self.memory.lieutenant_index}")
-
-        T = self.T_i_x(v = self.memory.command_vector, i = self.memory.lieutenant_index, x = self.memory.received_order)
-        if not self.approx_equal_int(len(T), self.sim_config.M // 2, tolerance):
-            return False
-
-        # The protocol expects anti-correlation in every tuple
-        tuple_length = self.sim_config.N - 1
-        for k in range(self.sim_config.M):
-            pos = tuple_length * k + self.memory.lieutenant_index
-            if self.memory.command_vector[pos] == self.memory.bit_vector[pos]:
-                return False
-        return True
-
-    def check_lieutenant_by_command_vector(self, j: int, c: bool, j_command_vector: list[bool | None], tolerance: int = 0) -> bool:
-        """
-        Check another lieutenant's command vector against this lieutenant's bit vector.
-        """
-
-        if c is None:
-            raise ValueError(f"Order must be certain not {c}")
-        if not j_command_vector:
-            raise ValueError(f"Command vector must be concrete not {j_command_vector}")
-            
-        T1 = self.T_i_x_j_y(v = j_command_vector, i = self.memory.lieutenant_index, j = j, x = c, y = c)
-        if not self.approx_equal_int(len(T1), self.sim_config.M // 4, tolerance):
-            return False
-
-        T2 = self.T_i_x_j_y(v = j_command_vector, i = self.memory.lieutenant_index, j = j, x = (not c), y = c)
-        if not self.approx_equal_int(len(T2), self.sim_config.M // 4, tolerance):
-            return False
-
-        T3 = self.T_i_x_j_y(v = self.memory.command_vector, i = self.memory.lieutenant_index, j = j, x = (not c), y = c)
-       
-        if not self.approx_equal_int(len(T2.symmetric_difference(T3)), 0, tolerance):
-            return False    
-        return True
-
-    def check_lieutenant_by_bit_vector(self, j: int, c: bool, j_command_vector: list[bool | None], tolerance: int = 0) -> bool:
-        """
-        Check another lieutenant's command vector against this lieutenant's bit vector.
-        """
-        T1 = self.T_i_x_j_y(v = j_command_vector, i = self.memory.lieutenant_index, j = j, x = c, y = c)
-        if not self.approx_equal_int(len(T1), self.sim_config.M // 4, tolerance):
-            return False
-
-        T2 = self.T_i_x_j_y(v = j_command_vector, i = self.memory.lieutenant_index, j = j, x = (not c), y = c)
-        if not self.approx_equal_int(len(T2), self.sim_config.M // 4, tolerance):
-            return False
-
-        tuple_length = self.sim_config.N - 1
-        for k in range(self.sim_config.M):
-            pos = tuple_length * k + self.memory.lieutenant_index
-            if j_command_vector[pos] == self.memory.bit_vector[pos]:
-                return False
-        return True
+        # Setup Classical Memory, one per (instance, bit) slot
+        self.memories = [
+            LieutenantCMemory(name=name, lieutenant_index=lieutenant_index, is_traitor=is_traitor, bit_vector = bit_vector)  # Shared reference for bit_vector!
+            for bit_vector in self.bit_vectors
+        ]
+        self.memory = self.memories[0]
+        # Every other lieutenant, i.e. the recipients of this lieutenant's round 2 and round 3 broadcasts
+        self.peer_names = [peer for idx, peer in enumerate(self.sim_config.LIEUTENANT_NAMES) if idx != lieutenant_index]
+        # A traitor's random votes and vectors
+        self.rng = self.sim_config.random_stream(name)
 
 
 class LieutenantProtocol(aqnsim.NodeProtocol):
     def __init__(self, sim_context: aqnsim.SimulationContext, node: Lieutenant):
         super().__init__(sim_context=sim_context, node=node, name=node.name)
+        # Round 2 and round 3 payloads waiting for the other bits of their instance, by (instance, action)
+        self.outbox: dict[tuple[int, str], dict[int, object]] = {}
 
-        self.node.ports[self.node.sim_config.DISTRIBUTOR_NAME].add_rx_input_handler(
-            handler=lambda msg: self.quantum_port_source_handler(msg=msg)
-        )
+        for source_index, distributor_name in enumerate(self.node.sim_config.DISTRIBUTOR_NAMES):
+            self.node.ports[distributor_name].add_rx_input_handler(
+                handler=lambda msg, source_index=source_index: self.quantum_port_source_handler(msg=msg, source_index=source_index)
+            )
 
-        self.node.ports[self.node.sim_config.COMMANDER_NAME].add_rx_input_handler(self.classical_port_commander_handler)
+        if self.node.sim_config.CLASSICAL_BUS:
+            self.node.ports[self.node.sim_config.CLASSICAL_BUS_NAME].add_rx_input_handler(self.classical_port_bus_handler)
+        else:
+            self.node.ports[self.node.sim_config.COMMANDER_NAME].add_rx_input_handler(self.classical_port_commander_handler)
 
-        for idx, lieutenant_name in enumerate(self.node.sim_config.LIEUTENANT_NAMES):
-            if idx == self.node.memory.lieutenant_index:
-                continue
-            self.node.ports[lieutenant_name].add_rx_input_handler(self.classical_port_lieutenant_handler)
+            for lieutenant_name in self.node.peer_names:
+                self.node.ports[lieutenant_name].add_rx_input_handler(self.classical_port_lieutenant_handler)
 
 
     @aqnsim.process
-    def quantum_port_source_handler(self, msg: aqnsim.Qubit):
+    def quantum_port_source_handler(self, msg: aqnsim.Qubit, source_index: int = 0):
         
         if isinstance(msg, aqnsim.Qubit):
-            self.node.qmemory.positions[0].put(qubit=msg)
-            yield self.node.measure_qubit() 
+            self.node.qmemory.positions[source_index].put(qubit=msg)
+            yield self.node.measure_qubit(source_index) 
+
+    def classical_port_bus_handler(self, msg: aqnsim.CMessage):
+        # Every player's messages arrive on the single bus port, so route them by action
+        if msg.action == self.node.sim_config.ROUND1_ACTION:
+            return self.classical_port_commander_handler(msg)
+        return self.classical_port_lieutenant_handler(msg)
 
     @aqnsim.process
     def classical_port_commander_handler(self, msg: aqnsim.CMessage):
         
         # Round 1/2: 
 
-        if isinstance(msg, aqnsim.CMessage):
-            if msg.action == self.node.sim_config.SEND_ORDER_ACTION:
-                self.node.memory.received_order = msg.content
-                # self.simlogger.info(f"{self.node.name} stored order {self.node.memory.received_order}")
-                yield self.wait(0)
-            elif msg.action == self.node.sim_config.SEND_CV_ACTION:
-                self.node.memory.command_vector = msg.content
-                self.simlogger.info(f"{self.node.name} stored CV {self.node.memory.command_vector}")
-                if self.node.check_alice(tolerance = self.node.sim_config.M // 10):
-                    self.node.memory.initial_decision = self.node.memory.received_order
-                else:
-                    self.node.memory.initial_decision = None
-
-                if self.node.memory.is_traitor:
-                    tuple_length = self.node.sim_config.N - 1
-                    self.node.memory.initial_decision = aqnsim.random_utilities.choice([True, False, None])
-                    self.node.memory.command_vector = [aqnsim.random_utilities.choice([True, False, None]) for _ in range(tuple_length * self.node.sim_config.M)]
-
-                # SHARE COMMAND VECTOR WITH OTHERS 
-                first_evidence_bundle = EvidenceBundle(
-                    initial=InitialEvidence(
-                        decision=self.node.memory.initial_decision,
-                        command_vector=self.node.memory.command_vector
-                    ),
-                    # No intermediary evidence is sent yet
-                    intermediary=IntermediaryEvidence())
-
-                self.node.memory.proofs[self.node.memory.lieutenant_index] = first_evidence_bundle  # Save your own initial evidence
-                for idx, lieutenant_name in enumerate(self.node.sim_config.LIEUTENANT_NAMES):
-                    if idx == self.node.memory.lieutenant_index:
-                        continue
-                    cv_message = aqnsim.CMessage(
-                        sender=self.node.memory.lieutenant_index, action=self.node.sim_config.ROUND2_ACTION, content=first_evidence_bundle
-                    )
-                    self.node.ports[lieutenant_name].rx_output(cv_message)
+        if isinstance(msg, aqnsim.CMessage) and msg.action == self.node.sim_config.ROUND1_ACTION:
+            instance, messages = msg.content.instance, msg.content.payload
+            for bit, content in enumerate(messages):
+                slot = instance * self.node.sim_config.BITS_PER_AGREEMENT + bit
+                memory = self.node.memories[slot]
+                if memory.round1_complete:
+                    continue  # Round 1 was already decided, by an early reject or the deadline
+                memory.received_order = content.order
+                # self.simlogger.info(f"{self.node.name} stored order {memory.received_order}")
+                consistent = self.node.check_alice_chunk(memory, content, tolerance = self.node.sim_config.M // 10)
+                if consistent is not None:
+                    # Decided, possibly before the last block; later blocks are ignored
+                    self.complete_round1(slot, tuple(memory.cv_buffer), consistent=consistent)
+        yield self.wait(0)
              
         # All done listening to Commander!
 
@@ -228,165 +92,253 @@ class LieutenantProtocol(aqnsim.NodeProtocol):
     def classical_port_lieutenant_handler(self, msg: aqnsim.CMessage):
         
         if isinstance(msg, aqnsim.CMessage):
-            if msg.action == self.node.sim_config.ROUND2_ACTION:
-                self.node.memory.proofs[msg.sender] = msg.content
-                if len(self.node.memory.proofs) == self.node.sim_config.NUM_LIEUTENANTS:
-                    self.simlogger.info(f"{self.node.name} received inital evidence bundles from all lieutenants")
-                    # Rule 3.1
-                    d_i = self.node.memory.initial_decision
-                    collected_proofs = []  
-
-                    received_decisions = [
-                        bundle.initial.decision 
-                        for sender_idx, bundle in self.node.memory.proofs.items()
-                    ]
-
-                    if all(d == d_i for d in received_decisions):
-                        self.node.memory.intermediate_decision = d_i
-                    elif d_i in (0, 1):
-                        # Rule 3.2
-                        if all(d == None for d in received_decisions):
-                            self.node.memory.intermediate_decision = d_i
-                    
-                        else:
-                            conflict_found = False
-                            for sender_idx, bundle in self.node.memory.proofs.items():
-                                if bundle.initial.decision == (not d_i):
-                                    if self.node.check_lieutenant_by_command_vector(
-                                        sender_idx,
-                                        bundle.initial.decision,
-                                        bundle.initial.command_vector,
-                                        tolerance = self.node.sim_config.M//10
-                                    ):
-                                        conflict_found = True
-                                        collected_proofs.append(bundle.initial.command_vector)
-                            # Rule 3.3/3.4
-                            if conflict_found:
-                                self.node.memory.intermediate_decision = None
-                            else:
-                                self.node.memory.intermediate_decision = d_i
-                    else:  # d_i is None
-                        valid_decisions = []
-                        valid_proofs = []
-                        for sender_idx, bundle in self.node.memory.proofs.items():
-                            if bundle.initial.decision is not None:
-                                if self.node.check_lieutenant_by_bit_vector(
-                                    sender_idx,
-                                    bundle.initial.decision,
-                                    bundle.initial.command_vector,
-                                    tolerance = self.node.sim_config.M // 10
-                                ):
-                                    valid_decisions.append(bundle.initial.decision)
-                                    valid_proofs.append(bundle.initial.command_vector)
-                        # Rule 3.5/3.6
-                        if valid_decisions and all(d == valid_decisions[0] for d in valid_decisions):
-                            self.node.memory.intermediate_decision = valid_decisions[0]
-                            collected_proofs.append(valid_proofs[0])  # Send 1 CV as proof
-                        else:
-                            self.node.memory.intermediate_decision = d_i
-                            unique_proofs = dict(zip(valid_decisions, valid_proofs))
-                            contradicting_proofs = list(unique_proofs.values())[:2]  # Guarenteed to have exactly 2 values
-                            collected_proofs.extend(contradicting_proofs)  # Send 2 contradicting CVs as proof
-                        
-                    # SEND INTERMEDIARY EVIDENCE FOR LIEUTENANT TO UPDATE THEIR EVIDENCE BUNDLE
-
-            
-                    if self.node.memory.is_traitor:
-                        tuple_length = self.node.sim_config.N - 1
-                        num_proofs = aqnsim.random_utilities.choice([0,1,2])
-                        self.node.memory.intermediate_decision = aqnsim.random_utilities.choice([True, False, None])
-                        collected_proofs = [[aqnsim.random_utilities.choice([True, False, None]) for _ in range(tuple_length * self.node.sim_config.M)] for __ in range(num_proofs)]
-
-
-                    intermediary_evidence = IntermediaryEvidence(
-                        decision=self.node.memory.intermediate_decision,
-                        command_vectors = collected_proofs
-                    )
-                    self.node.memory.intermediary_proofs[self.node.memory.lieutenant_index] = intermediary_evidence 
-                    for idx, lieutenant_name in enumerate(self.node.sim_config.LIEUTENANT_NAMES):
-                        if idx == self.node.memory.lieutenant_index:
-                            continue
-                        cv_message = aqnsim.CMessage(
-                            sender=self.node.memory.lieutenant_index, action=self.node.sim_config.ROUND3_ACTION, content=intermediary_evidence
-                        )
-                        self.node.ports[lieutenant_name].rx_output(cv_message)
-             
-            if msg.action == self.node.sim_config.ROUND3_ACTION:
-                self.node.memory.intermediary_proofs[msg.sender] = msg.content
-                if len(self.node.memory.intermediary_proofs) == self.node.sim_config.NUM_LIEUTENANTS:
-                    self.simlogger.info(f"{self.node.name} received intermediary evidence bundles from all lieutenants")
-
-                    ## UPDATE PROOFS WITH INTERMEDIARY_PROOFS ##
-                    for proof_id, intermediary_evidence in self.node.memory.intermediary_proofs.items():
-                        self.node.memory.proofs[proof_id].intermediary = self.node.memory.intermediary_proofs[proof_id]
-
-                    for i in range(1):  # Trivial loop to be able to break out of logic sequence with "continue"s
-                        d_i = self.node.memory.intermediate_decision
-                        # Rule 4.1
-                        if (d_i == None and len(self.node.memory.proofs[i].intermediary.command_vectors) == 2):
-                            self.node.memory.final_decision = d_i
-                            continue
-
-                        received_decisions = [
-                            bundle.intermediary.decision 
-                            for sender_idx, bundle in self.node.memory.proofs.items()
-                        ]
-
-                        # Rule 4.2
-                        if all(d == d_i for d in received_decisions):
-                            self.node.memory.final_decision = d_i
-                            continue
-
-                        if d_i in (0, 1):
-                            conflict_found = False
-                            if any(bundle.intermediary.decision is None and bundle.initial.decision is not None
-                                for sender_idx, bundle in self.node.memory.proofs.items()):
-                                for sender_idx, bundle in self.node.memory.proofs.items():
-                                    # Verifying consistent application of Rule 3.3
-                                    if bundle.intermediary.decision is None and bundle.initial.decision is not None:
-                    
-                                        if (bundle.intermediary.command_vectors and
-                                            self.node.check_lieutenant_by_command_vector(
-                                                sender_idx,
-                                                bundle.initial.decision,
-                                                bundle.intermediary.command_vectors[0],
-                                                tolerance=self.node.sim_config.M // 10
-                                            )):
-                                            conflict_found = True
-                                            break
-                                # Rule 4.3/4.4
-                                if conflict_found:
-                                    self.node.memory.final_decision = None
-                                else:
-                                    self.node.memory.final_decision = d_i
-                                continue 
-
-                            conflict_found = False
-                            for sender_idx, bundle in self.node.memory.proofs.items():
-                                if bundle.intermediary.decision == (not d_i):
-                                    if (bundle.intermediary.command_vectors and
-                                        self.node.check_lieutenant_by_command_vector(
-                                            sender_idx,
-                                            bundle.intermediary.decision,
-                                            bundle.intermediary.command_vectors[0],
-                                            tolerance=self.node.sim_config.M // 10
-                                        )):
-                                            conflict_found = True
-                                            break
-            
-                            # Rule 4.5/4.6
-                            if conflict_found:
-                                self.node.memory.final_decision = None
-                            else:
-                                self.node.memory.final_decision = d_i
-                            continue
-
-                    if self.node.memory.is_traitor:
-                        self.node.memory.final_decision = aqnsim.random_utilities.choice([True, False, None])
-
-                    self.node.data_collector.update_attribute(self.name, {"is_traitor":self.node.memory.is_traitor,
-                                                                          "received_order": self.node.memory.received_order,
-                                                                          "initial_decision": self.node.memory.initial_decision,
-                                                                          "intermediate_decision": self.node.memory.intermediate_decision,
-                                                                          "final_decision": self.node.memory.final_decision})
-                yield self.wait(0) # Trivial event
\ No newline at end of file
+            instance, payloads = msg.content.instance, msg.content.payload
+            for bit, content in enumerate(payloads):
+                if content is None:
+                    continue  # Per-bit messages leave the other bits' entries empty
+                slot = instance * self.node.sim_config.BITS_PER_AGREEMENT + bit
+                self.receive_lieutenant_payload(slot, msg.sender, msg.action, content)
+        yield self.wait(0) # Trivial event
+
+    def receive_lieutenant_payload(self, slot: int, sender_idx: int, action: str, content):
+        memory = self.node.memories[slot]
+        if action == self.node.sim_config.ROUND2_ACTION:
+            if memory.round2_complete:
+                return  # Arrived after the round 2 deadline
+            memory.proofs[sender_idx] = content
+            self.node.store_command_vector(memory, content.initial.command_vector)
+            if memory.round2_tally is not None:
+                self.node.observe_initial_evidence(memory, memory.round2_tally, sender_idx, content)
+            if len(memory.proofs) == self.node.sim_config.NUM_LIEUTENANTS:
+                self.complete_round2(slot)
+         
+        elif action == self.node.sim_config.ROUND3_ACTION:
+            if memory.round3_complete:
+                return  # Arrived after the round 3 deadline
+            self.receive_intermediary_evidence(slot, sender_idx, content)
+
+        elif action == self.node.sim_config.CV_REQUEST_ACTION:
+            # A peer could not resolve some of our hash references; send the full command vectors
+            found = {digest: memory.cv_store[digest] for digest in content if digest in memory.cv_store}
+            self.send_now(slot, [self.node.sim_config.LIEUTENANT_NAMES[sender_idx]], self.node.sim_config.CV_RESPONSE_ACTION, found)
+
+        elif action == self.node.sim_config.CV_RESPONSE_ACTION:
+            if memory.round3_complete:
+                return  # The evidence it backs up was already counted as missing
+            for command_vector in content.values():
+                self.node.store_command_vector(memory, command_vector)
+            pending = memory.pending_intermediary_proofs.pop(sender_idx, None)
+            if pending is not None:
+                self.receive_intermediary_evidence(slot, sender_idx, pending, request_missing=False)
+
+    def send_batched(self, slot: int, action: str, payload):
+        """
+        Queue this slot's round 2 or round 3 broadcast and send the instance's message once every bit has queued
+        its payload, so each round is a single message exchange whatever BITS_PER_AGREEMENT is.
+        """
+        bits = self.node.sim_config.BITS_PER_AGREEMENT
+        instance, bit = divmod(slot, bits)
+        queued = self.outbox.setdefault((instance, action), {})
+        queued[bit] = payload
+        if len(queued) == bits:
+            del self.outbox[(instance, action)]
+            self.node.multicast(
+                self.node.peer_names, action, tuple(queued[b] for b in range(bits)), sender=self.node.memory.lieutenant_index, instance=instance
+            )
+
+    def send_now(self, slot: int, destinations: list[str], action: str, payload):
+        """Send a payload that only concerns this slot's bit, leaving the other bits' entries empty."""
+        bits = self.node.sim_config.BITS_PER_AGREEMENT
+        instance, bit = divmod(slot, bits)
+        payloads = [None] * bits
+        payloads[bit] = payload
+        self.node.multicast(destinations, action, tuple(payloads), sender=self.node.memory.lieutenant_index, instance=instance)
+
+    @aqnsim.process
+    def run(self):
+        """
+        Synchronous rounds: with ROUND_DEADLINE set, round r of each slot closes ROUND_DEADLINE * r after its
+        instance's distribution completes. Whatever has not arrived by then is treated as None evidence and the round
+        is evaluated without it, so a silent traitor or a slow link cannot stall agreement.
+        """
+        if self.node.sim_config.ROUND_DEADLINE is None:
+            return
+        for slot in range(self.node.sim_config.NUM_SLOTS):
+            self.run_round_deadlines(slot, self.node.distribution_barriers[slot // self.node.sim_config.BITS_PER_AGREEMENT])
+        yield self.wait(0)
+
+    @aqnsim.process
+    def run_round_deadlines(self, slot: int, barrier: DistributionBarrier):
+        deadline = self.node.sim_config.ROUND_DEADLINE
+        memory = self.node.memories[slot]
+        yield barrier.wait()
+
+        yield self.wait(deadline)
+        if not memory.round1_complete:
+            self.simlogger.info(f"{self.node.name} reached the round 1 deadline of slot {slot} without a command vector")
+            self.complete_round1(slot, None)
+
+        yield self.wait(deadline)
+        if not memory.round2_complete:
+            for sender_idx in range(self.node.sim_config.NUM_LIEUTENANTS):
+                if sender_idx not in memory.proofs:
+                    missing_bundle = EvidenceBundle(initial=InitialEvidence(decision=None, command_vector=()))
+                    memory.proofs[sender_idx] = missing_bundle
+                    if memory.round2_tally is not None:
+                        self.node.observe_initial_evidence(memory, memory.round2_tally, sender_idx, missing_bundle)
+            self.simlogger.info(f"{self.node.name} reached the round 2 deadline of slot {slot}")
+            self.complete_round2(slot)
+
+        yield self.wait(deadline)
+        if not memory.round3_complete:
+            memory.pending_intermediary_proofs.clear()
+            for sender_idx in range(self.node.sim_config.NUM_LIEUTENANTS):
+                if sender_idx not in memory.intermediary_proofs:
+                    memory.intermediary_proofs[sender_idx] = IntermediaryEvidence(decision=None, command_vectors=())
+            self.simlogger.info(f"{self.node.name} reached the round 3 deadline of slot {slot}")
+            self.complete_round3(slot)
+
+    def complete_round1(self, slot: int, command_vector: tuple[bool | None, ...] | None, consistent: bool | None = None):
+        """
+        Decide on the commander's order and share the initial evidence; a None command vector means it never arrived.
+        `consistent` carries the result of a check_alice that already ran while the vector was streamed in.
+        """
+        memory = self.node.memories[slot]
+        memory.round1_complete = True
+        if command_vector is None:
+            memory.initial_decision = None
+        else:
+            memory.command_vector = command_vector
+            self.simlogger.info(f"{self.node.name} stored CV {memory.command_vector}")
+            if consistent is None:
+                consistent = self.node.check_alice(memory, tolerance = self.node.sim_config.M // 10)
+            if consistent:
+                memory.initial_decision = memory.received_order
+            else:
+                memory.initial_decision = None
+
+        if memory.is_traitor:
+            tuple_length = self.node.sim_config.N - 1
+            memory.initial_decision = self.node.rng.choice([True, False, None])
+            memory.command_vector = tuple(self.node.rng.choice([True, False, None]) for _ in range(tuple_length * self.node.sim_config.M))
+        memory.initial_decision_time = self.node.sim_context.env.now
+
+        # SHARE COMMAND VECTOR WITH OTHERS 
+        first_evidence_bundle = EvidenceBundle(
+            initial=InitialEvidence(
+                decision=memory.initial_decision,
+                command_vector=memory.command_vector
+            ),
+            # No intermediary evidence is sent yet
+            intermediary=IntermediaryEvidence())
+
+        memory.proofs[memory.lieutenant_index] = first_evidence_bundle  # Save your own initial evidence
+        self.node.store_command_vector(memory, memory.command_vector)
+        if self.node.sim_config.INCREMENTAL_ROUND2:
+            # Verify bundles as they arrive from here on; those that beat our own CV are folded in now
+            self.start_round2_tally(slot)
+        self.send_batched(slot, self.node.sim_config.ROUND2_ACTION, first_evidence_bundle)
+        if len(memory.proofs) == self.node.sim_config.NUM_LIEUTENANTS and not memory.round2_complete:
+            self.complete_round2(slot)  # Every peer's bundle beat our own command vector
+
+    def start_round2_tally(self, slot: int) -> Round2Tally:
+        """Start the rule 3.x state from our initial decision and fold in every bundle received so far, in arrival order."""
+        memory = self.node.memories[slot]
+        tally = Round2Tally(d_i=memory.initial_decision)
+        for sender_idx, bundle in memory.proofs.items():
+            self.node.observe_initial_evidence(memory, tally, sender_idx, bundle)
+        memory.round2_tally = tally
+        return tally
+
+    def complete_round2(self, slot: int):
+        memory = self.node.memories[slot]
+        memory.round2_complete = True
+        self.simlogger.info(f"{self.node.name} received inital evidence bundles from all lieutenants for slot {slot}")
+        tally = memory.round2_tally
+        if tally is None:
+            # Batch mode: evaluate every bundle now that they have all arrived
+            tally = self.start_round2_tally(slot)
+        memory.intermediate_decision, collected_proofs = self.node.finalize_round2(tally)
+        memory.skipped_checks += tally.skipped_checks
+
+        # SEND INTERMEDIARY EVIDENCE FOR LIEUTENANT TO UPDATE THEIR EVIDENCE BUNDLE
+
+
+        if memory.is_traitor:
+            tuple_length = self.node.sim_config.N - 1
+            num_proofs = self.node.rng.choice([0,1,2])
+            memory.intermediate_decision = self.node.rng.choice([True, False, None])
+            collected_proofs = [[self.node.rng.choice([True, False, None]) for _ in range(tuple_length * self.node.sim_config.M)] for __ in range(num_proofs)]
+        memory.intermediate_decision_time = self.node.sim_context.env.now
+
+
+        intermediary_evidence = IntermediaryEvidence(
+            decision=memory.intermediate_decision,
+            command_vectors = collected_proofs
+        )
+        memory.intermediary_proofs[memory.lieutenant_index] = intermediary_evidence 
+        if self.node.sim_config.HASH_REFERENCED_PROOFS:
+            # Every peer received the same round 2 broadcasts, so only send hashes for command vectors from them
+            intermediary_evidence = IntermediaryEvidence(
+                decision=intermediary_evidence.decision,
+                command_vectors=[self.node.reference_command_vector(memory, cv) for cv in intermediary_evidence.command_vectors]
+            )
+        self.send_batched(slot, self.node.sim_config.ROUND3_ACTION, intermediary_evidence)
+        if len(memory.intermediary_proofs) == self.node.sim_config.NUM_LIEUTENANTS and not memory.round3_complete:
+            self.complete_round3(slot)  # Every peer's evidence beat our own
+
+    def receive_intermediary_evidence(self, slot: int, sender_idx: int, evidence: IntermediaryEvidence, request_missing: bool = True):
+        """
+        Resolve any hash-referenced command vectors against this lieutenant's CV store. On a cache miss the
+        evidence is parked and the full vectors are requested from the sender once; references the sender could
+        not back up with a payload are dropped.
+        """
+        memory = self.node.memories[slot]
+        missing = [ref.digest for ref in evidence.command_vectors
+                   if isinstance(ref, CommandVectorRef) and ref.digest not in memory.cv_store]
+        if missing and request_missing:
+            memory.pending_intermediary_proofs[sender_idx] = evidence
+            self.send_now(slot, [self.node.sim_config.LIEUTENANT_NAMES[sender_idx]], self.node.sim_config.CV_REQUEST_ACTION, missing)
+            return
+
+        memory.intermediary_proofs[sender_idx] = IntermediaryEvidence(
+            decision=evidence.decision,
+            command_vectors=[self.node.resolve_command_vector(memory, cv) for cv in evidence.command_vectors
+                             if not (isinstance(cv, CommandVectorRef) and cv.digest in missing)]
+        )
+        if len(memory.intermediary_proofs) == self.node.sim_config.NUM_LIEUTENANTS:
+            self.complete_round3(slot)
+
+    def complete_round3(self, slot: int):
+        memory = self.node.memories[slot]
+        memory.round3_complete = True
+        self.simlogger.info(f"{self.node.name} received intermediary evidence bundles from all lieutenants for slot {slot}")
+
+        ## UPDATE PROOFS WITH INTERMEDIARY_PROOFS ##
+        # Bundles are immutable and shared with the other recipients, so derive new ones
+        for proof_id, intermediary_evidence in memory.intermediary_proofs.items():
+            memory.proofs[proof_id] = replace(memory.proofs[proof_id], intermediary=intermediary_evidence)
+
+        self.node.decide_round4(memory)
+
+        if memory.is_traitor:
+            memory.final_decision = self.node.rng.choice([True, False, None])
+
+        memory.final_decision_time = self.node.sim_context.env.now
+        instance, bit = divmod(slot, self.node.sim_config.BITS_PER_AGREEMENT)
+        barrier = self.node.distribution_barriers[instance] if self.node.distribution_barriers else None
+        if barrier is not None and barrier.completed_at is not None:
+            memory.time_to_agreement = memory.final_decision_time - barrier.completed_at
+
+        self.node.data_collector.update_attribute(self.name, {"instance": instance,
+                                                              "bit": bit,
+                                                              "is_traitor":memory.is_traitor,
+                                                              "received_order": memory.received_order,
+                                                              "initial_decision": memory.initial_decision,
+                                                              "intermediate_decision": memory.intermediate_decision,
+                                                              "final_decision": memory.final_decision,
+                                                              "skipped_checks": memory.skipped_checks,
+                                                              "time_to_agreement": memory.time_to_agreement,
+                                                              "initial_decision_time": memory.initial_decision_time,
+                                                              "intermediate_decision_time": memory.intermediate_decision_time,
+                                                              "final_decision_time": memory.final_decision_time})
@@ -1,37 +1,128 @@
 import aqnsim
 from dataclasses import dataclass, field
+from typing import Any
 import importlib
 import config
 # from protocol.config import NUM_PLAYERS, COMMANDER_NAME, LIEUTENANT_NAMES, N, NUM_LIEUTENANTS, DISTRIBUTOR_NAME
 from protocol.config import SimulationConfig
+from protocol.classical_bus import BusFrame
+from protocol.traffic import TrafficLog
+from protocol.rules import InstancePayload
 # M = config.M
 
+"""
+DEFINE DISTRIBUTION BARRIER
+"""
+
+class DistributionBarrier:
+    """
+    Completion barrier for the entanglement distribution phase.
+    Every Player signals the barrier once its bit vector is full; the barrier's event fires as soon as
+    all players have signalled, so round 1 can start with zero slack.
+    """
+    def __init__(self, sim_context: aqnsim.SimulationContext, parties: int):
+        self.sim_context = sim_context
+        self.parties = parties
+        self.signalled: set[str] = set()
+        self.started_at = sim_context.env.now
+        self.completed_at = None
+        self.event = sim_context.env.event()
+
+    def signal(self, name: str):
+        self.signalled.add(name)
+        if len(self.signalled) == self.parties and not self.event.triggered:
+            self.completed_at = self.sim_context.env.now
+            self.event.succeed()
+
+    def wait(self):
+        return self.event
+
+
 """
 DEFINE BASE PLAYER CLASS
 """
 
 class Player(aqnsim.Node):
-    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, sim_config: SimulationConfig):
+    def __init__(self, sim_context: aqnsim.SimulationContext, name: str, sim_config: SimulationConfig, distribution_barriers: list[DistributionBarrier] | None = None, traffic_log: TrafficLog | None = None):
         self.sim_config = sim_config
+        # One barrier per agreement instance
+        self.distribution_barriers = distribution_barriers or []
+        self.traffic_log = traffic_log
         
+        if self.sim_config.CLASSICAL_BUS:
+            classical_ports = [self.sim_config.CLASSICAL_BUS_NAME]
+        else:
+            classical_ports = [self.sim_config.COMMANDER_NAME] + self.sim_config.LIEUTENANT_NAMES # All-to-all classical communication; port with your own name isn't used
+
         super().__init__(
             sim_context=sim_context,
-            ports=[self.sim_config.DISTRIBUTOR_NAME] + [self.sim_config.COMMANDER_NAME] + self.sim_config.LIEUTENANT_NAMES, # All-to-all classical communication; port with your own name isn't used
+            ports=self.sim_config.DISTRIBUTOR_NAMES + classical_ports,
             name=name
         )
         self.data_collector.register_attribute(self.name)
-        self.bit_vector = []
+        # One bit vector per (instance, bit) slot; bit_vector is the first, for single-instance runs
+        self.bit_vectors = [[] for _ in range(self.sim_config.NUM_SLOTS)]
+        self.bit_vector = self.bit_vectors[0]
+        # Measurement results per instance and distributor, merged into the bit vector in shard order once every source is done
+        self.source_bits = [[[] for _ in self.sim_config.DISTRIBUTOR_NAMES] for _ in range(self.sim_config.NUM_INSTANCES)]
+        self.num_measured = [0] * self.sim_config.NUM_INSTANCES
+        # Every source serves its shard once per instance, in instance order, so arrival counts tell instances apart
+        self.source_arrivals = [0] * self.sim_config.NUM_DISTRIBUTORS
+        self.qubits_per_shard = [(self.sim_config.NUM_PLAYERS - 1) * len(self.sim_config.distributor_shard(s)) for s in range(self.sim_config.NUM_DISTRIBUTORS)]
 
+        # One slot per distributor, since parallel sources can deliver qubits at the same instant
         self.qmemory = aqnsim.QMemory(
             sim_context=self.sim_context,
-            n=1,
-            ports=[sim_config.DISTRIBUTOR_NAME], 
+            n=self.sim_config.NUM_DISTRIBUTORS,
+            ports=self.sim_config.DISTRIBUTOR_NAMES, 
             name=f"QMemory-{name}",
         )
 
+    def multicast(self, destinations: list[str], action: str, content, sender=None, instance: int = 0) -> aqnsim.CMessage:
+        """
+        Send one logical message to every player in `destinations`.
+        A single CMessage carrying the shared content is handed to each destination port instead of building one
+        message per peer; delivery semantics and per-link delays are unchanged. Receivers must treat the content
+        as read-only since it is shared.
+        On a shared classical bus the whole multicast is a single frame on the bus port.
+        Every send is recorded in the traffic log, if there is one.
+        Content is tagged with the agreement instance it belongs to; within an instance it is a tuple with one
+        payload per agreed bit.
+        """
+        content = InstancePayload(instance, content)
+        message = aqnsim.CMessage(sender=self.name if sender is None else sender, action=action, content=content)
+        if self.traffic_log is not None:
+            self.traffic_log.record(action, self.name, destinations, content)
+        if self.sim_config.CLASSICAL_BUS:
+            frame = aqnsim.CMessage(sender=self.name, action=action, content=BusFrame(destinations=list(destinations), message=message))
+            self.ports[self.sim_config.CLASSICAL_BUS_NAME].rx_output(frame)
+            return message
+        for destination in destinations:
+            self.ports[destination].rx_output(message)
+        return message
+
     @aqnsim.process
-    def measure_qubit(self):
-        meas_result = yield self.qmemory.measure(0)
-        self.bit_vector.append(meas_result)
-        if len(self.bit_vector) == (self.sim_config.NUM_PLAYERS - 1) * self.sim_config.M:
-            self.simlogger.info(f"All qubits recieved and measured by node {self.name}")
+    def measure_qubit(self, source_index: int = 0):
+        instance = self.source_arrivals[source_index] // self.qubits_per_shard[source_index]
+        self.source_arrivals[source_index] += 1
+        meas_result = yield self.qmemory.measure(source_index)
+        self.source_bits[instance][source_index].append(meas_result)
+        self.num_measured[instance] += 1
+        if self.num_measured[instance] == (self.sim_config.NUM_PLAYERS - 1) * self.sim_config.TUPLES_PER_INSTANCE:
+            self.merge_source_bits(instance)
+            self.simlogger.info(f"All qubits of instance {instance} recieved and measured by node {self.name}")
+            if self.distribution_barriers:
+                self.distribution_barriers[instance].signal(self.name)
+
+    def merge_source_bits(self, instance: int = 0):
+        """
+        Each distributor serves a contiguous shard of tuples and every link is FIFO, so concatenating the
+        per-source results in distributor order restores the tuple ordering of the instance.
+        The instance's tuples are then split into one block of M tuples per bit, in bit order.
+        Assigned in place because the classical memories share a reference to the bit vectors.
+        """
+        merged = [bit for bits in self.source_bits[instance] for bit in bits]
+        block = (self.sim_config.NUM_PLAYERS - 1) * self.sim_config.M
+        for bit in range(self.sim_config.BITS_PER_AGREEMENT):
+            slot = instance * self.sim_config.BITS_PER_AGREEMENT + bit
+            self.bit_vectors[slot][:] = merged[bit * block:(bit + 1) * block]
@@ -0,0 +1,435 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any
+from protocol.config import SimulationConfig
+
+"""
+DEFINE PROTOCOL MESSAGES AND RULES
+"""
+
+# Everything here is independent of the simulator, so the aqnsim players and the localhost runtime
+# (protocol.runtime) apply exactly the same rules to the same message types
+
+@dataclass(frozen=True, slots=True)
+class InstancePayload:
+    instance: int  # Agreement instance the payload belongs to
+    payload: Any
+
+
+@dataclass(frozen=True, slots=True)
+class Round1Message:
+    order: bool
+    command_vector: tuple[bool | None, ...]  # The whole command vector, or one block of it when streaming
+    start_tuple: int = 0  # Index of the first tuple in command_vector
+
+    def __post_init__(self):
+        object.__setattr__(self, "command_vector", tuple(self.command_vector))
+
+
+# Evidence is frozen and backed by tuples so that one instance can be shared by every recipient of a
+# broadcast and cached by identity; receivers derive new bundles instead of mutating them
+
+@dataclass(frozen=True, slots=True)
+class InitialEvidence:
+    decision: bool | None = None  # Claim
+    command_vector: tuple[bool | None, ...] = ()  # Evidence
+
+    def __post_init__(self):
+        object.__setattr__(self, "command_vector", tuple(self.command_vector))
+
+@dataclass(frozen=True, slots=True)
+class CommandVectorRef:
+    digest: str  # Stands in for a command vector the receiver already holds
+
+@dataclass(frozen=True, slots=True)
+class IntermediaryEvidence:
+    decision: bool | None = None  # Claim
+    command_vectors: tuple[tuple[bool | None, ...] | CommandVectorRef, ...] = ()  # Evidence
+
+    def __post_init__(self):
+        object.__setattr__(self, "command_vectors", tuple(
+            cv if isinstance(cv, CommandVectorRef) else tuple(cv) for cv in self.command_vectors
+        ))
+
+@dataclass(frozen=True, slots=True)
+class EvidenceBundle:
+    initial: InitialEvidence = field(default_factory=InitialEvidence)
+    intermediary: IntermediaryEvidence = field(default_factory=IntermediaryEvidence)
+
+def command_vector_digest(command_vector: tuple[bool | None, ...]) -> str:
+    """Content hash of a command vector, encoding each entry as False=0, True=1, None=2."""
+    return hashlib.sha256(bytes(2 if v is None else int(v) for v in command_vector)).hexdigest()
+
+@dataclass
+class Round2Tally:
+    """
+    Running state of rules 3.1-3.6 for a lieutenant whose initial decision is d_i.
+    Each initial evidence bundle is folded in as it is observed, so finalizing the round is O(1).
+    """
+    d_i: bool | None
+    all_match: bool = True  # Rule 3.1: every received decision equals d_i
+    all_none: bool = True  # Rule 3.2: every received decision is None
+    conflict_found: bool = False  # Rule 3.3/3.4: a conflicting decision was validated against our command vector
+    conflicting_proofs: list[tuple[bool | None, ...]] = field(default_factory=list)
+    valid_decisions: list[bool] = field(default_factory=list)  # Rule 3.5/3.6: decisions validated against our bit vector
+    valid_proofs: list[tuple[bool | None, ...]] = field(default_factory=list)
+    skipped_checks: int = 0  # Verifications left out because their outcome could not change the decision
+
+
+@dataclass
+class LieutenantCMemory:
+    name: str
+    lieutenant_index: int
+    is_traitor: bool = False
+    bit_vector: list[bool | None] = field(default_factory=list)
+    command_vector: tuple[bool | None, ...] = ()
+    received_order: bool | None = None
+    initial_decision: bool | None = None
+    intermediate_decision: bool | None = None
+    final_decision: bool | None = None
+    intermediary_proofs: dict[int, IntermediaryEvidence] = field(default_factory=dict) # Used for counting, merged into "proofs" once filled
+    proofs: dict[int, EvidenceBundle] = field(default_factory=dict)
+    cv_store: dict[str, tuple[bool | None, ...]] = field(default_factory=dict)  # Every command vector seen, by digest
+    pending_intermediary_proofs: dict[int, IntermediaryEvidence] = field(default_factory=dict)  # Waiting on CVs missing from cv_store
+    round2_tally: Round2Tally | None = None
+    skipped_checks: int = 0  # Total over rounds 2 and 4
+    # Set once a round has been evaluated, after which late messages for it are ignored
+    round1_complete: bool = False
+    round2_complete: bool = False
+    round3_complete: bool = False
+    time_to_agreement: float | None = None  # From the end of distribution to the final decision
+    # Sim time at which each decision was reached
+    initial_decision_time: float | None = None
+    intermediate_decision_time: float | None = None
+    final_decision_time: float | None = None
+    # Streaming round 1: the command vector assembled so far and the running state of check_alice
+    cv_buffer: list[bool | None] = field(default_factory=list)
+    cv_tuples_received: int = 0
+    cv_order_matches: int = 0
+
+
+@dataclass
+class CommanderCMemory:
+    name: str
+    orders: list[bool]
+    is_traitor: bool = False
+    bit_vector: list[bool | None] = field(default_factory=list)
+    command_vectors:  dict[int, tuple[bool | None, ...]] = field(default_factory=dict)
+
+
+class CommanderRules:
+    """Command vector construction, shared by every commander implementation; expects a `sim_config` attribute."""
+    sim_config: SimulationConfig
+
+    def _construct_command_vector(self, memory: CommanderCMemory, lieutenant_index: int) -> tuple[bool | None, ...]:
+        """
+        Construct a command vector for a given lieutenant based on Alice's bit string.
+        This function uses a simple scheme: reveal tuples that correspond to this lieutenant's entangled positions, 
+        hide others with placeholders.
+        """
+        command_vector = []
+        tuple_length = self.sim_config.N - 1
+        
+        if lieutenant_index >= len(memory.orders):
+            raise IndexError(f"No order specified for lieutenant {lieutenant_index}")
+            
+        order_for_lieutenant = memory.orders[lieutenant_index]
+        
+        for k in range(self.sim_config.M):
+            start_index = k * tuple_length
+            end_index = (k + 1) * tuple_length
+            tuple_k = memory.bit_vector[start_index:end_index]
+            if memory.bit_vector[k*(self.sim_config.NUM_LIEUTENANTS) + lieutenant_index] == order_for_lieutenant:
+                command_vector.extend(tuple_k)
+            else:
+                command_vector.extend(tuple_length * [None])
+        
+        return tuple(command_vector)  # Immutable so it can be shared with the lieutenant's evidence
+
+
+class LieutenantRules:
+    """
+    Round 1-4 checks and decision rules, shared by every lieutenant implementation.
+    Expects a `sim_config` attribute; all per-slot state lives in the LieutenantCMemory passed in.
+    """
+    sim_config: SimulationConfig
+
+    def store_command_vector(self, memory: LieutenantCMemory, command_vector: tuple[bool | None, ...]):
+        if command_vector:
+            memory.cv_store[command_vector_digest(command_vector)] = command_vector
+
+    def reference_command_vector(self, memory: LieutenantCMemory, command_vector: tuple[bool | None, ...]) -> tuple[bool | None, ...] | CommandVectorRef:
+        """Replace a command vector that came out of round 2 by its hash; anything else is sent in full."""
+        digest = command_vector_digest(command_vector)
+        return CommandVectorRef(digest) if digest in memory.cv_store else command_vector
+
+    def resolve_command_vector(self, memory: LieutenantCMemory, command_vector: tuple[bool | None, ...] | CommandVectorRef) -> tuple[bool | None, ...]:
+        if isinstance(command_vector, CommandVectorRef):
+            return memory.cv_store[command_vector.digest]
+        return command_vector
+
+    @staticmethod
+    def approx_equal_int(actual: int, expected: int, tolerance: int = 0) -> bool:
+        return abs(actual - expected) <= tolerance
+
+    # @staticmethod
+    def T_i_x(self, v: tuple[bool | None, ...], i: int, x: bool) -> set[int]:
+        """
+        Returns the set of tuple indices k (0 <= k < m) for which the i-th element
+        (0 <= i < n-1) of the k-th tuple in v equals x.
+        """
+        result = set()
+        tuple_length = self.sim_config.N - 1
+        for k in range(self.sim_config.M):
+            pos = tuple_length * k + i
+            if v[pos] is not None and v[pos] == x:
+                result.add(k)
+        return result
+
+    # @staticmethod
+    def T_i_x_j_y(self, v: tuple[bool | None, ...], i: int, j: int, x: bool, y: bool) -> set[int]:
+        """
+        Returns the set of tuple indices k (0 <= k < m) for which:
+          - The i-th element of the k-th tuple equals x, and
+          - The j-th element of the k-th tuple equals y.
+        Here, 0 <= i, j < n-1 and i != j.
+        """
+        result = set()
+        tuple_length = self.sim_config.N - 1
+        for k in range(self.sim_config.M):
+            pos_i = tuple_length * k + i
+            pos_j = tuple_length * k + j
+            if (v[pos_i] is not None and v[pos_j] is not None and
+                v[pos_i] == x and v[pos_j] == y):
+                result.add(k)
+        return result
+        
+    def check_alice(self, memory: LieutenantCMemory, tolerance: int = 0) -> bool:
+        """
+        Check Alice's (commander's) command vector against this lieutenant's bit vector.
+        Returns True if consistent.
+        """
+
+        if memory.received_order is None:
+            raise ValueError(f"No order specified for lieutenant {memory.lieutenant_index}")
+
+        T = self.T_i_x(v = memory.command_vector, i = memory.lieutenant_index, x = memory.received_order)
+        if not self.approx_equal_int(len(T), self.sim_config.M // 2, tolerance):
+            return False
+
+        # The protocol expects anti-correlation in every tuple
+        tuple_length = self.sim_config.N - 1
+        for k in range(self.sim_config.M):
+            pos = tuple_length * k + memory.lieutenant_index
+            if memory.command_vector[pos] == memory.bit_vector[pos]:
+                return False
+        return True
+
+    def check_alice_chunk(self, memory: LieutenantCMemory, chunk: Round1Message, tolerance: int = 0) -> bool | None:
+        """
+        Streaming form of check_alice: place one block of Alice's command vector by its offset and check it.
+        A message carrying the whole vector is a single block.
+        Returns False as soon as the vector can no longer pass, True once every tuple has arrived and passed, and
+        None while the outcome is still open.
+        """
+        if memory.received_order is None:
+            raise ValueError(f"No order specified for lieutenant {memory.lieutenant_index}")
+
+        tuple_length = self.sim_config.N - 1
+        if not memory.cv_buffer:
+            memory.cv_buffer = [None] * (tuple_length * self.sim_config.M)
+        offset = chunk.start_tuple * tuple_length
+        memory.cv_buffer[offset:offset + len(chunk.command_vector)] = chunk.command_vector
+
+        num_tuples = len(chunk.command_vector) // tuple_length
+        for k in range(num_tuples):
+            pos = tuple_length * k + memory.lieutenant_index
+            # The protocol expects anti-correlation in every tuple
+            if chunk.command_vector[pos] == memory.bit_vector[offset + pos]:
+                return False
+            if chunk.command_vector[pos] is not None and chunk.command_vector[pos] == memory.received_order:
+                memory.cv_order_matches += 1
+        memory.cv_tuples_received += num_tuples
+
+        # |T| only grows, so it is out of range once it overshoots or can no longer reach M/2
+        remaining = self.sim_config.M - memory.cv_tuples_received
+        expected = self.sim_config.M // 2
+        if memory.cv_order_matches > expected + tolerance:
+            return False
+        if memory.cv_order_matches + remaining < expected - tolerance:
+            return False
+        if remaining == 0:
+            return True
+        return None
+
+    def check_lieutenant_by_command_vector(self, memory: LieutenantCMemory, j: int, c: bool, j_command_vector: tuple[bool | None, ...], tolerance: int = 0) -> bool:
+        """
+        Check another lieutenant's command vector against this lieutenant's bit vector.
+        """
+
+        if c is None:
+            raise ValueError(f"Order must be certain not {c}")
+        if not j_command_vector:
+            raise ValueError(f"Command vector must be concrete not {j_command_vector}")
+            
+        T1 = self.T_i_x_j_y(v = j_command_vector, i = memory.lieutenant_index, j = j, x = c, y = c)
+        if not self.approx_equal_int(len(T1), self.sim_config.M // 4, tolerance):
+            return False
+
+        T2 = self.T_i_x_j_y(v = j_command_vector, i = memory.lieutenant_index, j = j, x = (not c), y = c)
+        if not self.approx_equal_int(len(T2), self.sim_config.M // 4, tolerance):
+            return False
+
+        T3 = self.T_i_x_j_y(v = memory.command_vector, i = memory.lieutenant_index, j = j, x = (not c), y = c)
+       
+        if not self.approx_equal_int(len(T2.symmetric_difference(T3)), 0, tolerance):
+            return False    
+        return True
+
+    def check_lieutenant_by_bit_vector(self, memory: LieutenantCMemory, j: int, c: bool, j_command_vector: tuple[bool | None, ...], tolerance: int = 0) -> bool:
+        """
+        Check another lieutenant's command vector against this lieutenant's bit vector.
+        """
+        T1 = self.T_i_x_j_y(v = j_command_vector, i = memory.lieutenant_index, j = j, x = c, y = c)
+        if not self.approx_equal_int(len(T1), self.sim_config.M // 4, tolerance):
+            return False
+
+        T2 = self.T_i_x_j_y(v = j_command_vector, i = memory.lieutenant_index, j = j, x = (not c), y = c)
+        if not self.approx_equal_int(len(T2), self.sim_config.M // 4, tolerance):
+            return False
+
+        tuple_length = self.sim_config.N - 1
+        for k in range(self.sim_config.M):
+            pos = tuple_length * k + memory.lieutenant_index
+            if j_command_vector[pos] == memory.bit_vector[pos]:
+                return False
+        return True
+
+
+    def observe_initial_evidence(self, memory: LieutenantCMemory, tally: Round2Tally, sender_idx: int, bundle: EvidenceBundle):
+        """Fold one lieutenant's initial evidence into the running round 2 state."""
+        d = bundle.initial.decision
+        tally.all_match = tally.all_match and d == tally.d_i
+        tally.all_none = tally.all_none and d is None
+
+        short_circuit = self.sim_config.SHORT_CIRCUIT_VERIFICATION
+
+        if tally.d_i in (0, 1):
+            if d == (not tally.d_i):
+                if short_circuit and tally.conflict_found:
+                    # Rule 3.3 already holds, a further conflicting CV only adds to the proofs
+                    tally.skipped_checks += 1
+                elif self.check_lieutenant_by_command_vector(
+                    memory,
+                    sender_idx,
+                    d,
+                    bundle.initial.command_vector,
+                    tolerance = self.sim_config.M // 10
+                ):
+                    tally.conflict_found = True
+                    tally.conflicting_proofs.append(bundle.initial.command_vector)
+        elif d is not None:  # d_i is None
+            if short_circuit and d in tally.valid_decisions:
+                # Rules 3.5/3.6 only depend on which decisions validated, not how often
+                tally.skipped_checks += 1
+            elif self.check_lieutenant_by_bit_vector(
+                memory,
+                sender_idx,
+                d,
+                bundle.initial.command_vector,
+                tolerance = self.sim_config.M // 10
+            ):
+                tally.valid_decisions.append(d)
+                tally.valid_proofs.append(bundle.initial.command_vector)
+
+    @staticmethod
+    def finalize_round2(tally: Round2Tally) -> tuple[bool | None, list[tuple[bool | None, ...]]]:
+        """Returns the intermediate decision and the command vectors to send as proof."""
+        d_i = tally.d_i
+        # Rule 3.1
+        if tally.all_match:
+            return d_i, []
+        if d_i in (0, 1):
+            # Rule 3.2
+            if tally.all_none:
+                return d_i, []
+            # Rule 3.3/3.4
+            if tally.conflict_found:
+                return None, tally.conflicting_proofs
+            return d_i, tally.conflicting_proofs
+        # Rule 3.5/3.6
+        if tally.valid_decisions and all(d == tally.valid_decisions[0] for d in tally.valid_decisions):
+            return tally.valid_decisions[0], [tally.valid_proofs[0]]  # Send 1 CV as proof
+        unique_proofs = dict(zip(tally.valid_decisions, tally.valid_proofs))
+        return d_i, list(unique_proofs.values())[:2]  # Send 2 contradicting CVs as proof
+
+    def decide_round4(self, memory: LieutenantCMemory):
+        """Rules 4.1-4.6: set the final decision from the merged evidence bundles in memory.proofs."""
+        for i in range(1):  # Trivial loop to be able to break out of logic sequence with "continue"s
+            d_i = memory.intermediate_decision
+            # Rule 4.1
+            if (d_i == None and len(memory.proofs[i].intermediary.command_vectors) == 2):
+                memory.final_decision = d_i
+                continue
+
+            received_decisions = [
+                bundle.intermediary.decision 
+                for sender_idx, bundle in memory.proofs.items()
+            ]
+
+            # Rule 4.2
+            if all(d == d_i for d in received_decisions):
+                memory.final_decision = d_i
+                continue
+
+            if d_i in (0, 1):
+                conflict_found = False
+                if any(bundle.intermediary.decision is None and bundle.initial.decision is not None
+                    for sender_idx, bundle in memory.proofs.items()):
+                    # Verifying consistent application of Rule 3.3
+                    candidates = [
+                        (sender_idx, bundle) for sender_idx, bundle in memory.proofs.items()
+                        if bundle.intermediary.decision is None and bundle.initial.decision is not None
+                        and bundle.intermediary.command_vectors
+                    ]
+                    for checked, (sender_idx, bundle) in enumerate(candidates, start=1):
+                        if self.check_lieutenant_by_command_vector(
+                            memory,
+                            sender_idx,
+                            bundle.initial.decision,
+                            bundle.intermediary.command_vectors[0],
+                            tolerance=self.sim_config.M // 10
+                        ):
+                            conflict_found = True
+                            memory.skipped_checks += len(candidates) - checked
+                            break
+                    # Rule 4.3/4.4
+                    if conflict_found:
+                        memory.final_decision = None
+                    else:
+                        memory.final_decision = d_i
+                    continue 
+
+                conflict_found = False
+                candidates = [
+                    (sender_idx, bundle) for sender_idx, bundle in memory.proofs.items()
+                    if bundle.intermediary.decision == (not d_i) and bundle.intermediary.command_vectors
+                ]
+                for checked, (sender_idx, bundle) in enumerate(candidates, start=1):
+                    if self.check_lieutenant_by_command_vector(
+                        memory,
+                        sender_idx,
+                        bundle.intermediary.decision,
+                        bundle.intermediary.command_vectors[0],
+                        tolerance=self.sim_config.M // 10
+                    ):
+                        conflict_found = True
+                        memory.skipped_checks += len(candidates) - checked
+                        break
+
+                # Rule 4.5/4.6
+                if conflict_found:
+                    memory.final_decision = None
+                else:
+                    memory.final_decision = d_i
+                continue
@@ -0,0 +1,423 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import struct
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable
+from protocol.config import SimulationConfig
+from protocol import wire
+from protocol.rules import (
+    Round1Message, InitialEvidence, IntermediaryEvidence, EvidenceBundle, Round2Tally,
+    CommanderCMemory, CommanderRules, LieutenantCMemory, LieutenantRules
+)
+
+"""
+DEFINE LOCALHOST RUNTIME
+"""
+
+# Runs the classical rounds outside the simulator, in real time: every player is an asyncio task, or its own OS
+# process, serving a Unix or TCP socket on localhost. Frames are a 4-byte big-endian length, the slot, the sender
+# (COMMANDER_SENDER for the commander) and the action, followed by the content in the binary wire format
+# (protocol.wire). Latencies are wall-clock seconds from the moment every player is connected, and CPU time is
+# the thread time each player spends in its own message handling.
+#
+# Every player opens one connection to each player it sends to, so a run holds about 2 * N^2 socket descriptors.
+# With asyncio tasks they all live in one process, which limits N to what RLIMIT_NOFILE allows (N of roughly 20
+# under the common soft limit of 1024, raised to the hard limit when needed); run_localhost checks this before
+# opening any socket. With processes=True each process holds about 4 * N.
+#
+# The runtime applies the same rules as LieutenantProtocol (protocol.rules), including CV_CHUNK_TUPLES streaming,
+# INCREMENTAL_ROUND2 and SHORT_CIRCUIT_VERIFICATION. Every slot is sent in its own messages and proofs are always
+# sent in full; ROUND_DEADLINE and HASH_REFERENCED_PROOFS only apply in the simulator.
+
+# A bit vector engine maps a config to every player's bit vectors, one per (instance, bit) slot
+BitVectorEngine = Callable[[SimulationConfig], dict[str, list[list[bool]]]]
+
+HEADER = struct.Struct("!I")
+MESSAGE_HEADER = struct.Struct("!IHB")  # Slot, sender, index of the action
+COMMANDER_SENDER = 0xFFFF  # Sender field of the commander's messages; lieutenants send their index
+
+
+@dataclass(frozen=True, slots=True)
+class RuntimeMessage:
+    slot: int
+    action: str
+    sender: int | str  # Lieutenant index, or the commander's name
+    content: Any
+
+
+def ideal_bit_vectors(sim_config: SimulationConfig, seed: int | None = None) -> dict[str, list[list[bool]]]:
+    """
+    Samples the measurement outcomes of noiseless distribution directly: in tuple k the commander's j-th bit is
+    anti-correlated with lieutenant j's j-th bit, and every other lieutenant's j-th bit is an independent |+> outcome.
+    """
+    rng = random.Random(seed)
+    tuple_length = sim_config.N - 1
+    bit_vectors = {name: [] for name in [sim_config.COMMANDER_NAME] + sim_config.LIEUTENANT_NAMES}
+    for _ in range(sim_config.NUM_SLOTS):
+        vectors = {name: [False] * (tuple_length * sim_config.M) for name in bit_vectors}
+        for k in range(sim_config.M):
+            for j, lieutenant_name in enumerate(sim_config.LIEUTENANT_NAMES):
+                pos = tuple_length * k + j
+                outcome = rng.random() < 0.5
+                vectors[sim_config.COMMANDER_NAME][pos] = outcome
+                for name in sim_config.LIEUTENANT_NAMES:
+                    vectors[name][pos] = (not outcome) if name == lieutenant_name else rng.random() < 0.5
+        for name, vector in vectors.items():
+            bit_vectors[name].append(vector)
+    return bit_vectors
+
+
+def pool_bit_vectors(sim_config: SimulationConfig) -> dict[str, list[list[bool]]]:
+    """Takes fresh blocks from the entanglement pool at ENTANGLEMENT_POOL, one per slot."""
+    from protocol.entanglement_pool import EntanglementPool  # Deferred, the pool builder needs the simulator
+
+    pool = EntanglementPool(sim_config.ENTANGLEMENT_POOL)
+    pool.check(sim_config)
+    blocks = pool.take(sim_config.NUM_SLOTS)
+    return {name: [pool.bit_vector(block, name) for block in blocks] for name in pool.player_names}
+
+
+class RuntimePlayer:
+    def __init__(self, name: str, sim_config: SimulationConfig, bit_vectors: list[list[bool]], addresses: dict[str, Any], seed: int | None = None):
+        self.name = name
+        self.sim_config = sim_config
+        self.bit_vectors = bit_vectors
+        self.addresses = addresses
+        self.rng = random.Random(seed)
+        self.writers: dict[str, asyncio.StreamWriter] = {}
+        self.connections: set[asyncio.Task] = set()  # Handlers of incoming connections
+        self.done = None  # Created in main, inside the event loop that runs the player
+        self.started_at = None
+        self.cpu_time = 0.0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.actions = [sim_config.ROUND1_ACTION, sim_config.ROUND2_ACTION, sim_config.ROUND3_ACTION]
+
+    async def start_server(self):
+        address = self.addresses[self.name]
+        if isinstance(address, str):
+            return await asyncio.start_unix_server(self.handle_connection, path=address)
+        return await asyncio.start_server(self.handle_connection, *address)
+
+    async def connect(self, destinations: list[str]):
+        for destination in destinations:
+            address = self.addresses[destination]
+            if isinstance(address, str):
+                _, writer = await asyncio.open_unix_connection(address)
+            else:
+                _, writer = await asyncio.open_connection(*address)
+            self.writers[destination] = writer
+
+    def send(self, destinations: list[str], message: RuntimeMessage):
+        """Queue one frame per destination; the frames go out at the next flush."""
+        sender = COMMANDER_SENDER if message.sender == self.sim_config.COMMANDER_NAME else message.sender
+        data = MESSAGE_HEADER.pack(message.slot, sender, self.actions.index(message.action)) + wire.encode(
+            message.content, self.sim_config.N - 1, compress=self.sim_config.WIRE_COMPRESSION
+        )
+        frame = HEADER.pack(len(data)) + data
+        for destination in destinations:
+            self.writers[destination].write(frame)
+            self.messages_sent += 1
+            self.bytes_sent += len(frame)
+
+    async def flush(self):
+        await asyncio.gather(*(writer.drain() for writer in self.writers.values()))
+
+    def timed(self, handler, *args):
+        start = time.thread_time()
+        try:
+            return handler(*args)
+        finally:
+            self.cpu_time += time.thread_time() - start
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections.add(asyncio.current_task())
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                data = await reader.readexactly(HEADER.unpack(header)[0])
+                self.timed(self.receive_frame, data)
+                await self.flush()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # A peer closed its connection at shutdown
+        finally:
+            writer.close()
+
+    def receive_frame(self, data: bytes):
+        slot, sender, action = MESSAGE_HEADER.unpack_from(data)
+        content = wire.decode(data[MESSAGE_HEADER.size:])
+        self.receive(RuntimeMessage(slot, self.actions[action], self.sim_config.COMMANDER_NAME if sender == COMMANDER_SENDER else sender, content))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def start(self):
+        """Called once every player is connected."""
+
+    def receive(self, message: RuntimeMessage):
+        pass
+
+    def report(self) -> dict:
+        return {"cpu_time": self.cpu_time, "messages_sent": self.messages_sent, "bytes_sent": self.bytes_sent}
+
+    async def main(self, destinations: list[str], barrier_wait: Callable) -> dict:
+        self.done = asyncio.Event()
+        server = await self.start_server()
+        await barrier_wait()  # Every server is listening
+        await self.connect(destinations)
+        await barrier_wait()  # Every player is connected
+        self.started_at = time.monotonic()
+        self.timed(self.start)
+        await self.flush()
+        await self.done.wait()
+        await barrier_wait()  # Nobody closes while a peer might still send to it
+        for writer in self.writers.values():
+            writer.close()
+        await asyncio.gather(*self.connections)  # Every peer closes its side too
+        server.close()
+        await server.wait_closed()
+        return self.report()
+
+
+class RuntimeCommander(RuntimePlayer, CommanderRules):
+    def __init__(self, name: str, sim_config: SimulationConfig, bit_vectors: list[list[bool]], addresses: dict[str, Any], orders: list[list[bool]], is_traitor: bool, seed: int | None = None):
+        super().__init__(name, sim_config, bit_vectors, addresses, seed)
+        self.memories = [
+            CommanderCMemory(name=name, orders=slot_orders, is_traitor=is_traitor, bit_vector=bit_vector)
+            for slot_orders, bit_vector in zip(orders, bit_vectors)
+        ]
+
+    def start(self):
+        tuple_length = self.sim_config.N - 1
+        chunk_tuples = self.sim_config.CV_CHUNK_TUPLES or self.sim_config.M
+        for slot, memory in enumerate(self.memories):
+            for idx, lieutenant_name in enumerate(self.sim_config.LIEUTENANT_NAMES):
+                command_vector = self._construct_command_vector(memory, idx)
+                memory.command_vectors[idx] = command_vector
+                for start_tuple in range(0, self.sim_config.M, chunk_tuples):
+                    end_tuple = min(start_tuple + chunk_tuples, self.sim_config.M)
+                    chunk = command_vector[start_tuple * tuple_length:end_tuple * tuple_length]
+                    message = Round1Message(order=memory.orders[idx], command_vector=chunk, start_tuple=start_tuple)
+                    self.send([lieutenant_name], RuntimeMessage(slot, self.sim_config.ROUND1_ACTION, self.name, message))
+        self.done.set()
+
+
+class RuntimeLieutenant(RuntimePlayer, LieutenantRules):
+    def __init__(self, name: str, sim_config: SimulationConfig, bit_vectors: list[list[bool]], addresses: dict[str, Any], lieutenant_index: int, is_traitor: bool, seed: int | None = None):
+        super().__init__(name, sim_config, bit_vectors, addresses, seed)
+        self.memories = [
+            LieutenantCMemory(name=name, lieutenant_index=lieutenant_index, is_traitor=is_traitor, bit_vector=bit_vector)
+            for bit_vector in bit_vectors
+        ]
+        self.lieutenant_index = lieutenant_index
+        self.peer_names = [peer for idx, peer in enumerate(sim_config.LIEUTENANT_NAMES) if idx != lieutenant_index]
+        self.num_decided = 0
+
+    def random_vector(self) -> tuple[bool | None, ...]:
+        return tuple(self.rng.choice([True, False, None]) for _ in range((self.sim_config.N - 1) * self.sim_config.M))
+
+    def receive(self, message: RuntimeMessage):
+        memory = self.memories[message.slot]
+        if message.action == self.sim_config.ROUND1_ACTION:
+            if memory.round1_complete:
+                return
+            memory.received_order = message.content.order
+            consistent = self.check_alice_chunk(memory, message.content, tolerance = self.sim_config.M // 10)
+            if consistent is not None:
+                self.complete_round1(message.slot, tuple(memory.cv_buffer), consistent)
+
+        elif message.action == self.sim_config.ROUND2_ACTION:
+            memory.proofs[message.sender] = message.content
+            if memory.round2_tally is not None:
+                self.observe_initial_evidence(memory, memory.round2_tally, message.sender, message.content)
+            if len(memory.proofs) == self.sim_config.NUM_LIEUTENANTS:
+                self.complete_round2(message.slot)
+
+        elif message.action == self.sim_config.ROUND3_ACTION:
+            memory.intermediary_proofs[message.sender] = message.content
+            if len(memory.intermediary_proofs) == self.sim_config.NUM_LIEUTENANTS:
+                self.complete_round3(message.slot)
+
+    def complete_round1(self, slot: int, command_vector: tuple[bool | None, ...], consistent: bool):
+        memory = self.memories[slot]
+        memory.round1_complete = True
+        memory.command_vector = command_vector
+        memory.initial_decision = memory.received_order if consistent else None
+        if memory.is_traitor:
+            memory.initial_decision = self.rng.choice([True, False, None])
+            memory.command_vector = self.random_vector()
+        memory.initial_decision_time = self.elapsed()
+
+        bundle = EvidenceBundle(initial=InitialEvidence(decision=memory.initial_decision, command_vector=memory.command_vector))
+        memory.proofs[memory.lieutenant_index] = bundle
+        if self.sim_config.INCREMENTAL_ROUND2:
+            memory.round2_tally = Round2Tally(d_i=memory.initial_decision)
+            for sender_idx, received in memory.proofs.items():
+                self.observe_initial_evidence(memory, memory.round2_tally, sender_idx, received)
+        self.send(self.peer_names, RuntimeMessage(slot, self.sim_config.ROUND2_ACTION, self.lieutenant_index, bundle))
+        if len(memory.proofs) == self.sim_config.NUM_LIEUTENANTS:
+            self.complete_round2(slot)  # Every peer's bundle beat our own command vector
+
+    def complete_round2(self, slot: int):
+        memory = self.memories[slot]
+        if not memory.round1_complete or memory.round2_complete:
+            return  # Our own initial evidence is still missing
+        memory.round2_complete = True
+        tally = memory.round2_tally
+        if tally is None:
+            tally = Round2Tally(d_i=memory.initial_decision)
+            for sender_idx, bundle in memory.proofs.items():
+                self.observe_initial_evidence(memory, tally, sender_idx, bundle)
+        memory.intermediate_decision, collected_proofs = self.finalize_round2(tally)
+        memory.skipped_checks += tally.skipped_checks
+        if memory.is_traitor:
+            memory.intermediate_decision = self.rng.choice([True, False, None])
+            collected_proofs = [self.random_vector() for _ in range(self.rng.choice([0, 1, 2]))]
+        memory.intermediate_decision_time = self.elapsed()
+
+        evidence = IntermediaryEvidence(decision=memory.intermediate_decision, command_vectors=collected_proofs)
+        memory.intermediary_proofs[memory.lieutenant_index] = evidence
+        self.send(self.peer_names, RuntimeMessage(slot, self.sim_config.ROUND3_ACTION, self.lieutenant_index, evidence))
+        if len(memory.intermediary_proofs) == self.sim_config.NUM_LIEUTENANTS:
+            self.complete_round3(slot)
+
+    def complete_round3(self, slot: int):
+        memory = self.memories[slot]
+        if not memory.round2_complete or memory.round3_complete:
+            return  # Our own intermediary evidence is still missing
+        memory.round3_complete = True
+        for proof_id, evidence in memory.intermediary_proofs.items():
+            memory.proofs[proof_id] = replace(memory.proofs[proof_id], intermediary=evidence)
+        self.decide_round4(memory)
+        if memory.is_traitor:
+            memory.final_decision = self.rng.choice([True, False, None])
+        memory.final_decision_time = memory.time_to_agreement = self.elapsed()
+
+        self.num_decided += 1
+        if self.num_decided == len(self.memories):
+            self.done.set()
+
+    def report(self) -> dict:
+        results = []
+        for slot, memory in enumerate(self.memories):
+            instance, bit = divmod(slot, self.sim_config.BITS_PER_AGREEMENT)
+            results.append({"instance": instance,
+                            "bit": bit,
+                            "is_traitor": memory.is_traitor,
+                            "received_order": memory.received_order,
+                            "initial_decision": memory.initial_decision,
+                            "intermediate_decision": memory.intermediate_decision,
+                            "final_decision": memory.final_decision,
+                            "skipped_checks": memory.skipped_checks,
+                            "time_to_agreement": memory.time_to_agreement,
+                            "initial_decision_time": memory.initial_decision_time,
+                            "intermediate_decision_time": memory.intermediate_decision_time,
+                            "final_decision_time": memory.final_decision_time})
+        return {**super().report(), "results": results}
+
+
+def localhost_addresses(sim_config: SimulationConfig, transport: str, directory: str) -> dict[str, Any]:
+    """A Unix socket path, or a free localhost TCP port, per player."""
+    addresses = {}
+    for name in [sim_config.COMMANDER_NAME] + sim_config.LIEUTENANT_NAMES:
+        if transport == "unix":
+            addresses[name] = os.path.join(directory, f"{name}.sock")
+        elif transport == "tcp":
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.bind(("127.0.0.1", 0))
+                addresses[name] = ("127.0.0.1", s.getsockname()[1])
+        else:
+            raise ValueError(f"Unknown transport {transport}")
+    return addresses
+
+
+def create_players(sim_config: SimulationConfig, bit_vectors: dict[str, list[list[bool]]], addresses: dict[str, Any], seed: int | None = None) -> list[tuple[RuntimePlayer, list[str]]]:
+    """Every player with the peers it sends to."""
+    rng = random.Random(seed)
+    orders = []
+    for slot in range(sim_config.NUM_SLOTS):
+        if sim_config.COMMANDER_IS_TRAITOR:
+            orders.append([rng.choice([True, False]) for _ in sim_config.LIEUTENANT_NAMES])
+        else:
+            orders.append([sim_config.loyal_order(slot)] * len(sim_config.LIEUTENANT_NAMES))
+
+    commander = RuntimeCommander(sim_config.COMMANDER_NAME, sim_config, bit_vectors[sim_config.COMMANDER_NAME], addresses, orders, sim_config.COMMANDER_IS_TRAITOR, seed=rng.random())
+    players = [(commander, list(sim_config.LIEUTENANT_NAMES))]
+    for idx, name in enumerate(sim_config.LIEUTENANT_NAMES):
+        lieutenant = RuntimeLieutenant(name, sim_config, bit_vectors[name], addresses, idx, idx in sim_config.TRAITOR_INDICES, seed=rng.random())
+        players.append((lieutenant, lieutenant.peer_names))
+    return players
+
+
+async def run_tasks(players: list[tuple[RuntimePlayer, list[str]]]) -> list[dict]:
+    barrier = asyncio.Barrier(len(players))
+    return await asyncio.gather(*(player.main(destinations, barrier.wait) for player, destinations in players))
+
+
+def run_process(player: RuntimePlayer, destinations: list[str], barrier, results):
+    async def barrier_wait():
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    results.put((player.name, asyncio.run(player.main(destinations, barrier_wait))))
+
+
+def check_descriptor_limit(players: list[tuple[RuntimePlayer, list[str]]]):
+    """
+    Raises the soft RLIMIT_NOFILE to the hard limit if the players of one process need more descriptors than it
+    allows, and raises ValueError if even the hard limit is too low.
+    """
+    # Both ends of every connection, one listening socket per player and a margin for the rest of the process
+    needed = 2 * sum(len(destinations) for _, destinations in players) + len(players) + 64
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if needed <= soft:
+        return
+    if hard != resource.RLIM_INFINITY and needed > hard:
+        raise ValueError(f"{len(players)} players in one process need about {needed} descriptors, over the limit of {hard}; "
+                         f"use processes=True or raise RLIMIT_NOFILE")
+    resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+
+def run_localhost(sim_config: SimulationConfig, engine: BitVectorEngine = ideal_bit_vectors, transport: str = "unix", processes: bool = False) -> dict:
+    """
+    Runs every slot of `sim_config` at once over localhost sockets, with bit vectors from `engine`.
+    Returns each player's report under its name, plus the wall-clock time until the last final decision and the
+    agreed bits per second.
+    """
+    assert sim_config.NUM_LIEUTENANTS < COMMANDER_SENDER, "Too many lieutenants for the sender field of a frame!"
+    bit_vectors = engine(sim_config)
+    with tempfile.TemporaryDirectory() as directory:
+        addresses = localhost_addresses(sim_config, transport, directory)
+        players = create_players(sim_config, bit_vectors, addresses, seed=sim_config.SEED)
+        if not processes:
+            check_descriptor_limit(players)
+        if processes:
+            barrier = multiprocessing.Barrier(len(players))
+            queue = multiprocessing.Queue()
+            workers = [multiprocessing.Process(target=run_process, args=(player, destinations, barrier, queue)) for player, destinations in players]
+            for worker in workers:
+                worker.start()
+            reports = dict(queue.get() for _ in workers)
+            for worker in workers:
+                worker.join()
+        else:
+            reports = dict(zip((player.name for player, _ in players), asyncio.run(run_tasks(players))))
+
+    wall_time = max(entry["final_decision_time"] for name in sim_config.LIEUTENANT_NAMES for entry in reports[name]["results"])
+    return {"players": reports, "wall_time": wall_time, "throughput": sim_config.NUM_SLOTS / wall_time}
+
+
+if __name__ == "__main__":
+    sim_config = SimulationConfig(COMMANDER_IS_TRAITOR=False, NUM_INSTANCES=10, SEED=1)
+    for processes in (False, True):
+        summary = run_localhost(sim_config, processes=processes)
+        print(f"\n{'Processes' if processes else 'Tasks'}: {sim_config.NUM_SLOTS} agreements in {summary['wall_time']:.4f} s, "
+              f"{summary['throughput']:.1f} agreed bits per second")
+        for name, report in summary["players"].items():
+            print(f"  {name}: CPU {report['cpu_time']:.4f} s, {report['messages_sent']} messages, {report['bytes_sent']} bytes")
+            for entry in report.get("results", [])[:1]:
+                print(f"    Final decision {entry['final_decision']} after {entry['time_to_agreement']:.4f} s")
@@ -2,6 +2,11 @@ import aqnsim
 from protocol.distributor import Distributor, DistributorProtocol
 from protocol.lieutenants import Lieutenant, LieutenantProtocol
 from protocol.commander import Commander, CommanderProtocol
+from protocol.players import DistributionBarrier
+from protocol.classical_bus import ClassicalBus, ClassicalBusProtocol
+from protocol.traffic import TrafficLog
+from protocol.delays import LinkDelaySampler
+from protocol.entanglement_pool import load_from_pool
 from typing import List, Any
 from protocol.config import SimulationConfig
 # from protocol.config import (
@@ -16,9 +21,17 @@ def print_game_stats(results, sim_config: SimulationConfig):
     print(f"Commander: {sim_config.COMMANDER_NAME}")
     print(f"Commander's orders: {latest_results[sim_config.COMMANDER_NAME][0]['orders']}")
     print(f"Commander is {'TRAITOR' if latest_results[sim_config.COMMANDER_NAME][0]['is_traitor'] else 'loyal'}")
+    print(f"Entanglement distribution time: {latest_results['DistributionTime'][0]}")
+    traffic = latest_results['Traffic'][0]
+    total = traffic.total()
+    print(f"Classical traffic: {total.messages} messages, {total.bytes} bytes")
+    for round_number, count in sorted(traffic.by_round().items()):
+        print(f"  Round {round_number}: {count.messages} messages, {count.bytes} bytes")
     print("-----------------------------------------------")
     print("Lieutenant Results:")
     for key, value in latest_results.items(): # PRINT LIEUTENANT INFO
+        if key in ("DistributionTime", "Traffic"):
+            continue
         if "orders" not in latest_results[key][0]: 
             print(f"\nLieutenant: {key}")
             print(f"  Traitor: {'Yes' if latest_results[key][0]['is_traitor'] else 'No'}")
@@ -26,63 +39,149 @@ def print_game_stats(results, sim_config: SimulationConfig):
             print(f"  Initial decision: {latest_results[key][0]['initial_decision']}")
             print(f"  Intermediate decision: {latest_results[key][0]['intermediate_decision']}")
             print(f"  Final decision: {latest_results[key][0]['final_decision']}")
+            print(f"  Skipped checks: {latest_results[key][0]['skipped_checks']}")
+            print(f"  Time to agreement: {latest_results[key][0]['time_to_agreement']}")
+            print(f"  Decided at: initial {latest_results[key][0]['initial_decision_time']}, "
+                  f"intermediate {latest_results[key][0]['intermediate_decision_time']}, "
+                  f"final {latest_results[key][0]['final_decision_time']}")
     print("===============================================\n")
 
 
-def create_commander(sim_context: aqnsim.SimulationContext, sim_config: SimulationConfig):
-    if sim_config.COMMANDER_IS_TRAITOR:
-        orders = [aqnsim.random_utilities.choice([True, False]) for _ in sim_config.LIEUTENANT_NAMES]
-    else:
-        orders = [sim_config.LOYAL_COMMANDER_ORDER] * len(sim_config.LIEUTENANT_NAMES)
+def agreement_throughput(results, sim_config: SimulationConfig) -> float | None:
+    """
+    Agreed bits per simulated second over a full run, which is agreements per second when BITS_PER_AGREEMENT is 1.
+    A bit counts as agreed once the last lieutenant reaches its final decision for it. Takes the full results, not
+    just the latest entries, since every slot adds one.
+    """
+    agreed_at = {}
+    for name in sim_config.LIEUTENANT_NAMES:
+        for entry in results.get(name, []):
+            slot, decided_at = (entry[0]["instance"], entry[0]["bit"]), entry[0]["final_decision_time"]
+            agreed_at[slot] = max(agreed_at.get(slot, decided_at), decided_at)
+    if len(agreed_at) < sim_config.NUM_SLOTS:
+        return None  # Some bit never reached agreement
+    return sim_config.NUM_SLOTS / (max(agreed_at.values()) / sim_config.SEC)
+
+
+def agreement_cost(results, sim_config: SimulationConfig, single_bit_results=None) -> dict:
+    """
+    Qubits and classical messages spent per agreed bit. Every qubit is still spent per bit; batching shares each
+    round's messages across the BITS_PER_AGREEMENT bits.
+    Pass the results of the same sweep point run with BITS_PER_AGREEMENT=1 as `single_bit_results` to compare
+    against messages per bit measured with one bit per instance. Without them only an estimate is given, which
+    assumes a single-bit instance sends as many messages as a batched one.
+    """
+    qubits_per_tuple = sim_config.NUM_PLAYERS * sim_config.NUM_LIEUTENANTS  # An EPR pair and N-2 |+> states per lieutenant
+    messages = results["Traffic"][-1][0].total().messages
+    cost = {
+        "qubits_per_bit": qubits_per_tuple * sim_config.M,
+        "messages_per_bit": messages / sim_config.NUM_SLOTS,
+        "estimated_single_bit_messages_per_bit": messages / sim_config.NUM_INSTANCES,
+    }
+    if single_bit_results is not None:
+        single_bit_config = single_bit_results["Config"][-1][0]
+        cost["single_bit_messages_per_bit"] = single_bit_results["Traffic"][-1][0].total().messages / single_bit_config.NUM_SLOTS
+    return cost
+
+
+def create_commander(sim_context: aqnsim.SimulationContext, sim_config: SimulationConfig, distribution_barriers: list[DistributionBarrier] | None = None, traffic_log: TrafficLog | None = None):
+    orders = []
+    rng = sim_config.random_stream(sim_config.COMMANDER_NAME)
+    for slot in range(sim_config.NUM_SLOTS):
+        if sim_config.COMMANDER_IS_TRAITOR:
+            orders.append([rng.choice([True, False]) for _ in sim_config.LIEUTENANT_NAMES])
+        else:
+            orders.append([sim_config.loyal_order(slot)] * len(sim_config.LIEUTENANT_NAMES))
     
-    return Commander(sim_context, sim_config.COMMANDER_NAME, orders, sim_config.COMMANDER_IS_TRAITOR, sim_config=sim_config)
+    return Commander(sim_context, sim_config.COMMANDER_NAME, orders, sim_config.COMMANDER_IS_TRAITOR, sim_config=sim_config, distribution_barriers=distribution_barriers, traffic_log=traffic_log)
 
 
-def create_lieutenants(sim_context: aqnsim.SimulationContext, sim_config: SimulationConfig):
+def create_lieutenants(sim_context: aqnsim.SimulationContext, sim_config: SimulationConfig, distribution_barriers: list[DistributionBarrier] | None = None, traffic_log: TrafficLog | None = None):
     return [
         Lieutenant(
             sim_context = sim_context, 
             name = name, 
             lieutenant_index = idx, 
             is_traitor = (idx in sim_config.TRAITOR_INDICES),
-            sim_config=sim_config
+            sim_config=sim_config,
+            distribution_barriers=distribution_barriers,
+            traffic_log=traffic_log
         )
         for idx, name in enumerate(sim_config.LIEUTENANT_NAMES)
     ]
 
+
+def create_distributors(sim_context: aqnsim.SimulationContext, sim_config: SimulationConfig):
+    """One Distributor per entry in DISTRIBUTOR_NAMES, each serving its own contiguous shard of the M tuples."""
+    return [
+        Distributor(
+            sim_context = sim_context,
+            name = name,
+            sim_config = sim_config,
+            shard = sim_config.distributor_shard(source_index)
+        )
+        for source_index, name in enumerate(sim_config.DISTRIBUTOR_NAMES)
+    ]
+
     
 def setup_network(sim_context: aqnsim.SimulationContext, parameters: SimulationConfig) -> aqnsim.Network:
     
     
-    distributor = Distributor(sim_context = sim_context, name = parameters.DISTRIBUTOR_NAME, sim_config=parameters)
-    commander = create_commander(sim_context, parameters)
-    lieutenants = create_lieutenants(sim_context, parameters)
+    distribution_barriers = [DistributionBarrier(sim_context = sim_context, parties = parameters.NUM_PLAYERS) for _ in range(parameters.NUM_INSTANCES)]
+    # Pool mode skips the distribution phase, so there are no sources and no quantum links
+    distributors = create_distributors(sim_context, parameters) if parameters.ENTANGLEMENT_POOL is None else []
+    traffic_log = TrafficLog(parameters)
+    delay_sampler = LinkDelaySampler(parameters)
+    commander = create_commander(sim_context, parameters, distribution_barriers, traffic_log)
+    lieutenants = create_lieutenants(sim_context, parameters, distribution_barriers, traffic_log)
+
+    classical_nodes = []
+    if parameters.CLASSICAL_BUS:
+        classical_nodes.append(ClassicalBus(sim_context = sim_context, name = parameters.CLASSICAL_BUS_NAME, sim_config=parameters, delay_sampler=delay_sampler))
 
-    network = aqnsim.Network(sim_context=sim_context, nodes=[distributor, commander] + lieutenants)
+    network = aqnsim.Network(sim_context=sim_context, nodes=distributors + classical_nodes + [commander] + lieutenants)
 
     players = lieutenants + [commander]
 
-    for player in players:
-        qlink = aqnsim.QuantumLink(
-            sim_context = sim_context,
-            delay = parameters.QUANTUM_CHANNEL_DELAY,
-            noise = parameters.QUANTUM_CHANNEL_NOISE,
-            name=f"Q_Link_{player.name}_{parameters.DISTRIBUTOR_NAME}"       
-        )
-        network.add_link(qlink, distributor, player, player.name, parameters.DISTRIBUTOR_NAME)
+    for distributor in distributors:
+        for player in players:
+            qlink = aqnsim.QuantumLink(
+                sim_context = sim_context,
+                delay = delay_sampler.quantum_delay(distributor.name, player.name),
+                noise = parameters.QUANTUM_CHANNEL_NOISE,
+                name=f"Q_Link_{player.name}_{distributor.name}"       
+            )
+            network.add_link(qlink, distributor, player, player.name, distributor.name)
 
-    for player1 in players:
-        for player2 in players:
-            if player1 == player2:
-                continue
+    if parameters.CLASSICAL_BUS:
+        # O(N) links: each player reaches the bus through a zero-delay link and the bus applies the channel delay
+        bus = classical_nodes[0]
+        for player in players:
             clink = aqnsim.ClassicalLink(
                 sim_context = sim_context,
-                delay = parameters.CLASSICAL_CHANNEL_DELAY,
-                name=f"C_Link_{player1.name}_{player2.name}"       
+                delay = 0,
+                name=f"C_Link_{player.name}_{bus.name}"       
             )
-            network.add_link(clink, player1, player2, player2.name, player1.name)
+            network.add_link(clink, bus, player, player.name, bus.name)
+    else:
+        for player1 in players:
+            for player2 in players:
+                if player1 == player2:
+                    continue
+                clink = aqnsim.ClassicalLink(
+                    sim_context = sim_context,
+                    delay = delay_sampler.classical_delay(player1.name, player2.name),
+                    name=f"C_Link_{player1.name}_{player2.name}"       
+                )
+                network.add_link(clink, player1, player2, player2.name, player1.name)
+
+    if parameters.ENTANGLEMENT_POOL is not None:
+        load_from_pool(parameters, players, distribution_barriers)
 
-    DistributorProtocol(sim_context = sim_context, node = distributor)
+    for distributor in distributors:
+        DistributorProtocol(sim_context = sim_context, node = distributor)
+    for classical_node in classical_nodes:
+        ClassicalBusProtocol(sim_context = sim_context, node = classical_node)
     CommanderProtocol(sim_context = sim_context, node = commander)
     for lieutenant in lieutenants:
         LieutenantProtocol(sim_context = sim_context, node = lieutenant)
@@ -96,3 +195,5 @@ if __name__ == "__main__":
     results = run_simulation(sim_config)
     latest_results = {k: v[-1] if v else None for k, v in results.items()}
     print_game_stats(latest_results, sim_config)
+    print(f"Throughput: {agreement_throughput(results, sim_config)} agreed bits per simulated second")
+    print(f"Cost: {agreement_cost(results, sim_config)}")
@@ -1,60 +1,191 @@
 import aqnsim
+import copy
+import numpy as np
 from protocol.distributor import Distributor, DistributorProtocol
 from protocol.lieutenants import Lieutenant, LieutenantProtocol
 from protocol.commander import Commander, CommanderProtocol
 from protocol.simulation import setup_network
+import importlib
+import multiprocessing
+import os
 import random
 import time
 import sqlite3
 import datetime
 from protocol.config import SimulationConfig
 from protocol.simulation import print_game_stats
-from results.database import fetch_sweep_shots, store_sweep_result
+from results.database import fetch_sweep_shots, store_sweep_result, reuse_stored_runs, store_sweep_manifest, fetch_sweep_manifest
 
 
 
+def vote_string(decision) -> str:
+    return "1" if decision == True else "0" if decision == False else "N"
+
+
+def summarize_shot(results) -> dict:
+    """
+    Reduce one run's results to the per-shot fields of store_sweep_result: the commander's orders, every lieutenant's
+    votes and time to agreement, the config and the traffic log.
+    """
+    latest_results = {k: v[-1] if v else None for k, v in results.items()}
+    config = latest_results["Config"][0]
+    # A lieutenant that never reached a final decision recorded nothing; it counts as an "N" vote with no time
+    lieutenants = [latest_results[name][0] if latest_results.get(name) else {} for name in config.LIEUTENANT_NAMES]
+    return {
+        "commands_sent": " ".join("1" if i else "0" for i in latest_results[config.COMMANDER_NAME][0]["orders"]),
+        "initial_result": " ".join(vote_string(entry.get("initial_decision")) for entry in lieutenants),
+        "intermediate_result": " ".join(vote_string(entry.get("intermediate_decision")) for entry in lieutenants),
+        "final_result": " ".join(vote_string(entry.get("final_decision")) for entry in lieutenants),
+        "config": config,
+        "traffic": latest_results["Traffic"][0],
+        "time_to_agreement": " ".join("N" if entry.get("time_to_agreement") is None else str(entry["time_to_agreement"]) for entry in lieutenants),
+    }
+
+
 def run_sweep2(sweep_param, sweep_vals, exp_name, num_shots):
-    run_sim_fn = aqnsim.generate_run_simulation_fn(setup_sim_fn=setup_network, logging_level=0, log_to_file=False)
-    
-    for shot in range(1, num_shots+1):
-        res = aqnsim.run_simulations(run_sim_fn, sweep_vals)
-        for pt in res:
-            latest_results = {k: v[-1] if v else None for k, v in pt.items()}
-            commands_sent_bool = latest_results['Alice'][0]['orders']
-            commands_sent = ["1" if i else "0" for i in commands_sent_bool]
-            initial_votes = []
-            intermediate_votes = []
-            final_votes = []
-            is_traitor = []
-            
-            print("SHOT", shot)
-            print("M", latest_results["M"][0])
-            print()
-            print(f"Commander's orders: {commands_sent}")
-            print(f"Commander is {'TRAITOR' if latest_results['Alice'][0]['is_traitor'] else 'loyal'}")
-            print()
-            print("Lieutenant Results:")
-            for key, value in latest_results.items():
-                if (key == "M" or key == "Config"):
-                    continue
-                if "orders" not in latest_results[key][0]: 
-                    print(f"Traitor: {'Yes' if latest_results[key][0]['is_traitor'] else 'No'} {latest_results[key][0]['final_decision']}")
-                    initial_votes.append("1" if latest_results[key][0]['initial_decision'] == True else "0" if latest_results[key][0]['initial_decision'] == False else "N")
-                    intermediate_votes.append("1" if latest_results[key][0]['intermediate_decision'] == True else "0" if latest_results[key][0]['intermediate_decision'] == False else "N")
-                    final_votes.append("1" if latest_results[key][0]['final_decision'] == True else "0" if latest_results[key][0]['final_decision'] == False else "N")
-                    is_traitor.append("1" if latest_results[key][0]['is_traitor'] else "0")
-            print("===============================================\n")
-            store_sweep_result(exp_name, sweep_param, pt[sweep_param][0][0], shot, " ".join(commands_sent), " ".join(initial_votes), " ".join(intermediate_votes), " ".join(final_votes), latest_results["Config"][0])
-        
-    
-    # print(res[0])
-    # print(res)
-    # for run in res:
-    #     print(run["M"])
-    # print(res[0]["M"])
-        
+    """Kept for existing callers; the whole (value, shot) grid runs on one process pool (see run_sweep)."""
+    run_sweep(sweep_param, sweep_vals, exp_name, num_shots)
+
+
+"""
+PROCESS-POOL SWEEP ENGINE
+"""
+
+# The whole (sweep value x shot) grid is one flat task list, so every core stays busy instead of at most one per
+# sweep value, and each finished run is stored as soon as it arrives. Workers reduce their run to a summary before
+# returning it, so only a few strings and the traffic log cross the process boundary.
+
+def seeded_config(config: SimulationConfig, shot: int) -> SimulationConfig:
+    """
+    The config of one shot, with a SEED derived from the config's own SEED and the shot number. Shot k of a sweep
+    therefore always has the same run key, however many shots the sweep has.
+    """
+    seeded = copy.copy(config)
+    seeded.SEED = random.Random(f"{config.SEED}:{shot}").getrandbits(32)
+    return seeded
+
+
+def sweep_tasks(sweep_vals, num_shots) -> list[tuple[int, list]]:
+    """Every (shot, simulation parameters) pair of the sweep, each with its own seeded config."""
+    return [(shot, [seeded_config(params[0], shot), *params[1:]]) for shot in range(1, num_shots + 1) for params in sweep_vals]
+
+
+def pending_sweep_tasks(sweep_param, sweep_vals, exp_name, num_shots) -> list[tuple[int, list]]:
+    """
+    Record the sweep's manifest, then return the tasks it still has to compute. Runs already stored, by this or
+    another experiment, are reused instead of recomputed and marked done, and a repeated sweep value is computed once.
+    Raises ValueError for configs with more than one agreement slot, since a sweep stores one agreement per run.
+    """
+    for params in sweep_vals:
+        if params[0].NUM_SLOTS > 1:
+            raise ValueError(f"Sweeps store one agreement per run, but {sweep_param}={getattr(params[0], sweep_param)} runs "
+                             f"{params[0].NUM_SLOTS}; set NUM_INSTANCES and BITS_PER_AGREEMENT to 1")
+    tasks = sweep_tasks(sweep_vals, num_shots)
+    runs = [(params[0].run_key(), sweep_param, getattr(params[0], sweep_param), shot) for shot, params in tasks]
+    # Tasks run through the sweep values once per shot, so a task's position gives its value's index
+    store_sweep_manifest(exp_name, sweep_param, sweep_vals, num_shots,
+                         [(index % len(sweep_vals), shot, value, params[0].SEED, run_key)
+                          for index, ((run_key, _, value, shot), (_, params)) in enumerate(zip(runs, tasks))])
+    reuse_stored_runs(exp_name, runs)
+    _, _, _, pending = fetch_sweep_manifest(exp_name)
+    pending_tasks = {}
+    for task, run in zip(tasks, runs):
+        if run[0] in pending:
+            pending_tasks.setdefault(run[0], task)  # Tasks with the same run key are the same run
+    num_runs = len({run[0] for run in runs})
+    print(f"{num_runs - len(pending_tasks)} of {num_runs} runs already stored")
+    return list(pending_tasks.values())
+
+
+# Run function of a warm worker, built once by init_sweep_worker
+worker_run_sim_fn = None
+
+def init_sweep_worker():
+    """Pool initializer: load the simulator and every protocol module, and build the run function, once per worker."""
+    global worker_run_sim_fn
+    for module in ("aqnsim", "protocol.simulation", "protocol.entanglement_pool", "protocol.wire"):
+        importlib.import_module(module)
+    worker_run_sim_fn = aqnsim.generate_run_simulation_fn(setup_sim_fn=setup_network, logging_level=0, log_to_file=False)
+
+
+def run_sweep_task(task: tuple[int, list]) -> tuple[int, dict]:
+    shot, params = task
+    if worker_run_sim_fn is None:
+        init_sweep_worker()  # Running outside a SweepPool
+    # The shot's SEED drives every random draw of the run, not just the link delays. The protocol's own draws (a
+    # traitor's orders, votes and vectors) come from SimulationConfig.random_stream; the simulator's measurement and
+    # noise sampling is assumed to use the global generators seeded here, as aqnsim exposes no seed of its own
+    random.seed(params[0].SEED)
+    np.random.seed(params[0].SEED)
+    return shot, summarize_shot(worker_run_sim_fn(*params))
+
+
+class SweepPool:
+    """
+    Long-lived pool of warm sweep workers, reused across shots and sweeps so that every worker pays the simulator
+    import and setup cost once instead of once per batch. Use it as a context manager, or close() it when done.
+    """
+    def __init__(self, num_workers=None):
+        self.num_workers = num_workers or os.cpu_count()
+        self.pool = multiprocessing.Pool(self.num_workers, initializer=init_sweep_worker)
+
+    def imap(self, tasks: list, chunksize=None):
+        """Run the tasks, yielding results in completion order."""
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (4 * self.num_workers))  # A few chunks per worker balances load against dispatch overhead
+        return self.pool.imap_unordered(run_sweep_task, tasks, chunksize)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_sweep(sweep_param, sweep_vals, exp_name, num_shots, num_workers=None, chunksize=None, pool: SweepPool | None = None):
+    """
+    Run num_shots shots of every entry of sweep_vals on a pool of num_workers processes (default: one per core),
+    storing each result as it completes. Results arrive in completion order, not grid order.
+    Pass a SweepPool to reuse its warm workers; otherwise one is started for this sweep.
+    Runs whose run key is already in the database are not computed again, so extending a sweep by more shots or
+    sweep values only computes the new runs. The sweep is recorded in a manifest first, so resume(exp_name) can
+    finish it if it is interrupted.
+    Every config must run a single agreement slot, as only one is stored per run.
+    """
+    tasks = pending_sweep_tasks(sweep_param, sweep_vals, exp_name, num_shots)
+    if not tasks:
+        return
+    own_pool = pool is None
+    if own_pool:
+        pool = SweepPool(num_workers)
+    try:
+        for done, (shot, summary) in enumerate(pool.imap(tasks, chunksize), start=1):
+            swept_value = getattr(summary["config"], sweep_param)
+            store_sweep_result(exp_name, sweep_param, swept_value, shot, **summary)
+            print(f"[{done}/{len(tasks)}] {sweep_param}={swept_value} shot {shot}: {summary['final_result']}")
+    finally:
+        if own_pool:
+            pool.close()
+
+
+def resume(exp_name, num_workers=None, chunksize=None, pool: SweepPool | None = None):
+    """
+    Finish a sweep from its manifest after a crash or kill: dispatch only the tasks that have no stored result,
+    with the seeds they were recorded with.
+    """
+    manifest = fetch_sweep_manifest(exp_name)
+    if manifest is None:
+        raise ValueError(f"No sweep manifest recorded for experiment {exp_name}")
+    sweep_param, sweep_vals, num_shots, _ = manifest
+    run_sweep(sweep_param, sweep_vals, exp_name, num_shots, num_workers=num_workers, chunksize=chunksize, pool=pool)
+
+
 if __name__ == "__main__":
     start_time = time.time()
-    params = [[SimulationConfig(M=i, COMMANDER_IS_TRAITOR=False, LOYAL_COMMANDER_ORDER=(True if random.random() < 0.5 else False))] for i in [4, 8, 16, 32, 64, 128, 192, 256, 384, 512]] # , 32, 64, 128, 192, 256, 384, 512
-    run_sweep2("M", params, f"M_sweep_real_1", num_shots=50)
+    params = [[SimulationConfig(M=i, COMMANDER_IS_TRAITOR=False, LOYAL_COMMANDER_ORDER=(random.Random(i).random() < 0.5))] for i in [4, 8, 16, 32, 64, 128, 192, 256, 384, 512]] # , 32, 64, 128, 192, 256, 384, 512
+    run_sweep("M", params, f"M_sweep_real_1", num_shots=50)
     print(time.time() - start_time)
\ No newline at end of file
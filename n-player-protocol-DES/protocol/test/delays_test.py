@@ -0,0 +1,53 @@
+import pytest
+import random
+
+from protocol.config import SimulationConfig
+from protocol.delays import LinkDelaySampler, sample_delay
+
+
+@pytest.mark.parametrize("spec, low, high", [
+    (7, 7, 7),
+    (("uniform", 2, 3), 2, 3),
+    (("normal", 0, 1), 0, float("inf")),  # Clipped at zero
+    (("lognormal", 0, 1), 0, float("inf")),
+    (("exponential", 5), 0, float("inf")),
+])
+def test_samples_stay_in_range(spec, low, high):
+    rng = random.Random(1)
+    assert all(low <= sample_delay(spec, rng) <= high for _ in range(200))
+
+
+def test_rejects_unknown_distribution():
+    with pytest.raises(ValueError):
+        sample_delay(("pareto", 1), random.Random(1))
+
+
+def test_specs_by_link_with_default():
+    sim_config = SimulationConfig(
+        CLASSICAL_DELAY_SPECS={("Alice", "Bob"): 11, "*": ("uniform", 20, 30)},
+        QUANTUM_DELAY_SPECS={("Distributor", "Charlie"): 5},
+        CLASSICAL_CHANNEL_DELAY=1, QUANTUM_CHANNEL_DELAY=2, SEED=1
+    )
+    sampler = LinkDelaySampler(sim_config)
+    # Pairs match in either order, "*" covers every other link, and links without a spec keep the fixed delay
+    assert sampler.classical_delay("Alice", "Bob") == sampler.classical_delay("Bob", "Alice") == 11
+    assert 20 <= sampler.classical_delay("Bob", "Charlie") <= 30
+    assert sampler.quantum_delay("Charlie", "Distributor") == 5
+    assert sampler.quantum_delay("Distributor", "Bob") == 2
+    assert LinkDelaySampler(SimulationConfig(CLASSICAL_CHANNEL_DELAY=1)).classical_delay("Alice", "Bob") == 1
+
+
+def test_link_delays_are_drawn_once_per_link_and_seed():
+    specs = {"*": ("uniform", 0, 100)}
+    sampler = LinkDelaySampler(SimulationConfig(CLASSICAL_DELAY_SPECS=specs, SEED=1))
+    delay = sampler.classical_delay("Bob", "Charlie")
+    assert sampler.classical_delay("Charlie", "Bob") == delay
+    assert sampler.classical_delay("Bob", "David") != delay
+    assert LinkDelaySampler(SimulationConfig(CLASSICAL_DELAY_SPECS=specs, SEED=1)).classical_delay("Bob", "Charlie") == delay
+    assert LinkDelaySampler(SimulationConfig(CLASSICAL_DELAY_SPECS=specs, SEED=2)).classical_delay("Bob", "Charlie") != delay
+
+
+def test_message_sampling_draws_every_message():
+    sim_config = SimulationConfig(CLASSICAL_DELAY_SPECS={"*": ("uniform", 0, 100)}, DELAY_SAMPLING="message", CLASSICAL_BUS=True, SEED=1)
+    sampler = LinkDelaySampler(sim_config)
+    assert len({sampler.classical_delay("Bob", "Charlie") for _ in range(10)}) == 10
@@ -0,0 +1,66 @@
+import json
+import multiprocessing
+import numpy as np
+import pytest
+
+from protocol.config import SimulationConfig
+from protocol.entanglement_pool import EntanglementPool
+
+
+def write_pool(path, sim_config, blocks):
+    """A pool of `blocks` blocks whose bits spell out (block, player) so reads can be traced back."""
+    player_names = [sim_config.COMMANDER_NAME] + sim_config.LIEUTENANT_NAMES
+    width = (sim_config.N - 1) * sim_config.M
+    bits = np.memmap(path, dtype=np.uint8, mode="w+", shape=(blocks, len(player_names), width))
+    for block in range(blocks):
+        for p in range(len(player_names)):
+            bits[block, p] = [(block >> p) & 1] * width
+    bits.flush()
+    del bits
+    with open(f"{path}.json", "w") as f:
+        json.dump({"blocks": blocks, "width": width, "M": sim_config.M, "player_names": player_names}, f)
+    with open(f"{path}.cursor", "w") as f:
+        f.write("0")
+    return EntanglementPool(str(path))
+
+
+def take_blocks(path, count, rounds, results):
+    pool = EntanglementPool(path)
+    results.put([block for _ in range(rounds) for block in pool.take(count)])
+
+
+def test_take_hands_out_each_block_once(tmp_path):
+    sim_config = SimulationConfig(M=4)
+    pool = write_pool(tmp_path / "pool.bin", sim_config, blocks=10)
+    assert list(pool.take(3)) == [0, 1, 2]
+    assert list(EntanglementPool(pool.path).take(4)) == [3, 4, 5, 6]  # The cursor is shared through the file
+    with pytest.raises(RuntimeError):
+        pool.take(4)
+    assert list(pool.take(3)) == [7, 8, 9]  # A refused request leaves the cursor alone
+
+
+def test_concurrent_takes_never_share_a_block(tmp_path):
+    sim_config = SimulationConfig(M=4)
+    path = str(tmp_path / "pool.bin")
+    write_pool(path, sim_config, blocks=200)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=take_blocks, args=(path, 5, 10, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    taken = [block for _ in workers for block in results.get()]
+    for worker in workers:
+        worker.join()
+    assert sorted(taken) == list(range(200))
+
+
+def test_bit_vectors_and_shape_check(tmp_path):
+    sim_config = SimulationConfig(M=4)
+    pool = write_pool(tmp_path / "pool.bin", sim_config, blocks=4)
+    pool.check(sim_config)
+    width = (sim_config.N - 1) * sim_config.M
+    assert pool.bit_vector(2, sim_config.COMMANDER_NAME) == [False] * width
+    assert pool.bit_vector(2, sim_config.LIEUTENANT_NAMES[0]) == [True] * width
+    with pytest.raises(ValueError):
+        pool.check(SimulationConfig(M=8))
+    with pytest.raises(ValueError):
+        pool.check(SimulationConfig(M=4, LIEUTENANT_NAMES=["Bob", "Charlie"], TRAITOR_INDICES=[]))
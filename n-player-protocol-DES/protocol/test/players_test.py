@@ -0,0 +1,34 @@
+import pytest
+from types import SimpleNamespace
+
+from protocol.config import SimulationConfig
+from protocol.players import Player
+
+
+@pytest.mark.parametrize("num_distributors", [1, 2, 3, 7])
+def test_shards_partition_the_tuples_in_order(num_distributors):
+    sim_config = SimulationConfig(M=10, BITS_PER_AGREEMENT=2, NUM_DISTRIBUTORS=num_distributors)
+    shards = [sim_config.distributor_shard(s) for s in range(num_distributors)]
+    assert [k for shard in shards for k in shard] == list(range(sim_config.TUPLES_PER_INSTANCE))
+    assert max(map(len, shards)) - min(map(len, shards)) <= 1
+
+
+@pytest.mark.parametrize("num_distributors", [1, 3])
+def test_merged_bits_follow_tuple_order(num_distributors):
+    sim_config = SimulationConfig(M=10, BITS_PER_AGREEMENT=2, NUM_INSTANCES=2, NUM_DISTRIBUTORS=num_distributors)
+    tuple_length = sim_config.N - 1
+    # Every measured bit is labelled with its (instance, tuple, position) so the merged order can be read back
+    player = SimpleNamespace(
+        sim_config=sim_config,
+        bit_vectors=[[] for _ in range(sim_config.NUM_SLOTS)],
+        source_bits=[
+            [[(instance, k, i) for k in sim_config.distributor_shard(s) for i in range(tuple_length)] for s in range(num_distributors)]
+            for instance in range(sim_config.NUM_INSTANCES)
+        ],
+    )
+    for instance in range(sim_config.NUM_INSTANCES):
+        Player.merge_source_bits(player, instance)
+
+    for slot, bit_vector in enumerate(player.bit_vectors):
+        instance, bit = divmod(slot, sim_config.BITS_PER_AGREEMENT)
+        assert bit_vector == [(instance, bit * sim_config.M + k, i) for k in range(sim_config.M) for i in range(tuple_length)]
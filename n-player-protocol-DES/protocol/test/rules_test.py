@@ -0,0 +1,174 @@
+import pytest
+import random
+from dataclasses import replace
+
+from protocol.config import SimulationConfig
+from protocol.rules import (
+    Round1Message, InitialEvidence, IntermediaryEvidence, EvidenceBundle, Round2Tally, CommanderCMemory, CommanderRules, LieutenantCMemory, LieutenantRules
+)
+from protocol.runtime import ideal_bit_vectors
+
+
+class Rules(CommanderRules, LieutenantRules):
+    def __init__(self, sim_config):
+        self.sim_config = sim_config
+
+
+def make_config(seed, **kwargs):
+    return SimulationConfig(M=64, LIEUTENANT_NAMES=[f"L{i}" for i in range(6)], TRAITOR_INDICES=[0, 1],
+                            COMMANDER_IS_TRAITOR=True, SEED=seed, **kwargs)
+
+
+def random_vector(rng, sim_config):
+    return tuple(rng.choice([True, False, None]) for _ in range((sim_config.N - 1) * sim_config.M))
+
+
+def round1(sim_config, rng):
+    """
+    Every lieutenant's memory after round 1, with its own initial evidence in its proofs.
+    The traitorous commander orders each lieutenant at random and sometimes claims the opposite of what the command
+    vector shows, which leaves that lieutenant without a decision; traitorous lieutenants claim a random decision
+    with a random command vector.
+    """
+    rules = Rules(sim_config)
+    bit_vectors = ideal_bit_vectors(sim_config, rng.random())
+    orders = [rng.choice([True, False]) for _ in sim_config.LIEUTENANT_NAMES]
+    commander = CommanderCMemory(name=sim_config.COMMANDER_NAME, orders=orders, bit_vector=bit_vectors[sim_config.COMMANDER_NAME][0])
+    memories = []
+    for idx, name in enumerate(sim_config.LIEUTENANT_NAMES):
+        memory = LieutenantCMemory(name=name, lieutenant_index=idx, is_traitor=idx in sim_config.TRAITOR_INDICES, bit_vector=bit_vectors[name][0])
+        memory.command_vector = rules._construct_command_vector(commander, idx)
+        memory.received_order = orders[idx] if rng.random() < 0.75 else not orders[idx]
+        memory.initial_decision = memory.received_order if rules.check_alice(memory, tolerance=sim_config.M // 10) else None
+        if memory.is_traitor:
+            memory.initial_decision = rng.choice([True, False, None])
+            memory.command_vector = random_vector(rng, sim_config)
+        memory.proofs[idx] = EvidenceBundle(initial=InitialEvidence(decision=memory.initial_decision, command_vector=memory.command_vector))
+        memories.append(memory)
+    return rules, memories
+
+
+def batch_round2(rules, memory, bundles):
+    """Rules 3.1-3.6 over every initial evidence bundle at once, as lieutenants evaluated them before Round2Tally."""
+    tolerance = rules.sim_config.M // 10
+    d_i = memory.initial_decision
+    received_decisions = [bundle.initial.decision for _, bundle in bundles]
+    if all(d == d_i for d in received_decisions):
+        return d_i, []
+    if d_i in (0, 1):
+        if all(d is None for d in received_decisions):
+            return d_i, []
+        conflicting_proofs = [
+            bundle.initial.command_vector for sender_idx, bundle in bundles
+            if bundle.initial.decision == (not d_i)
+            and rules.check_lieutenant_by_command_vector(memory, sender_idx, bundle.initial.decision, bundle.initial.command_vector, tolerance=tolerance)
+        ]
+        return (None if conflicting_proofs else d_i), conflicting_proofs
+    valid = [
+        (bundle.initial.decision, bundle.initial.command_vector) for sender_idx, bundle in bundles
+        if bundle.initial.decision is not None
+        and rules.check_lieutenant_by_bit_vector(memory, sender_idx, bundle.initial.decision, bundle.initial.command_vector, tolerance=tolerance)
+    ]
+    if valid and all(d == valid[0][0] for d, _ in valid):
+        return valid[0][0], [valid[0][1]]
+    return d_i, list(dict(valid).values())[:2]
+
+
+def incremental_round2(rules, memory, bundles):
+    tally = Round2Tally(d_i=memory.initial_decision)
+    for sender_idx, bundle in bundles:
+        rules.observe_initial_evidence(memory, tally, sender_idx, bundle)
+    return rules.finalize_round2(tally)
+
+
+def test_incremental_round2_matches_batch():
+    outcomes = set()
+    for seed in range(40):
+        rng = random.Random(seed)
+        rules, memories = round1(make_config(seed), rng)
+        bundles = [(memory.lieutenant_index, memory.proofs[memory.lieutenant_index]) for memory in memories]
+        for memory in memories:
+            decision, proofs = batch_round2(rules, memory, bundles)
+            assert incremental_round2(rules, memory, bundles) == (decision, proofs)
+            # Arrival order may change which proofs are picked, but not the decision or how many proofs back it
+            shuffled_decision, shuffled_proofs = incremental_round2(rules, memory, rng.sample(bundles, len(bundles)))
+            assert (shuffled_decision, len(shuffled_proofs)) == (decision, len(proofs))
+            outcomes.add((memory.initial_decision is None, decision is None, len(proofs)))
+    # Both conflicting decisions (rules 3.3/3.4) and decisions adopted from peers (rules 3.5/3.6) were exercised
+    assert (False, True, 1) in outcomes or (False, True, 2) in outcomes
+    assert (True, False, 1) in outcomes
+
+
+def play(sim_config, seed):
+    """Runs rounds 1-4 for every lieutenant, with bundles arriving in a random order, and returns their memories."""
+    rng = random.Random(seed)
+    rules, memories = round1(sim_config, rng)
+    bundles = [(memory.lieutenant_index, memory.proofs[memory.lieutenant_index]) for memory in memories]
+    for memory in memories:
+        tally = Round2Tally(d_i=memory.initial_decision)
+        for sender_idx, bundle in rng.sample(bundles, len(bundles)):
+            rules.observe_initial_evidence(memory, tally, sender_idx, bundle)
+        memory.intermediate_decision, proofs = rules.finalize_round2(tally)
+        memory.skipped_checks += tally.skipped_checks
+        if memory.is_traitor:
+            memory.intermediate_decision = rng.choice([True, False, None])
+            proofs = [random_vector(rng, sim_config) for _ in range(rng.choice([0, 1, 2]))]
+        memory.intermediary_proofs[memory.lieutenant_index] = IntermediaryEvidence(decision=memory.intermediate_decision, command_vectors=proofs)
+    for memory in memories:
+        memory.proofs = {
+            sender_idx: replace(bundle, intermediary=memories[sender_idx].intermediary_proofs[sender_idx])
+            for sender_idx, bundle in bundles
+        }
+        rules.decide_round4(memory)
+    return memories
+
+
+def test_short_circuit_keeps_final_decisions():
+    skipped_checks = 0
+    for seed in range(40):
+        full = play(make_config(seed), seed)
+        short = play(make_config(seed, SHORT_CIRCUIT_VERIFICATION=True), seed)
+        assert [m.intermediate_decision for m in short] == [m.intermediate_decision for m in full]
+        assert [m.final_decision for m in short] == [m.final_decision for m in full]
+        skipped_checks += sum(m.skipped_checks for m in short)
+    assert skipped_checks > 0
+
+
+def streamed_check(rules, memory, command_vector, chunk_tuples, tolerance):
+    """Streams `command_vector` to a fresh copy of `memory` in blocks; returns the verdict and the assembled vector."""
+    stream = LieutenantCMemory(name=memory.name, lieutenant_index=memory.lieutenant_index, bit_vector=memory.bit_vector,
+                               received_order=memory.received_order)
+    tuple_length = rules.sim_config.N - 1
+    for start_tuple in range(0, rules.sim_config.M, chunk_tuples):
+        chunk = command_vector[start_tuple * tuple_length:(start_tuple + chunk_tuples) * tuple_length]
+        consistent = rules.check_alice_chunk(stream, Round1Message(memory.received_order, chunk, start_tuple), tolerance)
+        if consistent is not None:
+            return consistent, tuple(stream.cv_buffer)
+
+
+@pytest.mark.parametrize("chunk_tuples", [1, 5, 64])
+@pytest.mark.parametrize("tolerance", [0, 6])
+def test_streamed_check_matches_check_alice(chunk_tuples, tolerance):
+    verdicts = set()
+    for seed in range(20):
+        rng = random.Random(seed)
+        rules, memories = round1(make_config(seed), rng)
+        for memory in (memory for memory in memories if not memory.is_traitor):
+            received = list(memory.command_vector)
+            own = [(rules.sim_config.N - 1) * k + memory.lieutenant_index for k in range(rules.sim_config.M)]
+            # One correlated entry in the last tuple, and every tuple revealed, which overshoots the order count
+            correlated = received.copy()
+            correlated[own[-1]] = memory.bit_vector[own[-1]]
+            revealed = received.copy()
+            for pos in own:
+                if revealed[pos] is None:
+                    revealed[pos] = not memory.bit_vector[pos]
+            for command_vector in (received, correlated, revealed, random_vector(rng, rules.sim_config)):
+                memory.command_vector = tuple(command_vector)
+                expected = rules.check_alice(memory, tolerance)
+                consistent, assembled = streamed_check(rules, memory, memory.command_vector, chunk_tuples, tolerance)
+                assert consistent == expected
+                if consistent:
+                    assert assembled == memory.command_vector
+                verdicts.add(expected)
+    assert verdicts == {True, False}
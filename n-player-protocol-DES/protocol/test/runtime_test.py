@@ -0,0 +1,48 @@
+import pytest
+import resource
+
+from protocol.config import SimulationConfig
+from protocol.runtime import check_descriptor_limit, run_localhost
+
+
+def loyal_final_decisions(summary, sim_config):
+    """Every loyal lieutenant's final decision per slot."""
+    decisions = {}
+    for name in sim_config.LIEUTENANT_NAMES:
+        for entry in summary["players"][name]["results"]:
+            if not entry["is_traitor"]:
+                slot = entry["instance"] * sim_config.BITS_PER_AGREEMENT + entry["bit"]
+                decisions.setdefault(slot, []).append(entry["final_decision"])
+    return decisions
+
+
+@pytest.mark.parametrize("transport, processes", [("unix", False), ("tcp", False), ("unix", True)])
+def test_loyal_lieutenants_follow_a_loyal_commander(transport, processes):
+    sim_config = SimulationConfig(COMMANDER_IS_TRAITOR=False, NUM_INSTANCES=2, BITS_PER_AGREEMENT=2,
+                                  COMMANDER_VALUE=(True, False), SEED=1)
+    summary = run_localhost(sim_config, transport=transport, processes=processes)
+    decisions = loyal_final_decisions(summary, sim_config)
+    assert decisions == {slot: [sim_config.loyal_order(slot)] * 3 for slot in range(sim_config.NUM_SLOTS)}
+    assert summary["players"][sim_config.COMMANDER_NAME]["messages_sent"] == sim_config.NUM_SLOTS * sim_config.NUM_LIEUTENANTS
+
+
+@pytest.mark.parametrize("options", [
+    {"INCREMENTAL_ROUND2": True},
+    {"INCREMENTAL_ROUND2": True, "SHORT_CIRCUIT_VERIFICATION": True},
+    {"CV_CHUNK_TUPLES": 16},
+    {"WIRE_COMPRESSION": True},
+])
+def test_options_keep_the_decisions(options):
+    sim_config = SimulationConfig(TRAITOR_INDICES=[], NUM_INSTANCES=3, SEED=2)
+    expected = loyal_final_decisions(run_localhost(sim_config), sim_config)
+    sim_config = SimulationConfig(TRAITOR_INDICES=[], NUM_INSTANCES=3, SEED=2, **options)
+    assert loyal_final_decisions(run_localhost(sim_config), sim_config) == expected
+
+
+def test_descriptor_limit_is_checked_before_any_socket():
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY:
+        pytest.skip("No hard descriptor limit")
+    players = [(None, [None] * hard)] * 2
+    with pytest.raises(ValueError):
+        check_descriptor_limit(players)
@@ -0,0 +1,69 @@
+import aqnsim
+import pytest
+
+from protocol.config import SimulationConfig
+from protocol.simulation import setup_network
+
+
+def run(sim_config):
+    run_simulation = aqnsim.generate_run_simulation_fn(setup_sim_fn=setup_network, logging_level=0, log_to_file=False)
+    return run_simulation(sim_config)
+
+
+def latest_entries(results, sim_config):
+    return {name: results[name][-1][0] for name in sim_config.LIEUTENANT_NAMES}
+
+
+def test_slowest_commander_link_does_not_stall_agreement():
+    # Every peer's round 2 bundle reaches Bob before Bob's own command vector does
+    sec = aqnsim.SECOND
+    sim_config = SimulationConfig(
+        COMMANDER_IS_TRAITOR=False, TRAITOR_INDICES=[], LOYAL_COMMANDER_ORDER=True,
+        CLASSICAL_DELAY_SPECS={("Alice", "Bob"): 10 * sec}, SEED=1
+    )
+    entries = latest_entries(run(sim_config), sim_config)
+    assert set(entries) == set(sim_config.LIEUTENANT_NAMES)
+    assert all(entry["final_decision"] is True for entry in entries.values())
+    # Bob's own bundle completes round 2, so it closes the moment round 1 does
+    assert entries["Bob"]["intermediate_decision_time"] == entries["Bob"]["initial_decision_time"]
+
+
+@pytest.mark.parametrize("round_deadline", [None, 5])
+def test_round_deadline_closes_rounds_without_slow_messages(round_deadline):
+    # Bob's command vector takes 100 s to arrive, every other message 1 s; M is large enough that honest checks pass
+    sec = aqnsim.SECOND
+    sim_config = SimulationConfig(
+        COMMANDER_IS_TRAITOR=False, TRAITOR_INDICES=[], LOYAL_COMMANDER_ORDER=True,
+        CLASSICAL_DELAY_SPECS={("Alice", "Bob"): 100 * sec},
+        ROUND_DEADLINE=round_deadline * sec if round_deadline else None, SEED=1
+    )
+    entries = latest_entries(run(sim_config), sim_config)
+    assert all(entry["final_decision"] is True for entry in entries.values())
+
+    bob = entries["Bob"]
+    distributed_at = bob["final_decision_time"] - bob["time_to_agreement"]
+    if round_deadline is None:
+        # Without a deadline everyone waits for Bob's command vector
+        assert bob["initial_decision"] is True
+        assert all(entry["time_to_agreement"] >= 100 * sec for entry in entries.values())
+    else:
+        # Round 1 closes at the deadline, so Bob adopts the order the other lieutenants prove in round 2
+        assert bob["initial_decision"] is None
+        assert bob["initial_decision_time"] - distributed_at == sim_config.ROUND_DEADLINE
+        # Once every piece of evidence is in, rounds 2 and 3 close without waiting for their deadlines
+        assert bob["intermediate_decision_time"] == bob["initial_decision_time"]
+        assert all(entry["time_to_agreement"] < 2 * sim_config.ROUND_DEADLINE for entry in entries.values())
+
+
+@pytest.mark.parametrize("cv_chunk_tuples", [None, 50])
+def test_traffic_counts_every_round(cv_chunk_tuples):
+    sim_config = SimulationConfig(COMMANDER_IS_TRAITOR=False, TRAITOR_INDICES=[], CV_CHUNK_TUPLES=cv_chunk_tuples, SEED=1)
+    traffic = run(sim_config)["Traffic"][-1][0]
+    lieutenants = sim_config.NUM_LIEUTENANTS
+    chunks = sim_config.M // (cv_chunk_tuples or sim_config.M)
+    rounds = traffic.by_round()
+    # One round 1 message per lieutenant and block, then a broadcast to every other lieutenant in rounds 2 and 3
+    assert rounds[1].messages == lieutenants * chunks
+    assert rounds[2].messages == rounds[3].messages == lieutenants * (lieutenants - 1)
+    assert traffic.total().messages == sum(count.messages for count in rounds.values())
+    assert traffic.by_sender()[sim_config.COMMANDER_NAME].messages == rounds[1].messages
@@ -0,0 +1,133 @@
+import pytest
+import sqlite3
+
+from protocol.config import SimulationConfig
+from results.database import create_results_table, store_sweep_result, reuse_stored_runs, store_sweep_manifest, fetch_sweep_manifest
+
+
+def store_run(experiment_name, config, db_path, sweep_param="M"):
+    create_results_table(db_path)
+    store_sweep_result(experiment_name, sweep_param, getattr(config, sweep_param), 1, "0 0 0 0 0", "1 1 1 1 1",
+                       "1 1 1 1 1", "1 1 1 1 1", config, db_path=db_path)
+
+
+def stored_experiments(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute("SELECT experiment_name FROM experiment_results ORDER BY id")]
+
+
+def test_manifest_round_trips_sweep_values(tmp_path):
+    db_path = tmp_path / "results.db"
+    sweep_vals = [[SimulationConfig(M=m, CLASSICAL_DELAY_SPECS={("Alice", "Bob"): ("uniform", 1, 2)}, SEED=m)] for m in (8, 16)]
+    tasks = [(index, 1, params[0].M, params[0].SEED, params[0].run_key()) for index, params in enumerate(sweep_vals)]
+    store_sweep_manifest("sweep", "M", sweep_vals, 1, tasks, db_path=db_path)
+
+    swept_parameter, restored, num_shots, pending = fetch_sweep_manifest("sweep", db_path=db_path)
+    assert (swept_parameter, num_shots) == ("M", 1)
+    assert [params[0].run_key() for params in restored] == [params[0].run_key() for params in sweep_vals]
+    assert restored[0][0].CLASSICAL_DELAY_SPECS == {("Alice", "Bob"): ("uniform", 1, 2)}
+    assert pending == {task[-1] for task in tasks}
+    assert fetch_sweep_manifest("other", db_path=db_path) is None
+
+
+def test_manifest_rejects_non_json_values(tmp_path):
+    db_path = tmp_path / "results.db"
+
+    class NoiseModel:
+        p = 0.1
+    noisy = SimulationConfig(M=8, QSOURCE_NOISE_MODEL=NoiseModel(), SEED=1)
+    with pytest.raises(ValueError):
+        store_sweep_manifest("sweep", "M", [[noisy]], 1, [(0, 1, 8, 1, noisy.run_key())], db_path=db_path)
+    assert fetch_sweep_manifest("sweep", db_path=db_path) is None
+
+
+def test_stored_runs_are_reused_across_experiments(tmp_path):
+    db_path = tmp_path / "results.db"
+    stored, missing = SimulationConfig(M=8, SEED=1), SimulationConfig(M=16, SEED=1)
+    store_run("first", stored, db_path)
+
+    tasks = [(0, 1, 8, 1, stored.run_key()), (1, 1, 16, 1, missing.run_key())]
+    store_sweep_manifest("second", "M", [[stored], [missing]], 1, tasks, db_path=db_path)
+    runs = [(stored.run_key(), "M", 8, 1), (missing.run_key(), "M", 16, 1)]
+    assert reuse_stored_runs("second", runs, db_path=db_path) == {stored.run_key()}
+    assert stored_experiments(db_path) == ["first", "second"]
+    assert fetch_sweep_manifest("second", db_path=db_path)[3] == {missing.run_key()}
+
+    # Storing a result marks its task done; reusing again copies nothing
+    store_run("second", missing, db_path)
+    assert fetch_sweep_manifest("second", db_path=db_path)[3] == set()
+    assert reuse_stored_runs("second", runs, db_path=db_path) == {stored.run_key(), missing.run_key()}
+    assert stored_experiments(db_path) == ["first", "second", "second"]
+
+
+class RecordingPool:
+    """Stands in for a SweepPool: records the dispatched tasks and returns a fixed summary for each."""
+    def __init__(self):
+        self.tasks = []
+
+    def imap(self, tasks, chunksize=None):
+        self.tasks.extend(tasks)
+        return [(shot, {"commands_sent": "1 1 1 1 1", "initial_result": "1 1 1 1 1", "intermediate_result": "1 1 1 1 1",
+                        "final_result": "1 1 1 1 1", "config": params[0], "traffic": None, "time_to_agreement": "1 1 1 1 1"})
+                for shot, params in tasks]
+
+
+def test_resume_dispatches_only_pending_tasks(tmp_path, monkeypatch):
+    from protocol.simulation_sweep import pending_sweep_tasks, resume
+
+    monkeypatch.chdir(tmp_path)  # The sweep engine uses the default database path
+    sweep_vals = [[SimulationConfig(M=m, SEED=1)] for m in (8, 16)]
+    tasks = pending_sweep_tasks("M", sweep_vals, "sweep", 2)
+    assert len(tasks) == 4
+    shot, params = tasks[1]
+    store_sweep_result("sweep", "M", params[0].M, shot, "1 1 1 1 1", "1 1 1 1 1", "1 1 1 1 1", "1 1 1 1 1", params[0])
+
+    pool = RecordingPool()
+    resume("sweep", pool=pool)
+    # The interrupted tasks run again with the seeds they were recorded with
+    assert [(shot, params[0].run_key()) for shot, params in pool.tasks] == [(shot, params[0].run_key()) for shot, params in tasks[:1] + tasks[2:]]
+    assert fetch_sweep_manifest("sweep")[3] == set()
+
+    resume("sweep", pool=pool)
+    assert len(pool.tasks) == 3
+
+
+def test_sweeps_reject_multi_slot_configs(tmp_path, monkeypatch):
+    from protocol.simulation_sweep import pending_sweep_tasks
+
+    monkeypatch.chdir(tmp_path)
+    for options in ({"NUM_INSTANCES": 2}, {"BITS_PER_AGREEMENT": 2}):
+        with pytest.raises(ValueError):
+            pending_sweep_tasks("M", [[SimulationConfig(M=8, SEED=1)], [SimulationConfig(M=16, SEED=1, **options)]], "sweep", 1)
+    assert fetch_sweep_manifest("sweep") is None
+
+
+def test_summary_counts_undecided_lieutenants_as_missing_votes():
+    from protocol.simulation_sweep import summarize_shot
+
+    config = SimulationConfig(COMMANDER_IS_TRAITOR=False, TRAITOR_INDICES=[], SEED=1)
+    decided = {"initial_decision": True, "intermediate_decision": True, "final_decision": True, "time_to_agreement": 2.5}
+    results = {"Config": [[config]], config.COMMANDER_NAME: [[{"orders": [True] * config.NUM_LIEUTENANTS}]], "Traffic": [[None]]}
+    results.update({name: [[decided]] for name in config.LIEUTENANT_NAMES[1:]})
+    results[config.LIEUTENANT_NAMES[0]] = []  # Never reached a final decision
+
+    summary = summarize_shot(results)
+    expected_votes = " ".join(["N"] + ["1"] * (config.NUM_LIEUTENANTS - 1))
+    assert summary["initial_result"] == summary["intermediate_result"] == summary["final_result"] == expected_votes
+    assert summary["time_to_agreement"] == " ".join(["N"] + ["2.5"] * (config.NUM_LIEUTENANTS - 1))
+
+
+def test_repeated_sweep_values_share_one_run(tmp_path, monkeypatch):
+    from protocol.simulation_sweep import pending_sweep_tasks, resume
+
+    monkeypatch.chdir(tmp_path)
+    sweep_vals = [[SimulationConfig(M=8, SEED=1)], [SimulationConfig(M=16, SEED=1)], [SimulationConfig(M=8, SEED=1)]]
+    tasks = pending_sweep_tasks("M", sweep_vals, "sweep", 2)
+    assert [(shot, params[0].M) for shot, params in tasks] == [(1, 8), (1, 16), (2, 8), (2, 16)]
+
+    pool = RecordingPool()
+    resume("sweep", pool=pool)
+    assert [(shot, params[0].run_key()) for shot, params in pool.tasks] == [(shot, params[0].run_key()) for shot, params in tasks]
+    assert fetch_sweep_manifest("sweep")[3] == set()
+    with sqlite3.connect("simulation_results.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sweep_tasks WHERE status = 'done'").fetchone()[0] == 6
@@ -0,0 +1,40 @@
+from protocol import wire
+from protocol.config import SimulationConfig
+from protocol.rules import InstancePayload, Round1Message, InitialEvidence, EvidenceBundle
+from protocol.traffic import TrafficLog
+
+
+def test_counts_every_destination_of_a_multicast():
+    sim_config = SimulationConfig(M=4)
+    log = TrafficLog(sim_config)
+    order = InstancePayload(0, (Round1Message(order=True, command_vector=(True, None) * 10),))
+    bundle = InstancePayload(0, (EvidenceBundle(initial=InitialEvidence(decision=True, command_vector=(False,) * 20)),))
+    log.record(sim_config.ROUND1_ACTION, "Alice", ["Bob"], order)
+    log.record(sim_config.ROUND2_ACTION, "Bob", ["Charlie", "David", "Eve"], bundle)
+    log.record(sim_config.ROUND2_ACTION, "Charlie", ["Bob"], bundle)
+    log.record("OTHER", "Bob", ["Alice"], bundle)
+
+    order_size = len(wire.encode(order, sim_config.N - 1))
+    bundle_size = len(wire.encode(bundle, sim_config.N - 1))
+    rounds = log.by_round()
+    assert (rounds[1].messages, rounds[1].bytes) == (1, order_size)
+    assert (rounds[2].messages, rounds[2].bytes) == (4, 4 * bundle_size)
+    assert (rounds[0].messages, rounds[0].bytes) == (1, bundle_size)  # Outside the protocol rounds
+    assert log.by_sender()["Bob"].messages == 4
+    assert log.by_link()[("Bob", "Charlie")].messages == 1
+    assert log.by_link()[("Charlie", "Bob")].messages == 1
+    total = log.total()
+    assert (total.messages, total.bytes) == (6, order_size + 5 * bundle_size)
+    assert log.summary()["per_link"]["Bob->Eve"] == {"messages": 1, "bytes": bundle_size}
+
+
+def test_compression_is_counted_on_the_wire():
+    bundle = EvidenceBundle(initial=InitialEvidence(decision=True, command_vector=(False,) * 400))
+    sizes = []
+    for compress in (False, True):
+        sim_config = SimulationConfig(M=100, WIRE_COMPRESSION=compress)
+        log = TrafficLog(sim_config)
+        log.record(sim_config.ROUND2_ACTION, "Bob", ["Charlie"], bundle)
+        sizes.append(log.total().bytes)
+        assert sizes[-1] == len(wire.encode(bundle, sim_config.N - 1, compress=compress))
+    assert sizes[1] < sizes[0]
@@ -0,0 +1,63 @@
+import pytest
+import random
+
+from protocol import wire
+from protocol.rules import (
+    InstancePayload, Round1Message, InitialEvidence, CommandVectorRef, IntermediaryEvidence, EvidenceBundle,
+    command_vector_digest
+)
+
+
+def random_vector(length):
+    return tuple(random.choice([True, False, None]) for _ in range(length))
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 3, 4, 5, 1250])
+def test_command_vector_round_trip(length):
+    command_vector = random_vector(length)
+    data = wire.encode_command_vector(command_vector, tuple_length=5)
+    assert len(data) == wire.CV_HEADER.size + (length + 3) // 4
+    assert wire.decode_command_vector(data) == (command_vector, len(data))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_message_round_trip(compress):
+    command_vector = random_vector(50)
+    payloads = [
+        InstancePayload(3, (Round1Message(order=True, command_vector=command_vector[:20], start_tuple=4),)),
+        InstancePayload(0, (EvidenceBundle(initial=InitialEvidence(decision=None, command_vector=command_vector)), None)),
+        InstancePayload(1, (IntermediaryEvidence(decision=False, command_vectors=[command_vector, CommandVectorRef(command_vector_digest(command_vector))]),)),
+        InstancePayload(0, ([command_vector_digest(command_vector)],)),
+        InstancePayload(0, ({command_vector_digest(command_vector): command_vector},)),
+    ]
+    for payload in payloads:
+        assert wire.decode(wire.encode(payload, tuple_length=5, compress=compress)) == payload
+
+
+def test_rejects_unknown_version():
+    data = bytearray(wire.encode(InitialEvidence(decision=True, command_vector=(True, None))))
+    data[0] = wire.WIRE_VERSION + 1
+    with pytest.raises(ValueError):
+        wire.decode(bytes(data))
+
+
+def test_measurement_result_vectors_and_proofs():
+    # In the simulator command vectors hold raw measurement results, ints rather than bools
+    command_vector = tuple(random.choice([0, 1, None]) for _ in range(40))
+    other_vector = tuple(random.choice([0, 1, None]) for _ in range(40))
+    payloads = [
+        (IntermediaryEvidence(decision=None, command_vectors=[command_vector, other_vector]),),
+        (IntermediaryEvidence(decision=1, command_vectors=[command_vector]), None),
+        (EvidenceBundle(initial=InitialEvidence(decision=0, command_vector=command_vector),
+                        intermediary=IntermediaryEvidence(decision=0, command_vectors=[command_vector])),),
+        (Round1Message(order=True, command_vector=command_vector),),
+    ]
+    for payload in payloads:
+        decoded = wire.decode(wire.encode(InstancePayload(0, payload), tuple_length=4))
+        assert decoded == InstancePayload(0, payload)
+
+
+def test_empty_values_keep_their_kind():
+    assert wire.decode(wire.encode(IntermediaryEvidence(decision=True))) == IntermediaryEvidence(decision=True)
+    assert wire.decode(wire.encode([])) == []
+    assert wire.decode(wire.encode((None,))) == (None,)
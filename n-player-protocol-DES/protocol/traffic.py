@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from protocol.config import SimulationConfig
+from protocol import wire
+
+"""
+DEFINE CLASSICAL TRAFFIC ACCOUNTING
+"""
+
+@dataclass
+class TrafficCount:
+    messages: int = 0
+    bytes: int = 0
+
+    def add(self, size: int):
+        self.messages += 1
+        self.bytes += size
+
+    def merge(self, other: "TrafficCount"):
+        self.messages += other.messages
+        self.bytes += other.bytes
+
+
+class TrafficLog:
+    """
+    Counts the classical messages every player sends and the size of their payloads on the wire.
+    Traffic is kept per (round, sender, destination) link, so it can be rolled up per round, per sender or per link.
+    A multicast counts once per destination, since every destination receives its own copy on its link.
+    """
+    def __init__(self, sim_config: SimulationConfig):
+        self.sim_config = sim_config
+        self.round_of_action = {
+            sim_config.ROUND1_ACTION: 1,
+            sim_config.ROUND2_ACTION: 2,
+            sim_config.ROUND3_ACTION: 3,
+            sim_config.CV_REQUEST_ACTION: 3,  # Fetching command vectors behind round 3 hash references
+            sim_config.CV_RESPONSE_ACTION: 3,
+        }
+        self.links: dict[tuple[int, str, str], TrafficCount] = {}
+
+    def payload_size(self, content) -> int:
+        """Size of the content in the binary wire format, compressed if WIRE_COMPRESSION is set."""
+        return len(wire.encode(content, self.sim_config.N - 1, compress=self.sim_config.WIRE_COMPRESSION))
+
+    def record(self, action: str, sender: str, destinations: list[str], content):
+        round_number = self.round_of_action.get(action, 0)  # 0 collects actions outside the protocol rounds
+        size = self.payload_size(content)  # Serialized once, the content is shared by every destination
+        for destination in destinations:
+            self.links.setdefault((round_number, sender, destination), TrafficCount()).add(size)
+
+    def _rollup(self, key) -> dict:
+        totals = {}
+        for link, count in self.links.items():
+            totals.setdefault(key(link), TrafficCount()).merge(count)
+        return totals
+
+    def by_round(self) -> dict[int, TrafficCount]:
+        return self._rollup(lambda link: link[0])
+
+    def by_sender(self) -> dict[str, TrafficCount]:
+        return self._rollup(lambda link: link[1])
+
+    def by_link(self) -> dict[tuple[str, str], TrafficCount]:
+        return self._rollup(lambda link: (link[1], link[2]))
+
+    def total(self) -> TrafficCount:
+        return self._rollup(lambda link: None).get(None, TrafficCount())
+
+    def summary(self) -> dict:
+        """JSON-serializable breakdown of the traffic, as stored next to the decisions in the results database."""
+        def as_dict(totals):
+            return {str(k): {"messages": v.messages, "bytes": v.bytes} for k, v in totals.items()}
+        return {
+            "per_round": as_dict(self.by_round()),
+            "per_sender": as_dict(self.by_sender()),
+            "per_link": as_dict({f"{sender}->{destination}": v for (sender, destination), v in self.by_link().items()}),
+        }
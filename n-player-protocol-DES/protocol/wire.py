@@ -0,0 +1,241 @@
+import pickle
+import struct
+import time
+import zlib
+from functools import lru_cache
+from operator import itemgetter
+from protocol.rules import (
+    InstancePayload, Round1Message, InitialEvidence, CommandVectorRef, IntermediaryEvidence, EvidenceBundle, command_vector_digest
+)
+
+"""
+DEFINE BINARY WIRE FORMAT
+"""
+
+# Every encoded message starts with a 3-byte header: format version, kind of the top-level value, and flags.
+# With FLAG_ZLIB set the rest of the message is zlib-compressed. Nested values start with their own kind byte.
+#
+# Command vector entries take 2 bits each (False=0, True=1, None=2, the same codes as command_vector_digest; raw
+# 0/1 measurement results take the codes of False/True and decode as bools),
+# four to a byte, preceded by the entry count and the tuple length (N-1). Decisions and orders are single codes
+# in a byte of their own. Digests are the raw 32 bytes of the SHA-256.
+
+WIRE_VERSION = 1
+FLAG_ZLIB = 1
+
+HEADER = struct.Struct("!BBB")
+CV_HEADER = struct.Struct("!IH")  # Number of entries, tuple length
+COUNT = struct.Struct("!I")
+DIGEST_SIZE = 32
+
+# Kinds of value
+NONE, COMMAND_VECTOR, INITIAL, INTERMEDIARY, BUNDLE, ROUND1, TUPLE, DIGESTS, CV_MAP, INSTANCE, REF = range(11)
+
+
+def encode_entry(value: bool | None) -> int:
+    return 2 if value is None else int(value)
+
+def decode_entry(code: int) -> bool | None:
+    if code > 2:
+        raise ValueError(f"Invalid entry code {code}")
+    return None if code == 2 else bool(code)
+
+ENTRY_CODES = {False: 0, True: 1, None: 2}
+ENTRY_VALUES = (False, True, None)
+
+
+@lru_cache(maxsize=None)
+def _masks(num_bytes: int) -> tuple[int, int, int]:
+    """
+    Masks that keep the low 4 bits of every 16-bit group, the low 8 bits of every 32-bit group and the low 2 bits
+    of every byte of a 4*num_bytes-byte little-endian integer: the steps between one code per byte and four.
+    """
+    return (int.from_bytes(b"\x0f\x00" * (2 * num_bytes), "little"),
+            int.from_bytes(b"\xff\x00\x00\x00" * num_bytes, "little"),
+            int.from_bytes(b"\x03" * (4 * num_bytes), "little"))
+
+
+def encode_command_vector(command_vector: tuple[bool | None, ...], tuple_length: int = 0) -> bytes:
+    # One code per byte, then squeezed to four per byte with whole-vector shifts on one big integer
+    codes = bytes(map(ENTRY_CODES.__getitem__, command_vector))
+    num_bytes = (len(codes) + 3) // 4
+    pairs_mask, quads_mask, _ = _masks(num_bytes)
+    x = int.from_bytes(codes, "little")
+    x = (x | x >> 6) & pairs_mask
+    x = (x | x >> 12) & quads_mask
+    packed = x.to_bytes(4 * num_bytes, "little")[::4]
+    return CV_HEADER.pack(len(command_vector), tuple_length) + packed
+
+def decode_command_vector(data: bytes | memoryview, offset: int = 0) -> tuple[tuple[bool | None, ...], int]:
+    """Returns the command vector and the offset just past it."""
+    length, _ = CV_HEADER.unpack_from(data, offset)
+    offset += CV_HEADER.size
+    num_bytes = (length + 3) // 4
+    spread = bytearray(4 * num_bytes)
+    spread[::4] = data[offset:offset + num_bytes]
+    pairs_mask, _, codes_mask = _masks(num_bytes)
+    x = int.from_bytes(spread, "little")
+    x = (x | x << 12) & pairs_mask
+    x = (x | x << 6) & codes_mask
+    codes = x.to_bytes(4 * num_bytes, "little")[:length]
+    if 3 in codes:
+        raise ValueError("Invalid entry code 3 in command vector")
+    if length < 2:
+        return tuple(ENTRY_VALUES[code] for code in codes), offset + num_bytes
+    return itemgetter(*codes)(ENTRY_VALUES), offset + num_bytes  # One C-level lookup per entry
+
+
+def _encode_proof(command_vector, tuple_length: int) -> bytes:
+    """One entry of IntermediaryEvidence.command_vectors: a hash reference or a full command vector."""
+    if isinstance(command_vector, CommandVectorRef):
+        return bytes([REF]) + bytes.fromhex(command_vector.digest)
+    return bytes([COMMAND_VECTOR]) + encode_command_vector(command_vector, tuple_length)
+
+
+def _encode_value(value, tuple_length: int) -> bytes:
+    # Evidence fields are encoded by their declared types, never by looking at the entries, so command vectors of
+    # raw measurement results (ints) and empty proof lists encode like any others
+    if value is None:
+        return bytes([NONE])
+    if isinstance(value, CommandVectorRef):
+        return _encode_proof(value, tuple_length)
+    if isinstance(value, InitialEvidence):
+        return bytes([INITIAL, encode_entry(value.decision)]) + encode_command_vector(value.command_vector, tuple_length)
+    if isinstance(value, IntermediaryEvidence):
+        return (bytes([INTERMEDIARY, encode_entry(value.decision)]) + COUNT.pack(len(value.command_vectors))
+                + b"".join(_encode_proof(cv, tuple_length) for cv in value.command_vectors))
+    if isinstance(value, EvidenceBundle):
+        return bytes([BUNDLE]) + _encode_value(value.initial, tuple_length)[1:] + _encode_value(value.intermediary, tuple_length)[1:]
+    if isinstance(value, Round1Message):
+        return (bytes([ROUND1, encode_entry(value.order)]) + COUNT.pack(value.start_tuple)
+                + encode_command_vector(value.command_vector, tuple_length))
+    if isinstance(value, InstancePayload):
+        return bytes([INSTANCE]) + COUNT.pack(value.instance) + _encode_value(value.payload, tuple_length)
+    if isinstance(value, dict):
+        # CV_RESPONSE: digest -> command vector
+        return (bytes([CV_MAP]) + COUNT.pack(len(value))
+                + b"".join(bytes.fromhex(digest) + encode_command_vector(cv, tuple_length) for digest, cv in value.items()))
+    if isinstance(value, list):
+        # CV_REQUEST: digests
+        return bytes([DIGESTS]) + COUNT.pack(len(value)) + b"".join(bytes.fromhex(digest) for digest in value)
+    if isinstance(value, tuple):
+        # One payload per agreed bit
+        return bytes([TUPLE]) + COUNT.pack(len(value)) + b"".join(_encode_value(v, tuple_length) for v in value)
+    raise TypeError(f"No wire encoding for {type(value).__name__}")
+
+
+def _decode_value(data: memoryview, offset: int, kind: int | None = None):
+    """Returns the value and the offset just past it."""
+    if kind is None:
+        kind = data[offset]
+        offset += 1
+    if kind == NONE:
+        return None, offset
+    if kind == REF:
+        return CommandVectorRef(bytes(data[offset:offset + DIGEST_SIZE]).hex()), offset + DIGEST_SIZE
+    if kind == COMMAND_VECTOR:
+        return decode_command_vector(data, offset)
+    if kind == INITIAL:
+        decision = decode_entry(data[offset])
+        command_vector, offset = decode_command_vector(data, offset + 1)
+        return InitialEvidence(decision=decision, command_vector=command_vector), offset
+    if kind == INTERMEDIARY:
+        decision = decode_entry(data[offset])
+        (count,) = COUNT.unpack_from(data, offset + 1)
+        offset += 1 + COUNT.size
+        command_vectors = []
+        for _ in range(count):
+            command_vector, offset = _decode_value(data, offset)
+            command_vectors.append(command_vector)
+        return IntermediaryEvidence(decision=decision, command_vectors=command_vectors), offset
+    if kind == BUNDLE:
+        initial, offset = _decode_value(data, offset, INITIAL)
+        intermediary, offset = _decode_value(data, offset, INTERMEDIARY)
+        return EvidenceBundle(initial=initial, intermediary=intermediary), offset
+    if kind == ROUND1:
+        order = decode_entry(data[offset])
+        (start_tuple,) = COUNT.unpack_from(data, offset + 1)
+        command_vector, offset = decode_command_vector(data, offset + 1 + COUNT.size)
+        return Round1Message(order=order, command_vector=command_vector, start_tuple=start_tuple), offset
+    if kind == INSTANCE:
+        (instance,) = COUNT.unpack_from(data, offset)
+        payload, offset = _decode_value(data, offset + COUNT.size)
+        return InstancePayload(instance, payload), offset
+    if kind in (TUPLE, DIGESTS, CV_MAP):
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        if kind == DIGESTS:
+            digests = [bytes(data[offset + i * DIGEST_SIZE:offset + (i + 1) * DIGEST_SIZE]).hex() for i in range(count)]
+            return digests, offset + count * DIGEST_SIZE
+        items = []
+        for _ in range(count):
+            if kind == CV_MAP:
+                digest = bytes(data[offset:offset + DIGEST_SIZE]).hex()
+                command_vector, offset = decode_command_vector(data, offset + DIGEST_SIZE)
+                items.append((digest, command_vector))
+            else:
+                value, offset = _decode_value(data, offset)
+                items.append(value)
+        return (dict(items) if kind == CV_MAP else tuple(items)), offset
+    raise ValueError(f"Unknown wire kind {kind}")
+
+
+def encode(value, tuple_length: int = 0, compress: bool = False) -> bytes:
+    """
+    Encode a message payload: evidence, a round 1 message, a CV request (list of digests) or response (dict), a
+    tuple of per-bit payloads, or an InstancePayload wrapping any of them. `tuple_length` (N-1) is recorded with every
+    command vector so a reader can split it into tuples.
+    """
+    encoded = _encode_value(value, tuple_length)
+    kind, body = encoded[0], encoded[1:]
+    flags = 0
+    if compress:
+        body, flags = zlib.compress(body), FLAG_ZLIB
+    return HEADER.pack(WIRE_VERSION, kind, flags) + body
+
+def decode(data: bytes):
+    version, kind, flags = HEADER.unpack_from(data)
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported wire format version {version}")
+    body = data[HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+    value, _ = _decode_value(memoryview(body), 0, kind)
+    return value
+
+
+def benchmark(num_players: int = 6, M: int = 250, repeats: int = 200) -> dict[str, dict[str, float]]:
+    """Bytes and microseconds per encode+decode of typical round 1-3 payloads, for pickle and the wire format."""
+    import random
+    rng = random.Random(0)
+    tuple_length = num_players - 1
+
+    def random_vector():
+        return tuple(rng.choice([True, False, None]) for _ in range(tuple_length * M))
+
+    samples = {
+        "round1": (Round1Message(order=True, command_vector=random_vector()),),
+        "round2": (EvidenceBundle(initial=InitialEvidence(decision=False, command_vector=random_vector())),),
+        "round3": (IntermediaryEvidence(decision=None, command_vectors=[random_vector(), random_vector()]),),
+        "round3_hashed": (IntermediaryEvidence(decision=None, command_vectors=[CommandVectorRef(command_vector_digest(random_vector()))] * 2),),
+    }
+    codecs = {
+        "pickle": (lambda v: pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads),
+        "wire": (lambda v: encode(v, tuple_length), decode),
+        "wire_zlib": (lambda v: encode(v, tuple_length, compress=True), decode),
+    }
+    results = {}
+    for sample_name, value in samples.items():
+        for codec_name, (dumps, loads) in codecs.items():
+            start = time.perf_counter()
+            for _ in range(repeats):
+                data = dumps(value)
+                assert loads(data) == value
+            elapsed = time.perf_counter() - start
+            results[f"{sample_name}/{codec_name}"] = {"bytes": len(data), "us_per_message": elapsed / repeats * 1e6}
+    return results
+
+
+if __name__ == "__main__":
+    for name, result in benchmark().items():
+        print(f"{name:28s} {result['bytes']:8d} bytes {result['us_per_message']:10.1f} us")
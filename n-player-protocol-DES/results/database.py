@@ -1,7 +1,9 @@
 import sqlite3
 import datetime
+import json
 import numpy as np
-from protocol.config import SimulationConfig
+from protocol.config import SimulationConfig, encode_json, decode_json
+from protocol.traffic import TrafficLog
 import matplotlib.pyplot as plt
 
 # ---------------------------
@@ -31,27 +33,163 @@ def create_results_table(db_path="simulation_results.db"):
             commander_is_traitor BOOLEAN
         )
     ''')
+    migrate_results_table(cursor)
+    create_sweep_manifest_tables(cursor)
 
     conn.commit()
     conn.close()
 
+def create_sweep_manifest_tables(cursor):
+    """
+    Creates the tables that record what a sweep was asked to compute: one sweep_jobs row per experiment with its
+    sweep values as JSON, and one sweep_tasks row per (sweep value, shot) run with its seed, run key and status.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sweep_jobs (
+            experiment_name TEXT PRIMARY KEY,
+            created DATETIME DEFAULT CURRENT_TIMESTAMP,
+            swept_parameter TEXT,
+            sweep_vals TEXT,  -- JSON, see protocol.config.encode_json
+            num_shots INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sweep_tasks (
+            experiment_name TEXT,
+            value_index INTEGER,  -- Position of the value in the sweep
+            shot_id INTEGER,
+            swept_value REAL,
+            seed INTEGER,
+            run_key TEXT,
+            status TEXT DEFAULT 'pending',
+            PRIMARY KEY (experiment_name, value_index, shot_id)
+        )
+    ''')
+
+# Columns added after the original schema, appended in order so positional reads of older columns keep working
+MIGRATED_COLUMNS = [
+    ("messages_sent", "INTEGER"),
+    ("bytes_sent", "INTEGER"),
+    ("traffic", "TEXT"),  # JSON breakdown per round, per sender and per link
+    ("time_to_agreement", "TEXT"),  # Per lieutenant, space separated like the decisions, "N" if it never decided
+    ("run_key", "TEXT"),  # SimulationConfig.run_key() of the run, so sweeps can skip runs that are already stored
+]
+
+def migrate_results_table(cursor):
+    """Adds any MIGRATED_COLUMNS missing from an existing experiment_results table."""
+    cursor.execute("PRAGMA table_info(experiment_results)")
+    existing = {c[1] for c in cursor.fetchall()}
+    for name, column_type in MIGRATED_COLUMNS:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE experiment_results ADD COLUMN {name} {column_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS experiment_results_run_key ON experiment_results (run_key)")
+
 # ---------------------------
 # Store Results
 # ---------------------------
-def store_sweep_result(experiment_name, swept_parameter, swept_value, shot_id, commands_sent, initial_result, intermediate_result, final_result, config: SimulationConfig, db_path="simulation_results.db"):
-    """Stores the result of a single shot for a given parameter sweep value."""
+def store_sweep_result(experiment_name, swept_parameter, swept_value, shot_id, commands_sent, initial_result, intermediate_result, final_result, config: SimulationConfig, db_path="simulation_results.db", traffic: TrafficLog | None = None, time_to_agreement=None):
+    """Stores the result of a single shot for a given parameter sweep value, with its classical traffic if given."""
+    run_key = config.run_key()
     traitor_inds = ["1" if i in config.TRAITOR_INDICES else "0" for i in range(config.NUM_LIEUTENANTS)]
+    messages_sent = bytes_sent = traffic_json = None
+    if traffic is not None:
+        total = traffic.total()
+        messages_sent, bytes_sent, traffic_json = total.messages, total.bytes, json.dumps(traffic.summary())
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    migrate_results_table(cursor)
+    create_sweep_manifest_tables(cursor)
 
     cursor.execute('''
-        INSERT INTO experiment_results (experiment_name, swept_parameter, swept_value, shot_id, commands_sent, initial_result, intermediate_result, final_result, traitor_indices, M, N, num_traitors, commander_is_traitor)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (experiment_name, swept_parameter, swept_value, shot_id, commands_sent, initial_result, intermediate_result, final_result, " ".join(traitor_inds), config.M, config.N, len(config.TRAITOR_INDICES), config.COMMANDER_IS_TRAITOR))
+        INSERT INTO experiment_results (experiment_name, swept_parameter, swept_value, shot_id, commands_sent, initial_result, intermediate_result, final_result, traitor_indices, M, N, num_traitors, commander_is_traitor, messages_sent, bytes_sent, traffic, time_to_agreement, run_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (experiment_name, swept_parameter, swept_value, shot_id, commands_sent, initial_result, intermediate_result, final_result, " ".join(traitor_inds), config.M, config.N, len(config.TRAITOR_INDICES), config.COMMANDER_IS_TRAITOR, messages_sent, bytes_sent, traffic_json, time_to_agreement, run_key))
+    # Same transaction as the result, so a sweep killed at any point never has a stored run still marked pending
+    cursor.execute("UPDATE sweep_tasks SET status = 'done' WHERE experiment_name = ? AND run_key = ?", (experiment_name, run_key))
 
     conn.commit()
     conn.close()
 
+def reuse_stored_runs(experiment_name, runs, db_path="simulation_results.db"):
+    """
+    Looks up (run_key, swept_parameter, swept_value, shot_id) runs by key before a sweep computes them. A run stored by
+    another experiment is copied under experiment_name. Returns the keys of every run that no longer needs computing.
+    """
+    create_results_table(db_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(experiment_results)")
+    copied = [c[1] for c in cursor.fetchall() if c[1] not in ("id", "timestamp", "experiment_name", "swept_parameter", "swept_value", "shot_id")]
+
+    available = set()
+    for run_key, swept_parameter, swept_value, shot_id in runs:
+        cursor.execute("SELECT experiment_name FROM experiment_results WHERE run_key = ?", (run_key,))
+        experiments = {row[0] for row in cursor.fetchall()}
+        if not experiments:
+            continue
+        if experiment_name not in experiments:
+            cursor.execute(f'''
+                INSERT INTO experiment_results (experiment_name, swept_parameter, swept_value, shot_id, {", ".join(copied)})
+                SELECT ?, ?, ?, ?, {", ".join(copied)} FROM experiment_results WHERE run_key = ? ORDER BY id DESC LIMIT 1
+            ''', (experiment_name, swept_parameter, swept_value, shot_id, run_key))
+        cursor.execute("UPDATE sweep_tasks SET status = 'done' WHERE experiment_name = ? AND run_key = ?", (experiment_name, run_key))
+        available.add(run_key)
+
+    conn.commit()
+    conn.close()
+    return available
+
+# ---------------------------
+# Sweep Manifests
+# ---------------------------
+def store_sweep_manifest(experiment_name, swept_parameter, sweep_vals, num_shots, tasks, db_path="simulation_results.db"):
+    """
+    Records a sweep before it runs: its parameter, sweep values and shot count, and a pending task per
+    (value_index, shot_id, swept_value, seed, run_key). Storing the manifest of an experiment again replaces its
+    spec and adds any new tasks, keeping the status of the ones already recorded, so a sweep can be extended under
+    the same name.
+    Tasks are keyed by (value_index, shot_id) alone: a repeated sweep value gives tasks with the same run key, which
+    share one run and are all marked done when it is stored.
+    Raises ValueError if the sweep values have no JSON form.
+    """
+    spec = json.dumps(encode_json(sweep_vals))
+
+    create_results_table(db_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        INSERT OR REPLACE INTO sweep_jobs (experiment_name, swept_parameter, sweep_vals, num_shots)
+        VALUES (?, ?, ?, ?)
+    ''', (experiment_name, swept_parameter, spec, num_shots))
+    cursor.executemany('''
+        INSERT OR IGNORE INTO sweep_tasks (experiment_name, value_index, shot_id, swept_value, seed, run_key)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(experiment_name, *task) for task in tasks])
+
+    conn.commit()
+    conn.close()
+
+def fetch_sweep_manifest(experiment_name, db_path="simulation_results.db"):
+    """
+    Returns (swept_parameter, sweep_vals, num_shots, pending), where pending is the set of run keys not yet stored,
+    or None if no sweep was recorded under experiment_name.
+    """
+    create_results_table(db_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT swept_parameter, sweep_vals, num_shots FROM sweep_jobs WHERE experiment_name = ?", (experiment_name,))
+    job = cursor.fetchone()
+    cursor.execute("SELECT run_key FROM sweep_tasks WHERE experiment_name = ? AND status != 'done'", (experiment_name,))
+    pending = {row[0] for row in cursor.fetchall()}
+
+    conn.close()
+    if job is None:
+        return None
+    swept_parameter, sweep_vals, num_shots = job
+    return swept_parameter, decode_json(json.loads(sweep_vals)), num_shots, pending
+
 # ---------------------------
 # Query Data
 # ---------------------------
@@ -71,6 +209,32 @@ def fetch_sweep_shots(experiment_name, db_path="simulation_results.db"):
     conn.close()
     return rows
 
+def fetch_agreement_latency(experiment_name, db_path="simulation_results.db"):
+    """
+    Aggregates time-to-agreement across every shot and lieutenant of an experiment.
+    Returns {swept_value: {"p50": ..., "p95": ..., "max": ..., "undecided": ...}}, where undecided counts lieutenants
+    that never reached a final decision.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT swept_value, time_to_agreement FROM experiment_results WHERE experiment_name = ? AND time_to_agreement IS NOT NULL",
+                   (experiment_name,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    samples = {}
+    for swept_value, times in rows:
+        samples.setdefault(swept_value, []).extend(times.split())
+
+    latency = {}
+    for swept_value, times in samples.items():
+        decided = np.array([float(t) for t in times if t != "N"])
+        stats = {"p50": None, "p95": None, "max": None, "undecided": len(times) - len(decided)}
+        if len(decided):
+            stats.update(p50=float(np.percentile(decided, 50)), p95=float(np.percentile(decided, 95)), max=float(decided.max()))
+        latency[swept_value] = stats
+    return latency
+
 def return_metric(commands_sent, final_votes, traitors):
     # [success, traitor_success, abort]
     bad = False